@@ -0,0 +1,268 @@
+"""
+HydroBuddy analytics - Hydration statistics computed from the reminder history.
+
+The history is parsed once into a compact array of timestamps. Per-day and
+per-hour counts are kept as rollups that are updated with each chunk of new
+entries, by sorting the chunk and bisecting it at day and hour boundaries,
+so refreshing the statistics only parses what was appended since the last
+refresh. Interval, gap and streak figures are computed over the array,
+vectorized with NumPy when it is installed.
+"""
+
+import time
+from array import array
+from bisect import bisect_left
+from datetime import date, datetime, time as clock_time, timedelta
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Upper bounds (in minutes) of the interval histogram buckets
+INTERVAL_BUCKETS = (5, 10, 15, 20, 30, 60, 120, 240)
+
+
+def _bucket_label(i):
+    if i == 0:
+        return f"< {INTERVAL_BUCKETS[0]} min"
+    if i == len(INTERVAL_BUCKETS):
+        return f">= {INTERVAL_BUCKETS[-1]} min"
+    return f"{INTERVAL_BUCKETS[i - 1]}-{INTERVAL_BUCKETS[i]} min"
+
+
+def _hour_boundaries(day):
+    """Epoch seconds at the start of each local hour of ``day``, and of the next day."""
+    midnight = datetime.combine(day, clock_time()).timestamp()
+    next_midnight = datetime.combine(day + timedelta(days=1), clock_time()).timestamp()
+    if next_midnight - midnight == 86400:
+        return [midnight + 3600 * hour for hour in range(24)] + [next_midnight]
+    # A daylight saving change: hours are not all 3600 seconds apart
+    return [datetime.combine(day, clock_time(hour)).timestamp() for hour in range(24)] + [next_midnight]
+
+
+class HydrationStats:
+    """Incrementally maintained statistics over a history backend."""
+
+    def __init__(self, backend, chunk_size=50000):
+        self.backend = backend
+        self.chunk_size = chunk_size
+        self._reader = backend.reader()
+        self._clear()
+
+    def _clear(self):
+        self._reader.reset()
+        self.timestamps = array("d")  # seconds since the epoch, in log order
+        self.per_day = {}  # date ordinal -> count
+        self.per_hour = [0] * 24
+        self.parse_seconds = 0.0
+        self._summary = None
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def update(self):
+        """Parse entries appended since the last update. Returns how many were added."""
+        start = time.perf_counter()
+        added = 0
+        while True:
+            stamps = self._reader.read_new_timestamps(limit=self.chunk_size)
+            if not stamps:
+                break
+            seconds = array("d", [stamp.timestamp() for stamp in stamps])
+            self.timestamps.extend(seconds)
+            self._count(seconds, date.fromtimestamp(min(seconds)), date.fromtimestamp(max(seconds)))
+            added += len(stamps)
+        if added:
+            self._summary = None
+        self.parse_seconds += time.perf_counter() - start
+        return added
+
+    def _count(self, seconds, first_day, last_day):
+        """Add ``seconds`` (between ``first_day`` and ``last_day``) to the per-day and per-hour rollups."""
+        boundaries = []
+        day = first_day
+        while day <= last_day:
+            boundaries.extend(_hour_boundaries(day))
+            day += timedelta(days=1)
+        # Each entry's position among the boundaries gives its day and hour
+        if NUMPY_AVAILABLE:
+            positions = np.searchsorted(np.sort(np.frombuffer(seconds, dtype=np.float64)), boundaries, side="left")
+            counts = np.diff(positions).tolist()
+        else:
+            ordered = sorted(seconds)
+            positions = [bisect_left(ordered, boundary) for boundary in boundaries]
+            counts = [high - low for low, high in zip(positions, positions[1:])]
+        day = first_day
+        for start in range(0, len(counts), 25):
+            hours = counts[start:start + 24]  # the 25th count spans no time
+            total = sum(hours)
+            if total:
+                ordinal = day.toordinal()
+                self.per_day[ordinal] = self.per_day.get(ordinal, 0) + total
+                for hour, count in enumerate(hours):
+                    self.per_hour[hour] += count
+            day += timedelta(days=1)
+
+    def reset(self):
+        """Forget everything, e.g. after the history was cleared."""
+        self._clear()
+
+    # --- Computations over the arrays ---
+
+    def _intervals(self):
+        """Minutes between consecutive reminders."""
+        if NUMPY_AVAILABLE:
+            ts = np.frombuffer(self.timestamps, dtype=np.float64)
+            return np.diff(ts) / 60.0
+        ts = self.timestamps
+        return array("d", ((ts[i + 1] - ts[i]) / 60.0 for i in range(len(ts) - 1)))
+
+    def interval_stats(self):
+        intervals = self._intervals()
+        if len(intervals) == 0:
+            return None
+        if NUMPY_AVAILABLE:
+            median, p90 = np.percentile(intervals, [50, 90])
+            mean = float(intervals.mean())
+            histogram = np.bincount(
+                np.searchsorted(INTERVAL_BUCKETS, intervals, side="right"),
+                minlength=len(INTERVAL_BUCKETS) + 1,
+            ).tolist()
+        else:
+            ordered = sorted(intervals)
+            median = ordered[len(ordered) // 2]
+            p90 = ordered[min(len(ordered) - 1, int(0.9 * len(ordered)))]
+            mean = sum(ordered) / len(ordered)
+            histogram = [0] * (len(INTERVAL_BUCKETS) + 1)
+            for value in ordered:
+                histogram[bisect_left(INTERVAL_BUCKETS, value + 1e-9)] += 1
+        return {
+            "mean_minutes": float(mean),
+            "median_minutes": float(median),
+            "p90_minutes": float(p90),
+            "histogram": {_bucket_label(i): count for i, count in enumerate(histogram)},
+        }
+
+    def largest_gaps(self, count=5):
+        """The ``count`` longest pauses between reminders, longest first."""
+        intervals = self._intervals()
+        if len(intervals) == 0:
+            return []
+        if NUMPY_AVAILABLE:
+            k = min(count, len(intervals))
+            top = np.argpartition(intervals, -k)[-k:]
+            indexes = top[np.argsort(intervals[top])[::-1]].tolist()
+        else:
+            indexes = sorted(range(len(intervals)), key=intervals.__getitem__, reverse=True)[:count]
+        return [
+            {
+                "start": datetime.fromtimestamp(self.timestamps[i]),
+                "end": datetime.fromtimestamp(self.timestamps[i + 1]),
+                "minutes": float(intervals[i]),
+            }
+            for i in indexes
+        ]
+
+    def streaks(self, min_per_day=1, today=None):
+        """Current and longest runs of consecutive days with at least ``min_per_day`` reminders."""
+        days = sorted(day for day, n in self.per_day.items() if n >= min_per_day)
+        if not days:
+            return {"current": 0, "longest": 0}
+        if NUMPY_AVAILABLE:
+            ordinals = np.asarray(days)
+            breaks = np.flatnonzero(np.diff(ordinals) != 1)
+            run_starts = np.concatenate(([0], breaks + 1))
+            run_ends = np.concatenate((breaks + 1, [len(days)]))
+            longest = int((run_ends - run_starts).max())
+            last_run = int(run_ends[-1] - run_starts[-1])
+        else:
+            longest = run = 1
+            for previous, current in zip(days, days[1:]):
+                run = run + 1 if current == previous + 1 else 1
+                longest = max(longest, run)
+            last_run = run
+        today = (today or date.today()).toordinal()
+        # A streak is still current if it includes today or yesterday.
+        current = last_run if days[-1] >= today - 1 else 0
+        return {"current": current, "longest": longest}
+
+    def daily_counts(self, days=14, today=None):
+        """Reminder counts for the last ``days`` days, oldest first."""
+        today = today or date.today()
+        return [
+            (today - timedelta(days=offset), self.per_day.get((today - timedelta(days=offset)).toordinal(), 0))
+            for offset in range(days - 1, -1, -1)
+        ]
+
+    def summary(self, days=14):
+        """All statistics as a dict. Cached until new entries arrive."""
+        cached = self._summary
+        if cached is not None and cached["days_shown"] == days and cached["daily"][-1][0] == date.today():
+            return cached
+        start = time.perf_counter()
+        total = len(self.timestamps)
+        summary = {
+            "total": total,
+            "first": datetime.fromtimestamp(self.timestamps[0]) if total else None,
+            "last": datetime.fromtimestamp(self.timestamps[-1]) if total else None,
+            "days_active": len(self.per_day),
+            "mean_per_active_day": total / len(self.per_day) if self.per_day else 0.0,
+            "per_hour": list(self.per_hour),
+            "daily": self.daily_counts(days),
+            "days_shown": days,
+            "intervals": self.interval_stats(),
+            "largest_gaps": self.largest_gaps(),
+            "streaks": self.streaks(),
+            "backend": "numpy" if NUMPY_AVAILABLE else "array",
+        }
+        summary["compute_ms"] = (time.perf_counter() - start) * 1000
+        self._summary = summary
+        return summary
+
+
+def format_summary(summary):
+    """Render a summary as plain text for the terminal or the GUI."""
+    if not summary["total"]:
+        return "No reminders logged yet."
+    lines = [
+        f"Total reminders:      {summary['total']}",
+        f"First / last:         {summary['first']:%Y-%m-%d %H:%M} / {summary['last']:%Y-%m-%d %H:%M}",
+        f"Active days:          {summary['days_active']} "
+        f"({summary['mean_per_active_day']:.1f} reminders per day)",
+        f"Current streak:       {summary['streaks']['current']} days "
+        f"(longest {summary['streaks']['longest']})",
+    ]
+    intervals = summary["intervals"]
+    if intervals:
+        lines.append(
+            f"Interval:             median {intervals['median_minutes']:.1f} min, "
+            f"mean {intervals['mean_minutes']:.1f} min, p90 {intervals['p90_minutes']:.1f} min"
+        )
+        lines.append("")
+        lines.append("Intervals:")
+        peak = max(intervals["histogram"].values()) or 1
+        for label, count in intervals["histogram"].items():
+            lines.append(f"  {label:>12} {count:>8}  {'█' * round(20 * count / peak)}")
+
+    lines.append("")
+    lines.append("Last days:")
+    peak = max((count for _, count in summary["daily"]), default=0) or 1
+    for day, count in summary["daily"]:
+        lines.append(f"  {day:%a %m-%d} {count:>5}  {'█' * round(20 * count / peak)}")
+
+    lines.append("")
+    lines.append("By hour of day:")
+    peak = max(summary["per_hour"]) or 1
+    for hour, count in enumerate(summary["per_hour"]):
+        if count:
+            lines.append(f"  {hour:02d}:00 {count:>8}  {'█' * round(20 * count / peak)}")
+
+    if summary["largest_gaps"]:
+        lines.append("")
+        lines.append("Longest gaps:")
+        for gap in summary["largest_gaps"]:
+            hours = gap["minutes"] / 60
+            lines.append(f"  {gap['start']:%Y-%m-%d %H:%M} -> {gap['end']:%Y-%m-%d %H:%M}  ({hours:.1f} h)")
+    return "\n".join(lines)
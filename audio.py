@@ -0,0 +1,365 @@
+"""
+HydroBuddy audio - Non-blocking sound playback with a decoded-sound cache.
+
+Sounds are played through one of several backends:
+
+- ``pcm``: the sound is decoded once into a WAV file (MP3 and other formats
+  through ffmpeg or mpg123; WAV files are used as they are) and each
+  reminder starts a short-lived system player (paplay, pw-play, aplay or
+  afplay; winsound on Windows). Nothing heavy is loaded into HydroBuddy
+  itself, so this is the lightest option.
+- ``pygame``: the pygame mixer is initialised once and each sound is
+  decoded into a ``pygame.mixer.Sound``.
+- ``none``: no sound, for tests and headless machines.
+
+With ``backend="auto"`` the first one that is available and can load the
+sound is used from then on; if none of them can load it, the choice is made
+again with the next sound. Decoded sounds are kept in an LRU cache keyed by path and
+modification time. Playback returns immediately: a sound that is not
+decoded yet is decoded on a worker thread, and the reminder is silent
+unless the decode finishes soon enough.
+"""
+
+import importlib.util
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# Tried in this order by backend="auto"
+AUTO_ORDER = ("pcm", "pygame", "none")
+
+# System players for WAV files, in order of preference
+PLAYERS = (("paplay",), ("pw-play",), ("aplay", "-q"), ("afplay",))
+
+# Decoders for everything that is not already WAV: command prefix and
+# arguments that write the decoded file
+DECODERS = (
+    ("ffmpeg", lambda source, target: ["ffmpeg", "-v", "error", "-y", "-i", source, target]),
+    ("mpg123", lambda source, target: ["mpg123", "-q", "-w", target, source]),
+)
+
+# A play requested while its sound is being decoded starts once the decode
+# is done, if that is within this many seconds; otherwise it stays silent.
+LATE_PLAY_LIMIT = 2.0
+
+
+def find_player():
+    """The first WAV player found on PATH, as a command prefix, or None."""
+    import shutil
+    for command in PLAYERS:
+        if shutil.which(command[0]):
+            return list(command)
+    return None
+
+
+class PygameBackend:
+    """Plays sounds through a single, persistent pygame mixer."""
+
+    name = "pygame"
+
+    def __init__(self):
+        self._mixer = None
+
+    @staticmethod
+    def available():
+        return importlib.util.find_spec("pygame") is not None
+
+    def _ensure_mixer(self):
+        if self._mixer is None:
+            import pygame
+            if not pygame.mixer.get_init():
+                pygame.mixer.init()
+            self._mixer = pygame.mixer
+        return self._mixer
+
+    def decode(self, path):
+        """Return ``(sound, size in bytes, length in seconds)``."""
+        mixer = self._ensure_mixer()
+        sound = mixer.Sound(path)
+        length = sound.get_length()
+        frequency, size, channels = mixer.get_init()
+        return sound, int(length * frequency * channels * abs(size) // 8), length
+
+    def start(self, sound):
+        sound.play()
+
+    def close(self):
+        if self._mixer is not None:
+            self._mixer.quit()
+            self._mixer = None
+
+
+class PCMBackend:
+    """Plays pre-decoded WAV files with a system player in a subprocess.
+
+    The decoded PCM stays on disk in ``decode_dir`` (by default in the
+    temporary directory), so it costs no memory in this process; only the
+    path and length are cached. There is one WAV file per source file, which
+    is replaced when the source changes. The modules used here are imported
+    on first use, so choosing another backend does not pay for them.
+    """
+
+    name = "pcm"
+
+    def __init__(self, decode_dir=None):
+        if decode_dir is None:
+            import tempfile
+            decode_dir = os.path.join(tempfile.gettempdir(), "hydrobuddy-sounds")
+        self.decode_dir = decode_dir
+        self.player = find_player()
+        self._processes = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def available():
+        return sys.platform == "win32" or find_player() is not None
+
+    def _decoded_path(self, path):
+        """A WAV version of ``path``, decoding it once into ``decode_dir``."""
+        if path.lower().endswith(".wav"):
+            return path
+        import hashlib
+        import shutil
+        import subprocess
+        st = os.stat(path)
+        digest = hashlib.sha1(path.encode("utf-8")).hexdigest()[:16]
+        target = os.path.join(self.decode_dir, f"{digest}.wav")
+        # Reuse the WAV only if it was decoded after the source last changed
+        if os.path.exists(target) and os.stat(target).st_mtime_ns >= st.st_mtime_ns:
+            return target
+        for program, command in DECODERS:
+            if shutil.which(program):
+                break
+        else:
+            raise RuntimeError(f"cannot decode {os.path.basename(path)} without ffmpeg or mpg123")
+        os.makedirs(self.decode_dir, exist_ok=True)
+        temp_target = f"{target}.{os.getpid()}.tmp.wav"
+        subprocess.run(command(path, temp_target), check=True,
+                       stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        os.replace(temp_target, target)
+        return target
+
+    def decode(self, path):
+        """Return ``(wav path, 0, length in seconds)``."""
+        if self.player is None and sys.platform != "win32":
+            raise RuntimeError("no WAV player found (paplay, pw-play, aplay or afplay)")
+        import wave
+        wav_path = self._decoded_path(path)
+        with wave.open(wav_path, "rb") as wav_file:
+            length = wav_file.getnframes() / float(wav_file.getframerate())
+        return wav_path, 0, length
+
+    def start(self, wav_path):
+        if sys.platform == "win32":
+            import winsound
+            winsound.PlaySound(wav_path, winsound.SND_FILENAME | winsound.SND_ASYNC)
+            return
+        import subprocess
+        with self._lock:
+            # Forget players that have finished
+            self._processes = [p for p in self._processes if p.poll() is None]
+            self._processes.append(subprocess.Popen(
+                self.player + [wav_path],
+                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            ))
+
+    def close(self):
+        """Stop any sound that is still playing."""
+        with self._lock:
+            processes, self._processes = self._processes, []
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+
+
+class NullBackend:
+    """Plays nothing."""
+
+    name = "none"
+
+    @staticmethod
+    def available():
+        return True
+
+    def decode(self, path):
+        return None, 0, 0.0
+
+    def start(self, sound):
+        pass
+
+    def close(self):
+        pass
+
+
+BACKENDS = {backend.name: backend for backend in (PCMBackend, PygameBackend, NullBackend)}
+
+
+class AudioEngine:
+    """Plays sound files through one audio backend.
+
+    Decoded sounds are cached up to ``max_cache_bytes``; the least recently
+    played sounds are evicted first. Editing a file on disk changes its
+    mtime, so the next play decodes the new version.
+
+    ``backend`` is "auto" or one of ``BACKENDS``. With "auto", a backend
+    that fails to load a sound is skipped in favour of the next one, and the
+    choice is only kept once a backend has loaded a sound. "none" is chosen
+    only when no other backend is available.
+    Decoding never happens under the cache lock, and ``play`` and
+    ``preload`` leave it to a worker thread.
+    """
+
+    def __init__(self, max_cache_bytes=16 * 1024 * 1024, backend="auto"):
+        if backend != "auto" and backend not in BACKENDS:
+            raise ValueError(f"Unknown audio backend: {backend} (choose from auto, {', '.join(BACKENDS)})")
+        self.max_cache_bytes = max_cache_bytes
+        self.requested_backend = backend
+        self.backend = None
+        self._cache = OrderedDict()  # (path, mtime) -> (sound, size in bytes, length)
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+        # Serializes decoding and the choice of backend
+        self._decode_lock = threading.Lock()
+        # Paths being decoded by a worker -> the play waiting for it, if any
+        self._decoding = {}
+
+    @property
+    def backend_name(self):
+        """The backend in use, or None before the first sound is loaded."""
+        return self.backend.name if self.backend is not None else None
+
+    def _decode(self, path):
+        if self.backend is not None:
+            return self.backend.decode(path)
+        if self.requested_backend != "auto":
+            self.backend = BACKENDS[self.requested_backend]()
+            return self.backend.decode(path)
+
+        errors = []
+        for name in AUTO_ORDER:
+            backend_class = BACKENDS[name]
+            if not backend_class.available():
+                continue
+            if name == "none" and errors:
+                # The others exist but could not load this sound, which may
+                # be the sound's fault: choose again with the next one.
+                raise RuntimeError("; ".join(errors))
+            backend = backend_class()
+            try:
+                decoded = backend.decode(path)
+            except Exception as e:
+                print(f"Audio: {name} backend unavailable ({e}), trying the next one")
+                backend.close()
+                errors.append(f"{name}: {e}")
+                continue
+            if name == "none":
+                print("Audio: no sound backend available (install pygame, or a player such as aplay); "
+                      "reminders will be silent")
+            self.backend = backend
+            return decoded
+
+    def _cached(self, path):
+        key = (path, os.stat(path).st_mtime_ns)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+            return cached
+
+    def load(self, path):
+        """Return the decoded sound for ``path``, decoding it on this thread on a cache miss."""
+        path = os.path.abspath(path)
+        cached = self._cached(path)
+        if cached is not None:
+            return cached
+        with self._decode_lock:
+            # Another thread may have decoded it in the meantime
+            cached = self._cached(path)
+            if cached is not None:
+                return cached
+            key = (path, os.stat(path).st_mtime_ns)
+            decoded = self._decode(path)
+            size = decoded[1]
+            with self._lock:
+                # Drop stale versions of the same file, then the least recently used sounds.
+                for stale in [k for k in self._cache if k[0] == path]:
+                    self._cache_bytes -= self._cache.pop(stale)[1]
+                while self._cache and self._cache_bytes + size > self.max_cache_bytes:
+                    self._cache_bytes -= self._cache.popitem(last=False)[1][1]
+                self._cache[key] = decoded
+                self._cache_bytes += size
+            return decoded
+
+    def preload(self, path, play=False, on_complete=None):
+        """Decode ``path`` on a worker thread so that its plays start instantly.
+
+        With ``play``, the sound starts once it is decoded, unless that
+        takes longer than ``LATE_PLAY_LIMIT``. Errors are printed.
+        """
+        path = os.path.abspath(path)
+        request = (time.monotonic(), on_complete) if play else None
+        with self._lock:
+            if path in self._decoding:
+                if request is not None:
+                    self._decoding[path] = request
+                return
+            self._decoding[path] = request
+        threading.Thread(target=self._decode_worker, args=(path,), name="HydroBuddyAudioDecode",
+                         daemon=True).start()
+
+    def _decode_worker(self, path):
+        try:
+            sound, _, length = self.load(path)
+        except Exception as e:
+            print(f"Sound error: could not load {os.path.basename(path)}: {e}")
+            sound = None
+        with self._lock:
+            request = self._decoding.pop(path, None)
+        if sound is not None and request is not None and time.monotonic() - request[0] <= LATE_PLAY_LIMIT:
+            try:
+                self._start(sound, length, request[1])
+            except Exception as e:
+                print(f"Sound error: {e}")
+
+    def _start(self, sound, length, on_complete):
+        self.backend.start(sound)
+        if on_complete is not None:
+            timer = threading.Timer(length, on_complete)
+            timer.daemon = True
+            timer.start()
+
+    def play(self, path, on_complete=None):
+        """Start playing ``path`` and return immediately.
+
+        ``on_complete`` is called from a timer thread once the sound has
+        finished. Returns the playback length in seconds, or 0.0 if the
+        sound is still being decoded (see ``preload``).
+        """
+        path = os.path.abspath(path)
+        cached = self._cached(path)
+        if cached is None:
+            self.preload(path, play=True, on_complete=on_complete)
+            return 0.0
+        sound, _, length = cached
+        self._start(sound, length, on_complete)
+        return length
+
+    def cache_info(self):
+        with self._lock:
+            return {
+                "backend": self.backend_name,
+                "entries": len(self._cache),
+                "bytes": self._cache_bytes,
+                "max_bytes": self.max_cache_bytes,
+            }
+
+    def close(self):
+        """Stop playback, empty the cache and release the backend."""
+        with self._decode_lock, self._lock:
+            self._cache.clear()
+            self._cache_bytes = 0
+            if self.backend is not None:
+                self.backend.close()
+                self.backend = None
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the multi-profile reminder engine.
+
+Measures memory per profile and dispatch latency (how late each reminder
+fires compared to its deadline) with many profiles in one process.
+
+Usage:
+    python benchmarks/engine_benchmark.py [--profiles 10000] [--seconds 10]
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import Profile, ReminderEngine  # noqa: E402
+from metrics import latency_summary  # noqa: E402
+
+
+def measure_memory(count):
+    """Return bytes allocated per profile while adding ``count`` profiles."""
+    gc.collect()
+    tracemalloc.start()
+    engine = ReminderEngine(lambda profile, message: None)
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(count):
+        engine.add_profile(Profile(f"user{i}", interval=15 * 60))
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / count
+
+
+def measure_latency(count, seconds, min_interval, max_interval):
+    """Run ``count`` profiles with short intervals and collect dispatch lag."""
+    engine = ReminderEngine(lambda profile, message: None)
+    engine.lag_samples = []
+    rng = random.Random(42)
+    for i in range(count):
+        interval = rng.uniform(min_interval, max_interval)
+        engine.add_profile(Profile(f"user{i}", interval=interval), first_in=rng.uniform(0, interval))
+    engine.start()
+    time.sleep(seconds)
+    engine.stop()
+    return engine.lag_samples, engine.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--profiles", type=int, default=10000)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--min-interval", type=float, default=1.0)
+    parser.add_argument("--max-interval", type=float, default=5.0)
+    args = parser.parse_args()
+
+    per_profile = measure_memory(args.profiles)
+    print(f"Profiles:            {args.profiles}")
+    print(f"Memory per profile:  {per_profile:.0f} bytes")
+
+    lags, stats = measure_latency(args.profiles, args.seconds, args.min_interval, args.max_interval)
+    print(f"Dispatches:          {stats['dispatched']} in {args.seconds:.1f}s "
+          f"({stats['dispatched'] / args.seconds:.0f}/s)")
+    summary = latency_summary(lags)
+    for label in ("mean", "p50", "p90", "p95", "p99", "max"):
+        print(f"Dispatch lag {label:<6} {summary.get(f'{label}_ms', 0.0):.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for HydroBuddy's hot paths.
+
+Runs headless: plyer and the pygame mixer are replaced by the silent stubs
+in benchmarks/stubs, and all logs are written to a temporary directory.
+Measures:
+
+  log_reminder   queueing latency and end-to-end throughput per backend
+  play_sound     cold (decode) and warm playback latency, plus time to first
+                 sound and peak RSS of each audio backend (pcm, pygame, none)
+  notify         submit latency and delivery time through the dispatcher
+  history        GUI history loading (tail, refresh, paging), statistics and search
+                 parsing on synthetic logs, with peak memory
+  scheduler      lag and drift of the reminder loop running real reminders
+  startup        launcher and module import time in fresh interpreters, plus time
+                 to ready and peak RSS of the cli, tray and gui modes
+
+Results are printed and saved as JSON; ``--compare`` prints the change
+against an earlier run.
+
+Usage:
+    python benchmarks/hot_paths.py [--sizes 1k,10k,100k,1M] [--only history,scheduler]
+    python benchmarks/hot_paths.py --sizes 10M --only history
+    python benchmarks/hot_paths.py --compare benchmarks/results/<earlier>.json
+"""
+
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+STUBS_DIR = os.path.join(BENCH_DIR, "stubs")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+SOUND_FILE = os.path.join(APP_DIR, "MGS_Alert.mp3")
+
+# The stubs must shadow any installed plyer/pygame.
+sys.path[:0] = [STUBS_DIR, APP_DIR]
+
+import reminder  # noqa: E402
+from analytics import HydrationStats  # noqa: E402
+from audio import BACKENDS, AudioEngine  # noqa: E402
+from history import TextHistory  # noqa: E402
+from history_index import HistoryIndex  # noqa: E402
+from metrics import latency_summary  # noqa: E402
+from scheduler import ReminderScheduler  # noqa: E402
+
+SECTIONS = ("log_reminder", "play_sound", "notify", "history", "scheduler", "startup")
+_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+
+def parse_count(text):
+    """Parse "1k", "10M" or "2500" into an int."""
+    text = text.strip().lower()
+    if text[-1:] in _SUFFIXES:
+        return int(float(text[:-1]) * _SUFFIXES[text[-1]])
+    return int(text)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def peak_memory(function, *args):
+    """Peak bytes allocated by Python while running ``function``."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def synthetic_log(path, lines, chunk=100_000):
+    """Write ``lines`` log lines, one reminder every 15 minutes from 2000-01-01."""
+    if os.path.exists(path):
+        return path
+    messages = ("Time to drink some water! 💧", "Stay hydrated! 🚰", None)
+    start = datetime(2000, 1, 1, 8, 0)
+    step = timedelta(minutes=15)
+    with open(path + ".tmp", "w", encoding="utf-8") as log_file:
+        for first in range(0, lines, chunk):
+            block = []
+            for i in range(first, min(lines, first + chunk)):
+                message = messages[i % 3]
+                line = f"Reminder sent at {start + i * step} [CLI #{i + 1}]"
+                block.append(f"{line} {message}\n" if message else line + "\n")
+            log_file.write("".join(block))
+    os.replace(path + ".tmp", path)
+    return path
+
+
+# --- Sections ---
+
+def bench_log_reminder(args, work_dir):
+    results = {}
+    for backend in ("text", "sqlite"):
+        path = os.path.join(work_dir, f"log_reminder.{'db' if backend == 'sqlite' else 'txt'}")
+        reminder.set_history_backend(backend, path)
+        # Room for every entry, so this measures write throughput rather than drops.
+        reminder.configure_log_writer(max_queue=args.events)
+        samples = []
+        start = time.perf_counter()
+        for i in range(args.events):
+            call_start = time.perf_counter()
+            reminder.log_reminder("CLI", "Stay hydrated!", i + 1)
+            samples.append(time.perf_counter() - call_start)
+        reminder.get_log_writer().flush()
+        elapsed = time.perf_counter() - start
+        stats = reminder.get_log_writer().stats()
+        reminder.close_log_writer()
+        results[backend] = {
+            "entries_per_second": args.events / elapsed,
+            "call_latency": latency_summary(samples),
+            "batches": stats["batches"],
+            "dropped": stats["dropped"],
+        }
+    reminder.set_history_backend("text", os.path.join(work_dir, "hydration_log.txt"))
+    reminder.configure_log_writer()
+    return results
+
+
+def bench_play_sound(args, work_dir):
+    engine = AudioEngine(backend="pygame")
+    cold, _ = timed(lambda: (engine.load(SOUND_FILE), engine.play(SOUND_FILE)))
+    engine.close()
+    samples = [timed(reminder.play_sound)[0] for _ in range(args.events)]
+    results = {"cold_ms": cold * 1000, "warm_latency": latency_summary(samples)}
+
+    # Time to first sound and peak memory of each backend in a fresh
+    # interpreter, with the real libraries and players (the pygame stub is
+    # only used, and flagged, when pygame is not installed)
+    for name in BACKENDS:
+        code = (
+            "import json, time\nt = time.perf_counter()\n"
+            f"from audio import AudioEngine\nengine = AudioEngine(backend={name!r})\n"
+            f"engine.load({SOUND_FILE!r})\nengine.play({SOUND_FILE!r})\nready = time.perf_counter() - t\n"
+            "from hydrobuddy import peak_rss_mb\n"
+            "print(json.dumps({'first_sound_ms': ready * 1000, 'peak_rss_mb': peak_rss_mb()}))\n"
+            "engine.close()"
+        )
+        paths = [APP_DIR]
+        if name == "pygame" and importlib.util.find_spec("pygame").origin.startswith(STUBS_DIR):
+            paths.insert(0, STUBS_DIR)
+        done = subprocess.run([sys.executable, "-c", code], cwd=work_dir, capture_output=True, text=True,
+                              env=dict(os.environ, PYTHONPATH=os.pathsep.join(paths)))
+        if done.returncode != 0:
+            error = done.stderr.strip().splitlines()[-1] if done.stderr.strip() else "unknown error"
+            results[f"backend_{name}"] = {"skipped": error}
+            continue
+        results[f"backend_{name}"] = json.loads(done.stdout.strip().splitlines()[0])
+        results[f"backend_{name}"]["stubbed"] = len(paths) > 1
+    return results
+
+
+def bench_notify(args, work_dir):
+    # A distinct key per reminder so nothing is merged; this measures raw delivery.
+    dispatcher = reminder.get_dispatcher()
+    dispatcher.max_pending = args.events
+    samples = []
+    start = time.perf_counter()
+    for i in range(args.events):
+        call_start = time.perf_counter()
+        reminder.notify("Hydration Reminder", "Stay hydrated!", key=i)
+        samples.append(time.perf_counter() - call_start)
+    reminder.close_dispatcher(timeout=60)
+    elapsed = time.perf_counter() - start
+    stats = dispatcher.stats()
+    return {
+        "submit_latency": latency_summary(samples),
+        "notifications_per_second": stats["backends"].get("plyer", {}).get("delivered", 0) / elapsed,
+        "delivery": stats["backends"].get("plyer", {}),
+        "dropped": stats["dropped"],
+    }
+
+
+def _gui_history_timing(backend):
+    """Time HistoryView.reload/refresh on a real Tk root, if a display is available."""
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception as e:
+        return {"skipped": f"no display ({e.__class__.__name__})"}
+    try:
+        from history_view import HistoryView
+        view = HistoryView(root, backend.reader())
+        reload_time, _ = timed(view.reload)
+        root.update()
+        refresh_time, _ = timed(view.refresh)
+        older_time, _ = timed(view.load_older)
+        return {"reload_ms": reload_time * 1000, "refresh_ms": refresh_time * 1000,
+                "load_older_ms": older_time * 1000}
+    finally:
+        root.destroy()
+
+
+def bench_history(args, work_dir):
+    results = {}
+    for size in args.sizes:
+        path = synthetic_log(os.path.join(args.data_dir, f"synthetic_{size}.txt"), size)
+        backend = TextHistory(path)
+        reader = backend.reader()
+        # What load_log_history does: the newest page, then appended entries.
+        tail_time, page = timed(reader.tail, 100, True)
+        refresh_time, _ = timed(reader.read_new, True)
+        paging = []
+        key = page[0][0]
+        for _ in range(20):
+            elapsed, older = timed(reader.before, key, 100)
+            paging.append(elapsed)
+            if not older:
+                break
+            key = older[0][0]
+
+        stats = HydrationStats(backend)
+        parse_time, _ = timed(stats.update)
+        summary_time, _ = timed(stats.summary)
+        del stats
+
+        # The GUI filter bar: build the index, then search by text, and by
+        # date range and source, reading the newest page of matches
+        index = HistoryIndex(backend)
+        index_time, _ = timed(index.update)
+        searches = {}
+        middle = datetime(2000, 1, 1, 8, 0) + timedelta(minutes=15 * (size // 2))
+        for name, filters in (("text", {"text": "hydrated"}),
+                              ("day_source", {"start": middle, "end": middle + timedelta(days=1), "source": "CLI"})):
+            elapsed, _ = timed(lambda: index.search(**filters).tail(100))
+            searches[f"search_{name}_ms"] = elapsed * 1000
+        del index
+
+        result = {
+            "file_mb": os.path.getsize(path) / 1e6,
+            "tail_ms": tail_time * 1000,
+            "refresh_ms": refresh_time * 1000,
+            "page_back": latency_summary(paging),
+            "stats_parse_seconds": parse_time,
+            "stats_lines_per_second": size / parse_time if parse_time else None,
+            "stats_summary_ms": summary_time * 1000,
+            "index_lines_per_second": size / index_time if index_time else None,
+            **searches,
+            "tail_peak_bytes": peak_memory(backend.reader().tail, 100),
+            "gui": _gui_history_timing(backend),
+        }
+        if not args.skip_memory:
+            result["stats_peak_bytes"] = peak_memory(lambda: HydrationStats(backend).update())
+        results[str(size)] = result
+        print(f"  history {size:>10,} lines: tail {result['tail_ms']:.2f} ms, "
+              f"stats {result['stats_lines_per_second'] or 0:,.0f} lines/s, "
+              f"search {result['search_text_ms']:.2f} ms", flush=True)
+    return results
+
+
+def bench_scheduler(args, work_dir):
+    interval = args.scheduler_interval
+    lags = []
+    fires = []
+    scheduler = None
+
+    def callback():
+        fires.append(scheduler.last_fired)
+        lags.append(scheduler.last_lag)
+        reminder.send_cli_reminder()
+
+    scheduler = ReminderScheduler(interval, callback)
+    scheduler.start()
+    time.sleep(args.scheduler_seconds)
+    scheduler.stop(timeout=5)
+    reminder.get_log_writer().flush()
+
+    # Drift: how far each reminder is from the ideal grid started by the first one.
+    drift = [abs(fired - (fires[0] + i * interval)) for i, fired in enumerate(fires)]
+    return {
+        "interval_seconds": interval,
+        "fired": len(fires),
+        "expected": int(args.scheduler_seconds / interval) + 1,
+        "lag": latency_summary(lags),
+        "drift": latency_summary(drift),
+        "final_drift_ms": drift[-1] * 1000 if drift else None,
+    }
+
+
+def bench_startup(args, work_dir):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([STUBS_DIR, APP_DIR]))
+    commands = {
+        "launcher_help": [sys.executable, os.path.join(APP_DIR, "hydrobuddy.py"), "help"],
+        "import_reminder": [sys.executable, "-c", "import reminder"],
+        "import_daemon": [sys.executable, "-c", "import daemon"],
+        "import_gui": [sys.executable, "-c", "import gui"],
+    }
+    results = {}
+    for name, command in commands.items():
+        samples = []
+        for _ in range(args.startup_repeats):
+            start = time.perf_counter()
+            done = subprocess.run(command, cwd=work_dir, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            samples.append(time.perf_counter() - start)
+            if done.returncode != 0:
+                break
+        results[name] = latency_summary(samples) if done.returncode == 0 else {"skipped": "import failed"}
+
+    # Time to ready and peak resident memory of each long-running mode, with
+    # its resident objects built but without entering the event loop
+    for name, code in FOOTPRINT_CODE.items():
+        done = subprocess.run([sys.executable, "-c", FOOTPRINT_PRELUDE + code + FOOTPRINT_REPORT],
+                              cwd=work_dir, env=env, capture_output=True, text=True)
+        if done.returncode != 0:
+            error = done.stderr.strip().splitlines()[-1] if done.stderr.strip() else "unknown error"
+            results[name] = {"skipped": error}
+        else:
+            results[name] = json.loads(done.stdout.strip().splitlines()[-1])
+    return results
+
+
+FOOTPRINT_PRELUDE = "import json, time\nt = time.perf_counter()\n"
+FOOTPRINT_REPORT = (
+    "\nready = time.perf_counter() - t\n"
+    "from hydrobuddy import peak_rss_mb\n"
+    "print(json.dumps({'ready_ms': ready * 1000, 'peak_rss_mb': peak_rss_mb()}))"
+)
+FOOTPRINT_CODE = {
+    "footprint_cli": "import reminder\nreminder.get_settings()",
+    "footprint_tray_core": "import tray\napp = tray.TrayApp()",
+    "footprint_tray": "import tray\napp = tray.TrayApp()\napp.build_icon()",
+    "footprint_gui": (
+        "import tkinter as tk\nimport gui\nroot = tk.Tk()\n"
+        "app = gui.HydroBuddyGUI(root)\nroot.update()"
+    ),
+}
+
+
+BENCHMARKS = {
+    "log_reminder": bench_log_reminder,
+    "play_sound": bench_play_sound,
+    "notify": bench_notify,
+    "history": bench_history,
+    "scheduler": bench_scheduler,
+    "startup": bench_startup,
+}
+
+
+# --- Reporting ---
+
+def flatten(data, prefix=""):
+    """Numeric leaves of nested dicts as {"a.b.c": value}."""
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(old_path, results):
+    with open(old_path, "r", encoding="utf-8") as old_file:
+        old = flatten(json.load(old_file)["results"])
+    new = flatten(results)
+    print(f"\nCompared with {old_path}:")
+    print(f"  {'metric':<55} {'before':>12} {'after':>12} {'change':>8}")
+    for name in sorted(set(old) & set(new)):
+        before, after = old[name], new[name]
+        change = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+        print(f"  {name:<55} {before:>12.4g} {after:>12.4g} {change:>8}")
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1k,10k,100k,1M",
+                        help="synthetic log sizes for the history section (up to 10M)")
+    parser.add_argument("--only", help=f"comma-separated sections ({', '.join(SECTIONS)})")
+    parser.add_argument("--events", type=int, default=10000, help="calls per latency measurement")
+    parser.add_argument("--scheduler-interval", type=float, default=0.05)
+    parser.add_argument("--scheduler-seconds", type=float, default=5.0)
+    parser.add_argument("--startup-repeats", type=int, default=5)
+    parser.add_argument("--data-dir", help="where synthetic logs are kept (reused between runs)")
+    parser.add_argument("--skip-memory", action="store_true",
+                        help="skip the traced second statistics pass used for peak memory")
+    parser.add_argument("--output", help="JSON results file (default: benchmarks/results/<time>.json)")
+    parser.add_argument("--compare", help="earlier JSON results to compare with")
+    args = parser.parse_args()
+
+    args.sizes = [parse_count(size) for size in args.sizes.split(",") if size.strip()]
+    sections = args.only.split(",") if args.only else list(SECTIONS)
+    for section in sections:
+        if section not in BENCHMARKS:
+            parser.error(f"unknown section: {section}")
+
+    work_dir = tempfile.mkdtemp(prefix="hydrobuddy-bench-")
+    args.data_dir = args.data_dir or os.path.join(work_dir, "data")
+    os.makedirs(args.data_dir, exist_ok=True)
+    reminder.set_history_backend("text", os.path.join(work_dir, "hydration_log.txt"))
+    # The stubbed mixer, so that no real player is started thousands of times
+    reminder.set_audio_backend("pygame")
+    reminder.set_sound_file(SOUND_FILE)
+    reminder.audio_engine.load(SOUND_FILE)  # wait for the background decode
+
+    results = {}
+    try:
+        for section in sections:
+            print(f"Running {section}...", flush=True)
+            start = time.perf_counter()
+            results[section] = BENCHMARKS[section](args, work_dir)
+            print(f"  done in {time.perf_counter() - start:.1f}s", flush=True)
+    finally:
+        reminder.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as out_file:
+        json.dump(report, out_file, indent=2, default=str)
+
+    print(json.dumps(results, indent=2, default=str))
+    print(f"\nResults saved to {output}")
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""
+Stand-in for plyer used by the benchmarks: notifications are counted, not shown.
+
+``notification.delay`` (or the HYDROBUDDY_STUB_NOTIFY_DELAY environment
+variable, in seconds) simulates a slow notification daemon.
+"""
+
+import os
+import time
+
+
+class _Notification:
+    def __init__(self):
+        self.delay = float(os.environ.get("HYDROBUDDY_STUB_NOTIFY_DELAY", "0"))
+        self.sent = 0
+
+    def notify(self, title="", message="", app_name="", timeout=10, **kwargs):
+        if self.delay:
+            time.sleep(self.delay)
+        self.sent += 1
+
+
+notification = _Notification()
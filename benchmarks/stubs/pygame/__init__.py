@@ -0,0 +1,5 @@
+"""
+Stand-in for pygame used by the benchmarks: only the mixer, and it makes no sound.
+"""
+
+from pygame import mixer  # noqa: F401
@@ -0,0 +1,51 @@
+"""
+Silent pygame.mixer stand-in.
+
+``Sound(path)`` reads the file, so decoding still costs a disk read, and
+reports ``LENGTH`` seconds of 44.1 kHz 16-bit stereo audio. Set
+``decode_delay`` (or HYDROBUDDY_STUB_DECODE_DELAY, in seconds) to simulate
+slow decoding.
+"""
+
+import os
+import time
+
+LENGTH = 1.5
+decode_delay = float(os.environ.get("HYDROBUDDY_STUB_DECODE_DELAY", "0"))
+played = 0
+
+_init = None
+
+
+def init(frequency=44100, size=-16, channels=2, buffer=512):
+    global _init
+    _init = (frequency, size, channels)
+
+
+def get_init():
+    return _init
+
+
+def quit():
+    global _init
+    _init = None
+
+
+class Sound:
+    def __init__(self, path):
+        if _init is None:
+            raise RuntimeError("mixer not initialized")
+        with open(path, "rb") as sound_file:
+            self._data = sound_file.read()
+        if decode_delay:
+            time.sleep(decode_delay)
+
+    def get_length(self):
+        return LENGTH
+
+    def play(self):
+        global played
+        played += 1
+
+    def stop(self):
+        pass
@@ -0,0 +1,77 @@
+"""
+HydroBuddy clock - The time source of the reminder scheduler.
+
+The scheduler reads the time and waits through a clock object instead of
+calling the time module, so the same scheduling code runs in real time or
+on a virtual clock. A ``VirtualClock`` jumps straight to the next deadline
+instead of waiting, which lets ``hydrobuddy.py simulate`` replay months of
+reminders in seconds.
+"""
+
+import heapq
+import itertools
+import time
+from datetime import datetime
+
+
+class SystemClock:
+    """Real time."""
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def time(self):
+        return time.time()
+
+    def now(self):
+        return datetime.now()
+
+    def wait(self, condition, timeout=None):
+        """Wait on ``condition``, whose lock the caller holds, for up to ``timeout`` seconds."""
+        return condition.wait(timeout)
+
+
+system_clock = SystemClock()
+
+
+class VirtualClock:
+    """Simulated time that only moves when the code waits.
+
+    A wait moves the clock to the end of its timeout, or to the next event
+    scheduled with ``call_at()`` if that comes first; the event's callback
+    then runs in the waiting thread, as if another thread had woken it.
+    Only one thread may wait on a virtual clock.
+    """
+
+    def __init__(self, start=None):
+        self.start = time.time() if start is None else start  # wall-clock time of elapsed == 0
+        self.elapsed = 0.0
+        self.waits = 0
+        self._events = []  # heap of (elapsed, sequence, callback)
+        self._sequence = itertools.count()
+
+    def monotonic(self):
+        return self.elapsed
+
+    def time(self):
+        return self.start + self.elapsed
+
+    def now(self):
+        return datetime.fromtimestamp(self.time())
+
+    def call_at(self, elapsed, callback):
+        """Run ``callback()`` when the clock reaches ``elapsed`` seconds."""
+        heapq.heappush(self._events, (elapsed, next(self._sequence), callback))
+
+    def wait(self, condition, timeout=None):
+        self.waits += 1
+        target = float("inf") if timeout is None else self.elapsed + timeout
+        if self._events and self._events[0][0] <= target:
+            when, _, callback = heapq.heappop(self._events)
+            self.elapsed = max(self.elapsed, when)
+            callback()
+            return True
+        if timeout is None:
+            raise RuntimeError("the virtual clock would wait forever: no event is scheduled")
+        self.elapsed = target
+        return False
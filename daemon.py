@@ -0,0 +1,244 @@
+"""
+HydroBuddy daemon - Headless reminders driven by asyncio, controlled over a Unix socket.
+
+The daemon runs scheduling, notification dispatch and logging as coroutines
+on one event loop. Notifications are handed to the dispatcher's worker pool
+and decoding a sound runs in the default executor, so the loop stays
+responsive. Between
+reminders the loop sleeps until the next deadline, so an idle daemon uses
+no CPU.
+
+Clients send one JSON object per line on the control socket and get one
+JSON object back, e.g.::
+
+    {"cmd": "status"}
+    {"cmd": "set-interval", "minutes": 20}
+    {"cmd": "tail-history", "n": 10}
+
+Commands: start, stop, status, set-interval, fire-now, tail-history, shutdown.
+The GUI, tray and CLI modes serve the same protocol and commands on the same
+socket (see ``instance.py``), so ``hydrobuddy.py ctl`` works with whichever
+is running.
+"""
+
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+
+import reminder
+from instance import default_socket_path, requested_interval, send_command, tail_history
+from scheduler import advance_deadline
+
+
+class HydroBuddyDaemon:
+    """Asyncio reminder service with a JSON control socket."""
+
+    def __init__(self, socket_path=None, interval=15 * 60, autostart=True):
+        self.socket_path = socket_path or default_socket_path()
+        self.interval = interval
+        self.autostart = autostart
+        self.running = False
+        self.deadline = None  # loop.time() of the next reminder
+        self._fire_now = None  # source of a reminder asked for with fire-now
+        self.last_planned = None
+        self.last_fired = None
+        self.last_lag = 0.0
+        self._wake = None
+        self._done = None
+        self._server = None
+        self._history_reader = None
+        self._tasks = set()  # reminders being sent; referenced until done
+        self._commands = {
+            "start": self.cmd_start,
+            "stop": self.cmd_stop,
+            "status": self.cmd_status,
+            "set-interval": self.cmd_set_interval,
+            "fire-now": self.cmd_fire_now,
+            "tail-history": self.cmd_tail_history,
+            "shutdown": self.cmd_shutdown,
+            "show": self.cmd_show,
+        }
+
+    # --- Scheduling ---
+
+    def _reschedule(self):
+        """Wake the scheduler so it picks up a changed deadline or state."""
+        self._wake.set()
+
+    def _send_in_background(self, source, lag=None):
+        task = asyncio.create_task(self.send_reminder(source, lag))
+        self._tasks.add(task)
+        task.add_done_callback(self._reminder_done)
+
+    def _reminder_done(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Reminder error: {task.exception()}")
+
+    def _scheduler_done(self, task):
+        # Without its scheduler the daemon would report running and never
+        # remind, so it stops instead.
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Scheduler error: {task.exception()!r}; shutting down")
+            self.running = False
+            self._done.set()
+
+    async def scheduler(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._wake.clear()
+            if not self.running:
+                await self._wake.wait()
+                continue
+            remaining = self.deadline - loop.time()
+            if remaining > 0 and self._fire_now is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            now = loop.time()
+            if self._fire_now is not None:
+                # Like ReminderScheduler.fire_now: the period restarts from now
+                source, self._fire_now = self._fire_now, None
+                planned = now
+            else:
+                source = "daemon"
+                planned = self.deadline
+            self.last_planned = planned
+            self.last_fired = time.time()
+            self.last_lag = now - planned
+            self.deadline = advance_deadline(planned, self.interval, now)
+            self._send_in_background(source, self.last_lag)
+
+    async def send_reminder(self, source, lag=None):
+        """Notify, log and play the sound for one reminder."""
+        loop = asyncio.get_running_loop()
+        number = reminder.state.next_number(source)
+        # Notification and log entry are queued on their workers; the first
+        # play may decode the sound, so it all runs off the event loop.
+        await loop.run_in_executor(
+            None, reminder.deliver_reminder, source, f"Hydration Reminder {number}", number, lag
+        )
+
+    # --- Control commands ---
+
+    def cmd_start(self, request):
+        if not self.running:
+            self.running = True
+            self.deadline = asyncio.get_running_loop().time()
+            self._reschedule()
+        return self.cmd_status(request)
+
+    def cmd_stop(self, request):
+        self.running = False
+        self.deadline = None
+        self._fire_now = None
+        self._reschedule()
+        return self.cmd_status(request)
+
+    def cmd_status(self, request):
+        next_reminder = None
+        if self.running and self.deadline is not None:
+            remaining = max(0.0, self.deadline - asyncio.get_running_loop().time())
+            next_reminder = datetime.fromtimestamp(time.time() + remaining).isoformat()
+        return {
+            "mode": "daemon",
+            "running": self.running,
+            "interval": self.interval,
+            "count": reminder.state.count,
+            "next_reminder": next_reminder,
+            "last_fired": datetime.fromtimestamp(self.last_fired).isoformat() if self.last_fired else None,
+            "last_lag": self.last_lag,
+            "pid": os.getpid(),
+        }
+
+    def cmd_set_interval(self, request):
+        interval = requested_interval(request)
+        self.interval = interval
+        if self.running and self.last_planned is not None:
+            self.deadline = self.last_planned + interval
+        self._reschedule()
+        return self.cmd_status(request)
+
+    def cmd_fire_now(self, request):
+        # Answer right away; the reminder is delivered in the background.
+        source = request.get("source", "manual")
+        if self.running:
+            # Fired by the scheduler, which restarts the period from now
+            self._fire_now = source
+            self._reschedule()
+        else:
+            self._send_in_background(source)
+        return self.cmd_status(request)
+
+    async def cmd_tail_history(self, request):
+        if self._history_reader is None:
+            self._history_reader = reminder.history_backend.reader()
+        return await asyncio.get_running_loop().run_in_executor(None, tail_history, request, self._history_reader)
+
+    def cmd_show(self, request):
+        raise ValueError("it is running as a daemon, which has no window")
+
+    def cmd_shutdown(self, request):
+        self._done.set()
+        return {"shutting_down": True}
+
+    # --- Socket server ---
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    handler = self._commands.get(request.get("cmd"))
+                    if handler is None:
+                        raise ValueError(f"unknown command: {request.get('cmd')}")
+                    result = handler(request)
+                    if asyncio.iscoroutine(result):
+                        result = await result
+                    response = {"ok": True, **result}
+                except Exception as e:
+                    response = {"ok": False, "error": str(e)}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+                if self._done.is_set():
+                    break
+        finally:
+            writer.close()
+
+    async def serve(self):
+        self._wake = asyncio.Event()
+        self._done = asyncio.Event()
+        if os.path.exists(self.socket_path):
+            # Refuse to take over the socket of a daemon that is still alive.
+            if send_command({"cmd": "status"}, self.socket_path, quiet=True) is not None:
+                raise RuntimeError(f"HydroBuddy daemon already running on {self.socket_path}")
+            os.unlink(self.socket_path)
+
+        self._server = await asyncio.start_unix_server(self.handle_client, path=self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        print(f"HydroBuddy daemon listening on {self.socket_path}")
+
+        if self.autostart:
+            self.cmd_start({})
+        scheduler = asyncio.create_task(self.scheduler())
+        scheduler.add_done_callback(self._scheduler_done)
+        try:
+            await self._done.wait()
+        finally:
+            scheduler.cancel()
+            self._server.close()
+            await self._server.wait_closed()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def run(self):
+        asyncio.run(self.serve())
+
@@ -0,0 +1,267 @@
+"""
+HydroBuddy dispatch - Deliver notifications without holding up the schedule.
+
+Notifications are queued and delivered by a small, fixed pool of worker
+threads. Each delivery attempt has a timeout. Attempts that raise an error
+are retried with exponential backoff; an attempt that times out is not,
+since the slow call may still show the notification. If reminders pile up while the backend is
+slow, undelivered ones with the same key are merged into a single
+notification instead of being shown one after another.
+
+The backend is a pluggable sink: desktop notifications through plyer, the
+console, or nothing at all (for tests and benchmarks).
+"""
+
+import threading
+import time
+from collections import deque, namedtuple
+
+from metrics import registry as metrics
+
+Notification = namedtuple("Notification", ["title", "message", "app_name", "timeout", "key", "merged"])
+
+
+class BusyError(Exception):
+    """No call slot became free in time; the sink was not called."""
+
+
+class PlyerSink:
+    """Desktop notifications through plyer (imported on first use)."""
+
+    name = "plyer"
+
+    def send(self, notification):
+        from plyer import notification as plyer_notification
+        plyer_notification.notify(
+            title=notification.title,
+            message=notification.message,
+            app_name=notification.app_name,
+            timeout=notification.timeout,
+        )
+
+
+class ConsoleSink:
+    """Prints notifications to stdout."""
+
+    name = "console"
+
+    def send(self, notification):
+        print(f"🔔 {notification.title}: {notification.message}", flush=True)
+
+
+class NullSink:
+    """Discards notifications."""
+
+    name = "none"
+
+    def send(self, notification):
+        pass
+
+
+SINKS = {sink.name: sink for sink in (PlyerSink, ConsoleSink, NullSink)}
+
+
+def make_sink(name):
+    if name not in SINKS:
+        raise ValueError(f"Unknown notification sink: {name} (choose from {', '.join(SINKS)})")
+    return SINKS[name]()
+
+
+class BackendStats:
+    """Latency and failure counters for one sink, updated from several worker threads."""
+
+    def __init__(self, sample_size=256):
+        self._lock = threading.Lock()
+        self.delivered = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.retries = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self._samples = deque(maxlen=sample_size)
+
+    def record(self, latency):
+        with self._lock:
+            self.delivered += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+            self._samples.append(latency)
+
+    def count(self, counter):
+        """Add one to ``counter`` ("failures", "timeouts" or "retries")."""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def as_dict(self):
+        with self._lock:
+            return self._as_dict()
+
+    def _as_dict(self):
+        samples = sorted(self._samples)
+        return {
+            "delivered": self.delivered,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "retries": self.retries,
+            "mean_latency": self.total_latency / self.delivered if self.delivered else 0.0,
+            "p95_latency": samples[int(0.95 * (len(samples) - 1))] if samples else 0.0,
+            "max_latency": self.max_latency,
+        }
+
+
+class NotificationDispatcher:
+    """Bounded worker pool that delivers notifications to a sink.
+
+    ``submit`` never blocks. At most ``max_pending`` notifications wait in
+    the queue; beyond that the oldest is dropped. A notification whose key
+    matches one that is still waiting replaces it, and the result records
+    how many reminders were merged.
+    """
+
+    def __init__(self, sink, workers=2, timeout=5.0, retries=2, backoff=0.5, max_pending=16):
+        self.sink = sink
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_pending = max_pending
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        # Sink calls run on their own daemon threads so a hung call can be
+        # abandoned after its timeout; this bounds how many can pile up.
+        self._call_slots = threading.BoundedSemaphore(workers * 2)
+        self._stats = {}
+        self.submitted = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self._workers = [
+            threading.Thread(target=self._work, name=f"HydroBuddyDispatch-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, title, message, app_name="HydroBuddy", timeout=10, key=None):
+        """Queue a notification for delivery and return immediately."""
+        notification = Notification(title, message, app_name, timeout, key, 1)
+        with self._cond:
+            if self._closed:
+                self.dropped += 1
+                return False
+            self.submitted += 1
+            if key is not None:
+                for i, waiting in enumerate(self._pending):
+                    if waiting.key == key:
+                        # Merge with the reminder that is still waiting.
+                        merged = waiting.merged + 1
+                        title = f"{title} ({merged} reminders)"
+                        self._pending[i] = notification._replace(title=title, merged=merged)
+                        self.coalesced += 1
+                        return True
+            if len(self._pending) >= self.max_pending:
+                self._pending.popleft()
+                self.dropped += 1
+            self._pending.append(notification)
+            self._cond.notify()
+        return True
+
+    def stats(self):
+        with self._cond:
+            return {
+                "submitted": self.submitted,
+                "coalesced": self.coalesced,
+                "dropped": self.dropped,
+                "pending": len(self._pending),
+                "backends": {name: stats.as_dict() for name, stats in self._stats.items()},
+            }
+
+    def close(self, timeout=None):
+        """Deliver what is queued (up to ``timeout`` seconds), then stop the workers."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for worker in self._workers:
+            worker.join(None if deadline is None else max(0, deadline - time.monotonic()))
+
+    @property
+    def sink_name(self):
+        """Name of the current sink, as used for its entry in ``stats()["backends"]``."""
+        return getattr(self.sink, "name", type(self.sink).__name__)
+
+    def _backend_stats(self):
+        name = self.sink_name
+        with self._cond:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = BackendStats()
+            return stats
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                notification = self._pending.popleft()
+            self._deliver(notification)
+
+    def _call(self, notification):
+        """Run ``sink.send`` with a timeout.
+
+        Raises BusyError if the sink could not be called, TimeoutError if
+        the call is still running after the timeout, or the sink's error.
+        """
+        if not self._call_slots.acquire(timeout=self.timeout):
+            raise BusyError
+        done = threading.Event()
+        outcome = {}
+
+        def run():
+            try:
+                self.sink.send(notification)
+            except Exception as e:
+                outcome["error"] = e
+            finally:
+                self._call_slots.release()
+                done.set()
+
+        threading.Thread(target=run, name="HydroBuddyNotify", daemon=True).start()
+        if not done.wait(self.timeout):
+            raise TimeoutError
+        if "error" in outcome:
+            raise outcome["error"]
+
+    def _deliver(self, notification):
+        stats = self._backend_stats()
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                stats.count("retries")
+                time.sleep(self.backoff * (2 ** (attempt - 1)))
+            start = time.monotonic()
+            try:
+                self._call(notification)
+            except BusyError:
+                error = f"no free call slot after {self.timeout}s"
+                continue
+            except TimeoutError:
+                # The call may still finish and show the notification, so
+                # retrying could show it twice
+                stats.count("timeouts")
+                error = f"timed out after {self.timeout}s (not retried)"
+                break
+            except Exception as e:
+                error = e
+                continue
+            latency = time.monotonic() - start
+            stats.record(latency)
+            if metrics.enabled:
+                metrics.observe_stage("notify_delivery", latency)
+            return True
+        stats.count("failures")
+        if metrics.enabled:
+            metrics.record_error("notify_delivery")
+        print(f"Notification error ({self.sink_name}): {error}")
+        return False
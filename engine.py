@@ -0,0 +1,197 @@
+"""
+HydroBuddy engine - Run many independent reminder profiles in one process.
+
+Every profile has its own interval, messages, sound and counter. All of them
+are driven by a single timer thread that sleeps until the earliest deadline
+in a heap, so the cost of an idle profile is one heap entry and one small
+object rather than a thread. Like the scheduler, the engine reads and waits
+on time through a clock (see clock.py), so it also runs on a virtual clock.
+"""
+
+import heapq
+import itertools
+import random
+import threading
+
+from clock import system_clock
+from messages import DEFAULT_MESSAGES, MessagePool
+from scheduler import advance_deadline
+
+# Shared by every profile's message pool; a Random per profile would cost
+# more than the rest of the profile.
+_rng = random.Random()
+
+
+class Profile:
+    """Reminder settings and state for one user."""
+
+    __slots__ = ("name", "interval", "message_pool", "sound", "count", "deadline", "_version")
+
+    def __init__(self, name, interval=15 * 60, messages=None, sound=None):
+        self.name = name
+        self.interval = interval
+        # Each profile cycles through its own messages without repeats
+        self.message_pool = MessagePool(messages or DEFAULT_MESSAGES, rng=_rng)
+        self.sound = sound
+        self.count = 0
+        self.deadline = None
+        # Heap entries carry the version they were scheduled with; bumping it
+        # invalidates an entry without searching the heap.
+        self._version = 0
+
+    @property
+    def messages(self):
+        return self.message_pool.messages
+
+    def __repr__(self):
+        return f"Profile({self.name!r}, interval={self.interval}, count={self.count})"
+
+
+class ReminderEngine:
+    """Drives many profiles from one priority-queue timer loop.
+
+    ``dispatch(profile, message)`` is called on the engine thread each time
+    a profile is due, after its counter has been incremented. Keep it short,
+    or hand the work to another thread, since it delays the profiles due
+    after it. ``clock`` defaults to the system clock.
+    """
+
+    def __init__(self, dispatch, clock=None):
+        self.dispatch = dispatch
+        self.clock = clock or system_clock
+        self.profiles = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+        # Lateness of dispatches (actual - planned), in seconds
+        self.dispatched = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.lag_samples = None  # set to a list to record every sample
+
+    def _push(self, profile):
+        heapq.heappush(self._heap, (profile.deadline, next(self._seq), profile._version, profile))
+
+    def add_profile(self, profile, first_in=None):
+        """Add a profile. Its first reminder is due after ``first_in`` seconds (default: one interval)."""
+        with self._cond:
+            if profile.name in self.profiles:
+                raise ValueError(f"Profile already exists: {profile.name}")
+            delay = profile.interval if first_in is None else first_in
+            profile.deadline = self.clock.monotonic() + delay
+            self.profiles[profile.name] = profile
+            self._push(profile)
+            self._cond.notify()
+        return profile
+
+    def remove_profile(self, name):
+        with self._cond:
+            profile = self.profiles.pop(name)
+            profile._version += 1
+        return profile
+
+    def set_interval(self, name, interval):
+        """Change a profile's interval, measured from its previous reminder."""
+        with self._cond:
+            profile = self.profiles[name]
+            profile.deadline += interval - profile.interval
+            profile.interval = interval
+            profile._version += 1
+            self._push(profile)
+            self._cond.notify()
+
+    def fire_now(self, name):
+        with self._cond:
+            profile = self.profiles[name]
+            profile.deadline = self.clock.monotonic()
+            profile._version += 1
+            self._push(profile)
+            self._cond.notify()
+
+    def next_deadline(self, name):
+        with self._cond:
+            return self.profiles[name].deadline
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._loop, name="HydroBuddyEngine", daemon=True)
+        self._thread.start()
+
+    def run(self):
+        """Run the engine in the calling thread until ``stop()`` is called."""
+        with self._cond:
+            self._running = True
+        self._loop()
+
+    def stop(self, timeout=None):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        self._thread = None
+
+    def stats(self):
+        with self._cond:
+            return {
+                "profiles": len(self.profiles),
+                "heap_entries": len(self._heap),
+                "dispatched": self.dispatched,
+                "mean_lag": self.total_lag / self.dispatched if self.dispatched else 0.0,
+                "max_lag": self.max_lag,
+            }
+
+    def _next_due(self):
+        """Pop the next valid due profile, or return the time to wait for one."""
+        heap = self._heap
+        while heap:
+            deadline, _, version, profile = heap[0]
+            if version != profile._version:
+                heapq.heappop(heap)
+                continue
+            remaining = deadline - self.clock.monotonic()
+            if remaining > 0:
+                return None, remaining
+            heapq.heappop(heap)
+            return profile, 0
+        return None, None
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while True:
+                    if not self._running:
+                        return
+                    profile, wait = self._next_due()
+                    if profile is not None:
+                        break
+                    self.clock.wait(self._cond, wait)
+
+                now = self.clock.monotonic()
+                planned = profile.deadline
+                lag = now - planned
+                profile.count += 1
+                # Drift-free: the next deadline follows the planned one,
+                # skipping whole periods that were missed.
+                profile.deadline = advance_deadline(planned, profile.interval, now)
+                self._push(profile)
+
+                self.dispatched += 1
+                self.total_lag += lag
+                if lag > self.max_lag:
+                    self.max_lag = lag
+                if self.lag_samples is not None:
+                    self.lag_samples.append(lag)
+                message = profile.message_pool.next()
+
+            try:
+                self.dispatch(profile, message)
+            except Exception as e:
+                print(f"Dispatch error for {profile.name}: {e}")
@@ -0,0 +1,206 @@
+"""
+HydroBuddy export - Stream the reminder history out as CSV, JSON Lines or SQLite.
+
+The export is a generator pipeline: entries stream out of the history
+backend (across rotated segments, and only for the requested time range),
+pass a progress counter, become plain records and go straight to the
+writer. Nothing is collected in memory, so exporting a log of millions of
+lines needs no more memory than exporting ten.
+"""
+
+import csv
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+
+FORMATS = ("csv", "jsonl", "sqlite")
+FIELDS = ("timestamp", "source", "message", "number")
+_EXTENSIONS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".db": "sqlite", ".sqlite": "sqlite",
+               ".sqlite3": "sqlite"}
+
+
+def parse_time(value, end=False):
+    """Parse a time filter: an ISO date or date-time, "today", "yesterday" or "7d" / "12h" ago.
+
+    A bare date used as an end bound means the end of that day. A time with
+    a UTC offset ("...+02:00", "...Z") is converted to local time, in which
+    the log is kept.
+    """
+    text = value.strip().lower()
+    now = datetime.now()
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if text == "today":
+        return midnight + timedelta(days=1) if end else midnight
+    if text == "yesterday":
+        return midnight if end else midnight - timedelta(days=1)
+    if text[-1:] in ("d", "h") and text[:-1].isdigit():
+        amount = int(text[:-1])
+        return now - (timedelta(days=amount) if text[-1] == "d" else timedelta(hours=amount))
+    try:
+        moment = datetime.fromisoformat(value.strip())
+    except ValueError:
+        raise ValueError(f"Invalid time: {value} (use YYYY-MM-DD, YYYY-MM-DDTHH:MM, today, yesterday, 7d or 12h)")
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    if end and len(value.strip()) == 10:
+        moment += timedelta(days=1)
+    return moment
+
+
+def guess_format(output):
+    """The format implied by the output file's extension, or None."""
+    if output in (None, "-"):
+        return None
+    return _EXTENSIONS.get(os.path.splitext(output)[1].lower())
+
+
+# --- Pipeline stages ---
+
+def to_records(entries):
+    """History entries as dicts of plain values."""
+    for entry in entries:
+        yield {
+            "timestamp": entry.timestamp.isoformat(),
+            "source": entry.source,
+            "message": entry.message,
+            "number": entry.number,
+        }
+
+
+class Progress:
+    """Counts entries passing through and, if ``enabled``, reports to stderr about once a second.
+
+    With a time range, the position of the current entry's timestamp in that
+    range gives an estimate of how far the export has got.
+    """
+
+    def __init__(self, enabled=True, stream=sys.stderr, interval=1.0, first=None, last=None):
+        self.enabled = enabled
+        self.stream = stream
+        self.interval = interval
+        self.first = first
+        self.last = last
+        self.count = 0
+        self.started = time.perf_counter()
+        self._next_report = self.started + interval
+        self._line_open = False
+
+    def track(self, entries):
+        for entry in entries:
+            self.count += 1
+            if self.first is None:
+                self.first = entry.timestamp
+            if self.enabled and self.count % 1024 == 0 and time.perf_counter() >= self._next_report:
+                self.report(entry.timestamp)
+            yield entry
+
+    def report(self, current=None):
+        elapsed = time.perf_counter() - self.started
+        line = f"{self.count:,} entries in {elapsed:.1f}s ({self.count / elapsed if elapsed else 0:,.0f}/s)"
+        if current is not None and self.first is not None and self.last is not None and self.last > self.first:
+            fraction = (current - self.first) / (self.last - self.first)
+            line += f", ~{min(max(fraction, 0.0), 1.0) * 100:.0f}%"
+        if self.stream.isatty():
+            self.stream.write("\r" + line.ljust(60))
+            self._line_open = True
+        else:
+            self.stream.write(line + "\n")
+        self.stream.flush()
+        self._next_report = time.perf_counter() + self.interval
+
+    def finish(self):
+        if not self.enabled:
+            return
+        if self._line_open:
+            self.stream.write("\n")
+        elapsed = time.perf_counter() - self.started
+        self.stream.write(f"Exported {self.count:,} entries in {elapsed:.1f}s\n")
+        self.stream.flush()
+
+
+# --- Writers ---
+
+def write_csv(records, out):
+    writer = csv.DictWriter(out, fieldnames=FIELDS)
+    writer.writeheader()
+    writer.writerows(records)
+
+
+def write_jsonl(records, out):
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    for record in records:
+        out.write(encode(record) + "\n")
+
+
+def write_sqlite(entries, path, batch_size=5000):
+    """Write entries into a HydroBuddy SQLite history at ``path``, one transaction per batch.
+
+    A ``reminders_local`` view shows the timestamps as local date-times.
+    """
+    import sqlite3
+    from history import SQLiteHistory
+
+    store = SQLiteHistory(path)
+    try:
+        entries = iter(entries)
+        while True:
+            batch = list(islice(entries, batch_size))
+            if not batch:
+                break
+            store.append_many(batch)
+    finally:
+        store.close()
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            conn.execute(
+                "CREATE VIEW IF NOT EXISTS reminders_local AS SELECT id, "
+                "datetime(ts, 'unixepoch', 'localtime') AS timestamp, source, message, number FROM reminders"
+            )
+    finally:
+        conn.close()
+
+
+def export(backend, fmt, output="-", start=None, end=None, progress=True):
+    """Stream the entries of ``backend`` between ``start`` and ``end`` to ``output``.
+
+    ``output`` is a path, or "-" for stdout (CSV and JSON Lines only).
+    Files are written under a temporary name and renamed when complete.
+    Returns the number of entries exported.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt} (choose from {', '.join(FORMATS)})")
+    if fmt == "sqlite" and output in (None, "-"):
+        raise ValueError("SQLite exports need an output file")
+    if fmt == "sqlite" and os.path.exists(output):
+        raise ValueError(f"{output} already exists")
+
+    last = end
+    if progress and last is None:
+        newest = backend.reader().tail(1)
+        last = newest[-1].timestamp if newest else None
+    tracker = Progress(enabled=progress, first=start, last=last)
+    entries = tracker.track(backend.entries(start, end))
+    write_records = write_csv if fmt == "csv" else write_jsonl
+
+    if output in (None, "-"):
+        write_records(to_records(entries), sys.stdout)
+        sys.stdout.flush()
+    else:
+        temp_path = output + ".tmp"
+        try:
+            if fmt == "sqlite":
+                write_sqlite(entries, temp_path)
+            else:
+                with open(temp_path, "w", encoding="utf-8", newline="" if fmt == "csv" else None) as out:
+                    write_records(to_records(entries), out)
+            os.replace(temp_path, output)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    tracker.finish()
+    return tracker.count
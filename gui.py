@@ -8,46 +8,83 @@ from tkinter import ttk, scrolledtext, messagebox, filedialog
 import threading
 import time
 import os
+import importlib.util
 from datetime import datetime
+import metrics
 import reminder
+from history_view import HistoryView
+from scheduler import ReminderScheduler
+from ui_queue import FRAME_MS, UpdateQueue
 
-# Optional system tray support
+# Optional system tray support. pystray and PIL are only imported when the
+# window is first minimized to the tray, so they do not delay startup.
 try:
-    import pystray
-    from PIL import Image, ImageDraw
-    TRAY_AVAILABLE = True
-except ImportError:
-    TRAY_AVAILABLE = False
+    TRAY_AVAILABLE = all(importlib.util.find_spec(name) is not None for name in ("pystray", "PIL"))
 except Exception:
     # Handle other platform-specific issues
     TRAY_AVAILABLE = False
 
 class HydroBuddyGUI:
-    def __init__(self, root):
+    def __init__(self, root, scheduler=None):
         self.root = root
         self.root.title("HydroBuddy - Hydration Reminder")
         self.root.geometry("600x500")
         self.root.resizable(True, True)
         
+        # Worker threads post widget updates here; the Tk loop applies them
+        # once per frame, merging repeated updates of the same widget
+        self.updates = UpdateQueue()
+        metrics.registry.add_collector(self.update_queue_metrics)
+        
+        # Settings (interval, messages, sound) come from the settings file,
+        # which is watched so that edits apply while running
+        self.settings = reminder.get_settings()
+        self.settings.add_listener(self.on_settings_changed)
+        self.settings.watch()
+        
         # Application state
-        self.is_running = False
-        self.reminder_thread = None
-        self.reminder_interval = 15 * 60  # 15 minutes in seconds
-        self.custom_messages = []
+        self.reminder_interval = self.settings.get("interval_minutes") * 60
+        # Tray mode hands over its scheduler, possibly running, when the
+        # window is opened from the tray menu
+        if scheduler is None:
+            scheduler = ReminderScheduler(self.reminder_interval, self.send_scheduled_reminder)
+        scheduler.callback = self.send_scheduled_reminder
+        self.scheduler = scheduler
+        self.is_running = scheduler.running
         self.minimized_to_tray = False
         self.tray_icon = None
+        # Serves commands from later launches (see instance.py), if set
+        self.control_server = None
+        
+        # Reminder history is read incrementally from the history backend
+        self.history_reader = reminder.history_backend.reader()
+        self.history_loaded = False
+        # Search index over the history, built in the background after startup
+        self.history_index = None
+        self.search_result = None  # shown instead of the history while filtering
+        self.search_generation = 0
+        self.search_after_id = None
+        # Hydration statistics, built the first time the Stats window opens
+        self.hydration_stats = None
+        self.stats_lock = threading.Lock()
+        # Refresh the history whenever the background writer has written entries
+        reminder.get_log_writer().add_listener(self.on_log_written)
         
         # Set up the GUI
         self.setup_gui()
         self.load_log_history()
+        if self.is_running:
+            self.start_stop_btn.config(text="Stop Reminders")
+            self.status_label.config(text="Running", foreground="green")
+            self.update_next_reminder_time()
         
-        # Set up system tray if available
-        try:
-            if TRAY_AVAILABLE:
-                self.setup_tray()
-        except Exception as e:
-            print(f"System tray not available: {e}")
-            # Note: Can't modify global from here, but that's ok
+        # The system tray icon is set up the first time it is needed
+        
+        self.root.after(FRAME_MS, self.process_updates)
+        self.root.after(1000, self.start_history_index)
+        
+        # F12 opens the metrics debug panel
+        self.root.bind("<F12>", lambda event: self.open_metrics())
         
         # Handle window closing
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
@@ -100,7 +137,7 @@ class HydroBuddyGUI:
         self.start_stop_btn.grid(row=0, column=0, columnspan=2, sticky="ew", pady=(0, 5))
 
         ttk.Label(control_frame, text="Reminder Interval (minutes):").grid(row=1, column=0, sticky="w")
-        self.interval_var = tk.StringVar(value="15")
+        self.interval_var = tk.StringVar(value=str(self.reminder_interval // 60))
         interval_spinbox = ttk.Spinbox(control_frame, from_=1, to=120, textvariable=self.interval_var, width=10)
         interval_spinbox.grid(row=1, column=1, sticky="e")
         interval_spinbox.bind('<FocusOut>', self.update_interval)
@@ -113,11 +150,39 @@ class HydroBuddyGUI:
         # Make the log frame fill all available space (horizontal and vertical)
         log_frame.grid(row=3, column=0, columnspan=2, sticky="nsew", pady=(0, 10))
         # Configure grid inside the log_frame to make the text widget expand
-        log_frame.rowconfigure(0, weight=1)
+        log_frame.rowconfigure(1, weight=1)
         log_frame.columnconfigure(0, weight=1)
 
-        self.log_text = scrolledtext.ScrolledText(log_frame, height=10, state=tk.DISABLED)
-        self.log_text.grid(row=0, column=0, sticky="nsew")
+        # Filter bar: date range, source and message text
+        filter_frame = ttk.Frame(log_frame)
+        filter_frame.grid(row=0, column=0, columnspan=2, sticky="ew", pady=(0, 5))
+        filter_frame.columnconfigure(7, weight=1)
+        self.filter_from_var = tk.StringVar()
+        self.filter_to_var = tk.StringVar()
+        self.filter_source_var = tk.StringVar(value="All")
+        self.filter_text_var = tk.StringVar()
+        ttk.Label(filter_frame, text="From:").grid(row=0, column=0, sticky="w")
+        ttk.Entry(filter_frame, textvariable=self.filter_from_var, width=11).grid(row=0, column=1, padx=(2, 6))
+        ttk.Label(filter_frame, text="To:").grid(row=0, column=2, sticky="w")
+        ttk.Entry(filter_frame, textvariable=self.filter_to_var, width=11).grid(row=0, column=3, padx=(2, 6))
+        ttk.Label(filter_frame, text="Source:").grid(row=0, column=4, sticky="w")
+        self.filter_source_box = ttk.Combobox(filter_frame, textvariable=self.filter_source_var, values=["All"],
+                                              state="readonly", width=9, postcommand=self.update_source_choices)
+        self.filter_source_box.grid(row=0, column=5, padx=(2, 6))
+        ttk.Label(filter_frame, text="Search:").grid(row=0, column=6, sticky="w")
+        ttk.Entry(filter_frame, textvariable=self.filter_text_var).grid(row=0, column=7, sticky="ew", padx=(2, 6))
+        ttk.Button(filter_frame, text="Clear", command=self.clear_filters).grid(row=0, column=8)
+        self.search_status_label = ttk.Label(filter_frame, text="", foreground="gray")
+        self.search_status_label.grid(row=1, column=0, columnspan=9, sticky="w")
+        for var in (self.filter_from_var, self.filter_to_var, self.filter_source_var, self.filter_text_var):
+            var.trace_add("write", lambda *args: self.schedule_search())
+
+        # Only a window of rows is kept; older pages load as you scroll up
+        self.history_view = HistoryView(
+            log_frame, self.history_reader,
+            empty_text="No reminders logged yet. Start sending reminders to create a history.",
+        )
+        self.history_view.grid(row=1, column=0, sticky="nsew")
 
         # --- Buttons frame ---
         buttons_frame = ttk.Frame(main_frame)
@@ -127,6 +192,8 @@ class HydroBuddyGUI:
         refresh_btn.pack(side=tk.LEFT, padx=(0, 10))
         clear_btn = ttk.Button(buttons_frame, text="Clear Log", command=self.clear_log)
         clear_btn.pack(side=tk.LEFT, padx=(0, 10))
+        stats_btn = ttk.Button(buttons_frame, text="Stats", command=self.open_stats)
+        stats_btn.pack(side=tk.LEFT, padx=(0, 10))
         settings_btn = ttk.Button(buttons_frame, text="Settings", command=self.open_settings)
         settings_btn.pack(side=tk.LEFT, padx=(0, 10))
         if TRAY_AVAILABLE:
@@ -149,81 +216,44 @@ class HydroBuddyGUI:
         # Update interval from GUI
         self.update_interval()
         
-        # Start reminder thread
-        self.reminder_thread = threading.Thread(target=self.reminder_loop, daemon=True)
-        self.reminder_thread.start()
+        # Start the scheduler; the first reminder fires right away
+        self.scheduler.start()
         
         self.update_next_reminder_time()
     
     def stop_reminders(self):
         """Stop the reminder system."""
         self.is_running = False
+        self.scheduler.stop(timeout=0)
         self.start_stop_btn.config(text="Start Reminders")
         self.status_label.config(text="Stopped", foreground="red")
         self.next_reminder_label.config(text="Not scheduled")
     
-    def reminder_loop(self):
-        """Main reminder loop running in a separate thread."""
-        while self.is_running:
-            self.send_reminder()
-            
-            # Sleep in small intervals to allow for interruption
-            sleep_time = 0
-            while sleep_time < self.reminder_interval and self.is_running:
-                time.sleep(1)
-                sleep_time += 1
-                
-                # Update next reminder time every 10 seconds
-                if sleep_time % 10 == 0:
-                    self.root.after(0, self.update_next_reminder_time)
+    def send_scheduled_reminder(self):
+        """Called by the scheduler when a reminder is due."""
+        self.send_reminder("GUI", lag=self.scheduler.last_lag)
     
-    def send_reminder(self):
+    def send_reminder(self, source="GUI", lag=None):
         """Send a hydration reminder."""
-        reminder.reminder_count += 1
-        message = reminder.get_random_message()
-        
-        # Send notification
-        try:
-            reminder.notification.notify(
-                title=f"Hydration Reminder {reminder.reminder_count}",
-                message=message,
-                app_name="HydroBuddy",
-                timeout=10
-            )
-        except Exception as e:
-            print(f"Notification error: {e}")
+        number = reminder.state.next_number(source)
+        reminder.deliver_reminder(source, f"Hydration Reminder {number}", number, lag)
         
-        # Log the reminder
-        reminder.log_reminder()
-        
-        # Play sound
-        try:
-            reminder.play_sound()
-        except Exception as e:
-            print(f"Sound error: {e}")
-        
-        # Update GUI
-        self.root.after(0, self.update_reminder_count)
-        self.root.after(0, self.load_log_history)
+        # Update GUI (the history refreshes once the log writer has written the entry)
+        self.updates.post("count", self.update_reminder_count)
+        self.updates.post("next_reminder", self.update_next_reminder_time)
     
     def send_manual_reminder(self):
         """Send a manual reminder immediately."""
         if not self.is_running:
             # Send reminder without affecting the counter or timing
-            message = reminder.get_random_message()
             try:
-                reminder.notification.notify(
-                    title="Manual Hydration Reminder",
-                    message=message,
-                    app_name="HydroBuddy",
-                    timeout=10
-                )
-                reminder.play_sound()
+                reminder.deliver_reminder("manual", "Manual Hydration Reminder")
             except Exception as e:
                 messagebox.showerror("Error", f"Could not send reminder: {e}")
         else:
-            # If running, send a scheduled reminder now
-            threading.Thread(target=self.send_reminder, daemon=True).start()
+            # If running, send a counted reminder now. Notification, logging
+            # and sound are all queued, so this does not need its own thread.
+            self.send_reminder("manual")
     
     def update_interval(self, event=None):
         """Update the reminder interval from the GUI."""
@@ -237,58 +267,287 @@ class HydroBuddyGUI:
                 self.interval_var.set("120")
             
             self.reminder_interval = minutes * 60
-            self.update_next_reminder_time()
         except ValueError:
             self.interval_var.set("15")
             self.reminder_interval = 15 * 60
+        # Takes effect immediately, measured from the last reminder
+        self.scheduler.set_interval(self.reminder_interval)
+        self.update_next_reminder_time()
+        # Remember it for the next start
+        try:
+            self.settings.save(interval_minutes=self.reminder_interval // 60)
+        except OSError as e:
+            print(f"Could not save settings: {e}")
+    
+    def on_settings_changed(self, old, new):
+        """Called (from the settings listener thread) when the settings changed."""
+        if new["interval_minutes"] != old["interval_minutes"]:
+            def apply():
+                if int(new["interval_minutes"]) * 60 != self.reminder_interval:
+                    self.interval_var.set(str(new["interval_minutes"]))
+                    self.update_interval()
+            self.updates.post("settings", apply)
+    
+    def process_updates(self):
+        """Apply the updates posted since the last frame, then wait for the next one."""
+        self.updates.apply()
+        try:
+            self.root.after(FRAME_MS, self.process_updates)
+        except tk.TclError:
+            pass  # an update closed the window
+    
+    def update_queue_metrics(self):
+        """Samples for the metrics export (see metrics.Metrics.add_collector)."""
+        stats = self.updates.stats()
+        return [
+            ("hydrobuddy_gui_updates_posted_total", "counter", "GUI updates posted by worker threads.",
+             stats["posted"]),
+            ("hydrobuddy_gui_updates_merged_total", "counter", "GUI updates merged into a later one.",
+             stats["merged"]),
+        ]
     
     def update_reminder_count(self):
         """Update the reminder count display."""
-        self.count_label.config(text=str(reminder.reminder_count))
+        self.count_label.config(text=str(reminder.state.count))
     
     def update_next_reminder_time(self):
         """Update the next reminder time display."""
-        if self.is_running:
-            next_time = datetime.now().timestamp() + self.reminder_interval
+        next_time = self.scheduler.next_fire_time()
+        if self.is_running and next_time is not None:
             next_time_str = datetime.fromtimestamp(next_time).strftime("%H:%M:%S")
             self.next_reminder_label.config(text=next_time_str)
     
-    def load_log_history(self):
-        """Load and display the reminder history from the log file."""
-        log_file_path = os.path.join(os.path.dirname(__file__), "hydration_log.txt")
-        
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.delete(1.0, tk.END)
-        
+    def load_log_history(self, full=False):
+        """Load and display the reminder history.
+
+        The first load (or ``full=True``) shows the newest page of the
+        history; later calls only append the entries written since the
+        previous load.
+        """
         try:
-            if os.path.exists(log_file_path):
-                with open(log_file_path, "r") as log_file:
-                    lines = log_file.readlines()
-                    # Show last 50 entries
-                    for line in lines[-50:]:
-                        self.log_text.insert(tk.END, line)
-                
-                # Scroll to the bottom
-                self.log_text.see(tk.END)
+            if full or not self.history_loaded:
+                self.history_view.reload()
+                self.history_loaded = True
             else:
-                self.log_text.insert(tk.END, "No log file found. Start sending reminders to create one.\n")
+                self.history_view.refresh()
         except Exception as e:
-            self.log_text.insert(tk.END, f"Error reading log file: {e}\n")
-        
-        self.log_text.config(state=tk.DISABLED)
+            self.history_loaded = False
+            self.history_view.text.config(state=tk.NORMAL)
+            self.history_view.text.insert(tk.END, f"Error reading reminder history: {e}\n")
+            self.history_view.text.config(state=tk.DISABLED)
+    
+    def on_log_written(self):
+        """Called from the log writer thread after new entries were written."""
+        if self.history_index is not None:
+            # A filtered view refreshes once the new entries are indexed
+            self.history_index.request_update()
+        if self.search_result is None:
+            self.updates.post("history", self.load_log_history)
+    
+    # --- History search ---
+    
+    def start_history_index(self):
+        """Start indexing the history in the background for the filter bar."""
+        from history_index import BackgroundIndex
+        if self.history_index is None:
+            self.history_index = BackgroundIndex(reminder.history_backend, on_indexed=self.on_history_indexed)
+    
+    def on_history_indexed(self, added, building):
+        """Called from the index worker after new entries were indexed."""
+        def apply():
+            if self.search_result is None:
+                if building:
+                    self.search_status_label.config(
+                        text=f"Indexing history... {len(self.history_index.index):,} entries")
+                elif self.search_status_label.cget("text").startswith("Indexing"):
+                    self.search_status_label.config(text="")
+            elif self.search_result.indexing:
+                # The results so far only covered part of the history
+                self.run_search()
+            else:
+                self.load_log_history()
+                self.show_search_status(self.search_result)
+        self.updates.post("history-index", apply)
+    
+    def read_filters(self):
+        """The filter bar as search keywords, or None when no filter is set."""
+        from export import parse_time
+        since = self.filter_from_var.get().strip()
+        until = self.filter_to_var.get().strip()
+        source = self.filter_source_var.get()
+        text = self.filter_text_var.get().strip()
+        if not (since or until or text or source not in ("", "All")):
+            return None
+        return {
+            "start": parse_time(since) if since else None,
+            "end": parse_time(until, end=True) if until else None,
+            "source": None if source in ("", "All") else source,
+            "text": text or None,
+        }
+    
+    def schedule_search(self, delay=200):
+        """Search once typing pauses for ``delay`` ms."""
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(delay, self.run_search)
+    
+    def run_search(self):
+        """Ask the index worker for the entries matching the filter bar."""
+        self.search_after_id = None
+        self.search_generation += 1
+        try:
+            filters = self.read_filters()
+        except ValueError as e:
+            self.search_status_label.config(text=str(e))
+            return
+        if filters is None:
+            self.show_history()
+            return
+        if self.history_index is None:
+            self.start_history_index()
+        generation = self.search_generation
+        
+        def done(result):
+            # Runs on the index worker
+            self.updates.post("search", lambda: self.show_search_result(generation, result))
+        self.history_index.search(done, **filters)
+    
+    def show_search_result(self, generation, result):
+        if generation != self.search_generation:
+            return  # the filters changed since
+        if isinstance(result, Exception):
+            self.search_status_label.config(text=f"Search failed: {result}")
+            return
+        self.search_result = result
+        self.history_view.set_reader(result, empty_text="No reminders match the filter.")
+        self.show_search_status(result)
+    
+    def show_search_status(self, result):
+        text = f"{result.total:,} matching reminders (searched in {result.elapsed_ms:.1f} ms)"
+        if result.indexing:
+            text += f", still indexing... {len(self.history_index.index):,} entries so far"
+        self.search_status_label.config(text=text)
+    
+    def show_history(self):
+        """Go back to the unfiltered history."""
+        if self.search_result is None:
+            return
+        self.search_result = None
+        self.search_status_label.config(text="")
+        self.history_view.set_reader(
+            self.history_reader,
+            empty_text="No reminders logged yet. Start sending reminders to create a history.",
+        )
+    
+    def clear_filters(self):
+        for var in (self.filter_from_var, self.filter_to_var, self.filter_text_var):
+            var.set("")
+        self.filter_source_var.set("All")
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+        self.run_search()
+    
+    def update_source_choices(self):
+        """Fill the source list with the sources seen in the history."""
+        sources = self.history_index.index.sources() if self.history_index is not None else []
+        self.filter_source_box.config(values=["All"] + sources)
     
     def clear_log(self):
         """Clear the reminder log file."""
         if messagebox.askyesno("Clear Log", "Are you sure you want to clear the reminder history?"):
-            log_file_path = os.path.join(os.path.dirname(__file__), "hydration_log.txt")
             try:
-                if os.path.exists(log_file_path):
-                    os.remove(log_file_path)
-                self.load_log_history()
+                reminder.get_log_writer().flush()
+                reminder.history_backend.clear()
+                self.hydration_stats = None
+                self.history_reader.reset()
+                if self.history_index is not None:
+                    self.history_index.request_reset()
+                self.clear_filters()
+                self.load_log_history(full=True)
                 messagebox.showinfo("Success", "Log cleared successfully!")
             except Exception as e:
                 messagebox.showerror("Error", f"Could not clear log: {e}")
     
+    def open_stats(self):
+        """Open the hydration statistics window."""
+        stats_window = tk.Toplevel(self.root)
+        stats_window.title("HydroBuddy Stats")
+        stats_window.geometry("560x520")
+        
+        frame = ttk.Frame(stats_window, padding="10")
+        frame.pack(fill=tk.BOTH, expand=True)
+        
+        stats_text = scrolledtext.ScrolledText(frame, height=20, font=("Courier", 10))
+        stats_text.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
+        status_label = ttk.Label(frame, text="")
+        status_label.pack(side=tk.LEFT)
+        
+        def show(text, status):
+            if not stats_window.winfo_exists():
+                return
+            stats_text.config(state=tk.NORMAL)
+            stats_text.delete(1.0, tk.END)
+            stats_text.insert(tk.END, text)
+            stats_text.config(state=tk.DISABLED)
+            status_label.config(text=status)
+        
+        def compute():
+            # Runs on a worker thread: the first load parses the whole history.
+            # analytics (and NumPy, if installed) is only imported when needed.
+            try:
+                import analytics
+                with self.stats_lock:
+                    if self.hydration_stats is None:
+                        self.hydration_stats = analytics.HydrationStats(reminder.history_backend)
+                    start = time.perf_counter()
+                    self.hydration_stats.update()
+                    summary = self.hydration_stats.summary()
+                    elapsed = (time.perf_counter() - start) * 1000
+                text = analytics.format_summary(summary)
+                status = f"Updated in {elapsed:.0f} ms"
+            except Exception as e:
+                text, status = f"Could not compute statistics: {e}", ""
+            self.updates.post(("stats", id(stats_window)), lambda: show(text, status))
+        
+        def refresh():
+            status_label.config(text="Computing...")
+            threading.Thread(target=compute, daemon=True).start()
+        
+        ttk.Button(frame, text="Close", command=stats_window.destroy).pack(side=tk.RIGHT)
+        ttk.Button(frame, text="Refresh", command=refresh).pack(side=tk.RIGHT, padx=(0, 10))
+        refresh()
+    
+    def open_metrics(self):
+        """Open the debug panel with per-stage reminder timings (F12)."""
+        if not metrics.registry.enabled:
+            # Collection starts when the panel is first opened.
+            metrics.registry.reset()
+            metrics.registry.enable()
+        
+        metrics_window = tk.Toplevel(self.root)
+        metrics_window.title("HydroBuddy Metrics")
+        metrics_window.geometry("640x360")
+        
+        frame = ttk.Frame(metrics_window, padding="10")
+        frame.pack(fill=tk.BOTH, expand=True)
+        
+        metrics_text = scrolledtext.ScrolledText(frame, height=16, font=("Courier", 10))
+        metrics_text.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
+        
+        def update():
+            if not metrics_window.winfo_exists():
+                return
+            report = metrics.format_report(metrics.registry.snapshot())
+            metrics_text.config(state=tk.NORMAL)
+            metrics_text.delete(1.0, tk.END)
+            metrics_text.insert(tk.END, report)
+            metrics_text.config(state=tk.DISABLED)
+            metrics_window.after(1000, update)
+        
+        ttk.Button(frame, text="Close", command=metrics_window.destroy).pack(side=tk.RIGHT)
+        ttk.Button(frame, text="Reset", command=metrics.registry.reset).pack(side=tk.RIGHT, padx=(0, 10))
+        update()
+    
     def open_settings(self):
         """Open the settings window."""
         settings_window = tk.Toplevel(self.root)
@@ -303,14 +562,16 @@ class HydroBuddyGUI:
         frame = ttk.Frame(settings_window, padding="10")
         frame.pack(fill=tk.BOTH, expand=True)
         
+        current = self.settings.values
+        
         # Sound file selection
         ttk.Label(frame, text="Sound File:").pack(anchor=tk.W)
         sound_frame = ttk.Frame(frame)
         sound_frame.pack(fill=tk.X, pady=(0, 10))
         
-        current_sound = os.path.join(os.path.dirname(__file__), "MGS_Alert.mp3")
-        sound_label = ttk.Label(sound_frame, text=os.path.basename(current_sound))
+        sound_label = ttk.Label(sound_frame, text=os.path.basename(current["sound"]))
         sound_label.pack(side=tk.LEFT)
+        chosen_sound = {"path": current["sound"]}
         
         def choose_sound():
             filename = filedialog.askopenfilename(
@@ -318,6 +579,7 @@ class HydroBuddyGUI:
                 filetypes=[("Audio files", "*.mp3 *.wav *.ogg")]
             )
             if filename:
+                chosen_sound["path"] = filename
                 sound_label.config(text=os.path.basename(filename))
         
         ttk.Button(sound_frame, text="Browse", command=choose_sound).pack(side=tk.RIGHT)
@@ -329,64 +591,66 @@ class HydroBuddyGUI:
         messages_text.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
         
         # Load current messages
-        current_messages = "\n".join(reminder.get_random_message.__defaults__[0] if hasattr(reminder.get_random_message, '__defaults__') else [
-            "Stay hydrated! Drink some water! 💧",
-            "Your body needs water! Drink up! 🌊",
-            "Don't forget to hydrate, it's important! 💦",
-            "Drink water, it's great for your skin and energy! ✨",
-            "Time to hydrate! Your body will thank you! 😄"
-        ])
-        messages_text.insert(tk.END, current_messages)
+        messages_text.insert(tk.END, "\n".join(current["messages"]))
         
         # Buttons
         button_frame = ttk.Frame(frame)
         button_frame.pack(fill=tk.X)
         
         def save_settings():
-            # Note: This is a placeholder for settings functionality
-            # In a more complete implementation, you'd save these settings
-            messagebox.showinfo("Settings", "Settings saved! (Note: Custom messages and sound changes require restart)")
+            messages = [line.strip() for line in messages_text.get(1.0, tk.END).splitlines() if line.strip()]
+            if not messages:
+                messagebox.showerror("Error", "Please enter at least one message.")
+                return
+            if not os.path.isfile(chosen_sound["path"]):
+                messagebox.showerror("Error", f"Sound file not found: {chosen_sound['path']}")
+                return
+            # Saving notifies reminder, which switches the message pool and
+            # decodes a new sound right away; both apply from the next reminder.
+            try:
+                self.settings.save(messages=messages, sound=chosen_sound["path"])
+            except OSError as e:
+                messagebox.showerror("Error", f"Could not save settings: {e}")
+                return
             settings_window.destroy()
         
         ttk.Button(button_frame, text="Cancel", command=settings_window.destroy).pack(side=tk.RIGHT)
         ttk.Button(button_frame, text="Save", command=save_settings).pack(side=tk.RIGHT, padx=(0, 10))
     
-    def on_closing(self):
+    def on_closing(self, confirm=True):
         """Handle application closing."""
         if self.is_running:
-            if messagebox.askokcancel("Quit", "Reminders are still running. Do you want to quit?"):
-                self.stop_reminders()
-                if self.tray_icon:
-                    self.tray_icon.stop()
-                self.root.destroy()
-        else:
-            if self.tray_icon:
-                self.tray_icon.stop()
-            self.root.destroy()
+            if confirm and not messagebox.askokcancel("Quit", "Reminders are still running. Do you want to quit?"):
+                return
+            self.stop_reminders()
+        if self.tray_icon:
+            self.tray_icon.stop()
+        if self.control_server is not None:
+            self.control_server.close()
+        if self.history_index is not None:
+            self.history_index.close()
+        # Write out any queued log entries before the window goes away
+        reminder.shutdown()
+        self.root.destroy()
 
     def setup_tray(self):
         """Set up the system tray icon."""
         if not TRAY_AVAILABLE:
             return
         
-        # Create a simple icon
-        def create_icon():
-            width = 64
-            height = 64
-            image = Image.new('RGB', (width, height), color='lightblue')
-            dc = ImageDraw.Draw(image)
-            dc.text((10, 20), "💧", fill='blue')
-            return image
+        import pystray
+        from tray import create_icon_image
         
         # Create tray menu
+        # (the menu runs on the tray's thread)
         def show_window(icon, item):
-            self.root.after(0, self.restore_from_tray)
+            self.updates.post("tray-show", self.restore_from_tray)
         
         def quit_app(icon, item):
-            self.root.after(0, self.on_closing)
+            self.updates.post("tray-quit", self.on_closing)
         
         def toggle_reminders(icon, item):
-            self.root.after(0, self.toggle_reminders)
+            self.updates.post("tray-toggle", self.toggle_reminders)
         
         menu = pystray.Menu(
             pystray.MenuItem("Show HydroBuddy", show_window, default=True),
@@ -395,13 +659,20 @@ class HydroBuddyGUI:
             pystray.MenuItem("Quit", quit_app)
         )
         
-        self.tray_icon = pystray.Icon("HydroBuddy", create_icon(), "HydroBuddy - Hydration Reminder", menu)
+        self.tray_icon = pystray.Icon("HydroBuddy", create_icon_image(), "HydroBuddy - Hydration Reminder", menu)
 
     def minimize_to_tray(self):
         """Minimize the application to the system tray."""
         if not TRAY_AVAILABLE or self.minimized_to_tray:
             return
         
+        if self.tray_icon is None:
+            try:
+                self.setup_tray()
+            except Exception as e:
+                print(f"System tray not available: {e}")
+                return
+        
         self.root.withdraw()
         self.minimized_to_tray = True
         
@@ -412,6 +683,52 @@ class HydroBuddyGUI:
         tray_thread = threading.Thread(target=run_tray, daemon=True)
         tray_thread.start()
 
+    def show_window(self):
+        """Bring the window to the front, restoring it from the tray if needed."""
+        if self.minimized_to_tray:
+            self.restore_from_tray()
+            return
+        self.root.deiconify()
+        self.root.lift()
+        self.root.focus_force()
+
+    def control_commands(self):
+        """Handlers for commands sent by other launches.
+
+        They run on the control server's thread, so they only post the work
+        to the update queue.
+        """
+        from instance import requested_interval, scheduler_status, tail_history
+
+        def status(request):
+            return scheduler_status("gui", self.scheduler, reminder.state.count)
+
+        def queued(action):
+            def handler(request):
+                self.updates.post(("control", request["cmd"]), action)
+                return {**status(request), "queued": True}
+            return handler
+
+        def set_interval(request):
+            # The interval box holds whole minutes, clamped like a typed value
+            minutes = max(1, round(requested_interval(request) / 60))
+
+            def apply():
+                self.interval_var.set(str(minutes))
+                self.update_interval()
+            return queued(apply)(request)
+
+        return {
+            "status": status,
+            "show": queued(self.show_window),
+            "fire-now": queued(self.send_manual_reminder),
+            "start": queued(lambda: self.is_running or self.start_reminders()),
+            "stop": queued(lambda: self.is_running and self.stop_reminders()),
+            "shutdown": queued(lambda: self.on_closing(confirm=False)),
+            "set-interval": set_interval,
+            "tail-history": lambda request: tail_history(request, reminder.history_backend.reader()),
+        }
+
     def restore_from_tray(self):
         """Restore the application from the system tray."""
         if not self.minimized_to_tray:
@@ -422,14 +739,23 @@ class HydroBuddyGUI:
         self.root.focus_force()
         self.minimized_to_tray = False
         
+        # A stopped icon cannot be run again; a new one is made on the next minimize
         if self.tray_icon:
             self.tray_icon.stop()
+            self.tray_icon = None
+
 
+def main(control_socket=None):
+    """Main function to run the GUI application.
 
-def main():
-    """Main function to run the GUI application."""
+    With ``control_socket``, other launches can show the window, fire a
+    reminder or stop the reminders through it.
+    """
     root = tk.Tk()
     app = HydroBuddyGUI(root)
+    if control_socket is not None:
+        from instance import ControlServer
+        app.control_server = ControlServer(app.control_commands(), control_socket).start()
     root.mainloop()
 
 
@@ -0,0 +1,441 @@
+"""
+HydroBuddy history - Pluggable storage backends for the reminder history.
+
+The plain-text log (``hydration_log.txt``) is the default backend. The SQLite
+backend keeps the same entries in an indexed table so that date-range and
+count queries do not need to scan the whole history.
+"""
+
+import os
+import re
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+from log_tail import LogTail
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are not locked
+    fcntl = None
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_TEXT_PATH = os.path.join(APP_DIR, "hydration_log.txt")
+DEFAULT_SQLITE_PATH = os.path.join(APP_DIR, "hydration_log.db")
+
+SOURCES = ("CLI", "GUI", "manual", "daemon")
+
+# A single reminder. ``source``, ``message`` and ``number`` are None for
+# entries written by older versions, which only logged the timestamp.
+HistoryEntry = namedtuple("HistoryEntry", ["timestamp", "source", "message", "number"])
+
+_LINE_RE = re.compile(
+    r"^Reminder sent at (\d{4}-\d\d-\d\d[ T][\d:.]+)"
+    r"(?: \[(\w+)(?: #(\d+))?\])?"
+    r"(?: (.*))?$"
+)
+
+
+def format_entry(entry):
+    """Format an entry as a line of the text log (without the newline)."""
+    line = f"Reminder sent at {entry.timestamp}"
+    if entry.source:
+        if entry.number is not None:
+            line += f" [{entry.source} #{entry.number}]"
+        else:
+            line += f" [{entry.source}]"
+    if entry.message:
+        line += f" {entry.message}"
+    return line
+
+
+def parse_line(line):
+    """Parse a line of the text log. Returns None for unrecognised lines."""
+    match = _LINE_RE.match(line.rstrip("\r\n"))
+    if not match:
+        return None
+    stamp, source, number, message = match.groups()
+    try:
+        timestamp = datetime.fromisoformat(stamp)
+    except ValueError:
+        return None
+    return HistoryEntry(timestamp, source, message or None, int(number) if number else None)
+
+
+def parse_timestamp(line):
+    """Parse only the timestamp of a text log line. Returns None for unrecognised lines."""
+    if not line.startswith("Reminder sent at "):
+        return None
+    # The date and time are followed by a space only if a tag or message follows.
+    end = line.find(" ", 28)
+    try:
+        return datetime.fromisoformat(line[17:end] if end != -1 else line[17:].rstrip("\r\n"))
+    except ValueError:
+        return None
+
+
+def lock_file(file):
+    """Block until this process holds an exclusive advisory lock on ``file``."""
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+
+
+def unlock_file(file):
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+def parse_lines(lines):
+    """Parse an iterable of log lines lazily, skipping unrecognised ones."""
+    for line in lines:
+        entry = parse_line(line)
+        if entry is not None:
+            yield entry
+
+
+class TextHistory:
+    """History stored as one line per reminder in a text file.
+
+    The file handle is kept open between writes; ``sync`` fsyncs it and
+    ``close`` releases it. Each batch is written under an advisory lock on
+    the file, so entries from several processes never interleave.
+    """
+
+    name = "text"
+
+    def __init__(self, path=DEFAULT_TEXT_PATH):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def append(self, entry):
+        self.append_many([entry])
+
+    def append_many(self, entries):
+        """Append several entries with a single write."""
+        data = "".join(format_entry(entry) + "\n" for entry in entries)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            lock_file(self._file)
+            try:
+                self._file.write(data)
+                self._file.flush()
+            finally:
+                unlock_file(self._file)
+
+    def sync(self):
+        with self._lock:
+            if self._file is not None:
+                os.fsync(self._file.fileno())
+
+    def entries(self, start=None, end=None):
+        """Yield entries with ``start <= timestamp < end`` in log order."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8", errors="replace") as log_file:
+            for entry in parse_lines(log_file):
+                if start is not None and entry.timestamp < start:
+                    continue
+                if end is not None and entry.timestamp >= end:
+                    # The log is append-only, so nothing later can match.
+                    break
+                yield entry
+
+    def count(self, start=None, end=None):
+        return sum(1 for _ in self.entries(start, end))
+
+    def clear(self):
+        with self._lock:
+            self._close_file()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def reader(self):
+        return _TextReader(self.path)
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        with self._lock:
+            self._close_file()
+
+
+class _TextReader:
+    """Incremental reader over the text log, built on LogTail.
+
+    Keys are the byte offsets of the lines in the file.
+    """
+
+    def __init__(self, path):
+        self._tail = LogTail(path)
+        self.lines_read = 0  # lines consumed by the last read_new, recognised or not
+
+    @staticmethod
+    def _parse(pairs):
+        keyed = []
+        for offset, line in pairs:
+            entry = parse_line(line)
+            if entry is not None:
+                keyed.append((offset, entry))
+        return keyed
+
+    @staticmethod
+    def _result(keyed, with_keys):
+        return keyed if with_keys else [entry for _, entry in keyed]
+
+    def tail(self, n, with_keys=False):
+        return self._result(self._parse(self._tail.tail(n, with_offsets=True)), with_keys)
+
+    def read_new(self, with_keys=False, limit=None):
+        """Entries written since the last read; at most ``limit`` lines per call if given."""
+        pairs = self._tail.read_new(with_offsets=True, max_lines=limit)
+        self.lines_read = len(pairs)
+        return self._result(self._parse(pairs), with_keys)
+
+    def read_new_timestamps(self, limit=None):
+        """Like read_new, but only the timestamps; much faster for large backlogs."""
+        stamps = []
+        for line in self._tail.read_new(max_lines=limit):
+            stamp = parse_timestamp(line)
+            if stamp is not None:
+                stamps.append(stamp)
+        return stamps
+
+    def before(self, key, n):
+        """Up to ``n`` (key, entry) pairs immediately before ``key``."""
+        while True:
+            pairs = self._tail.lines_before(key, n)
+            keyed = self._parse(pairs)
+            if keyed or not pairs:
+                return keyed
+            # Only unrecognised lines in this page; keep looking further back.
+            key = pairs[0][0]
+
+    def after(self, key, n):
+        """Up to ``n`` (key, entry) pairs immediately after ``key``, up to what read_new has seen."""
+        while True:
+            pairs = self._tail.lines_after(key, n, limit=self._tail.offset)
+            keyed = self._parse(pairs)
+            if keyed or not pairs:
+                return keyed
+            key = pairs[-1][0]
+
+    def reset(self):
+        self._tail.reset()
+
+
+class SQLiteHistory:
+    """History stored in a SQLite database in WAL mode, indexed by timestamp."""
+
+    name = "sqlite"
+
+    def __init__(self, path=DEFAULT_SQLITE_PATH):
+        import sqlite3
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS reminders ("
+                "id INTEGER PRIMARY KEY, ts REAL NOT NULL, "
+                "source TEXT, message TEXT, number INTEGER)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_reminders_ts ON reminders(ts)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    @staticmethod
+    def _row(entry):
+        return (entry.timestamp.timestamp(), entry.source, entry.message, entry.number)
+
+    @staticmethod
+    def _entry(row):
+        ts, source, message, number = row
+        return HistoryEntry(datetime.fromtimestamp(ts), source, message, number)
+
+    @staticmethod
+    def _range(start, end):
+        clauses = []
+        params = []
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(start.timestamp())
+        if end is not None:
+            clauses.append("ts < ?")
+            params.append(end.timestamp())
+        where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+        return where, params
+
+    def append(self, entry):
+        self.append_many([entry])
+
+    def append_many(self, entries):
+        """Insert several entries in one transaction."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO reminders (ts, source, message, number) VALUES (?, ?, ?, ?)",
+                [self._row(entry) for entry in entries],
+            )
+
+    def sync(self):
+        """Checkpoint the WAL into the main database file."""
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def entries(self, start=None, end=None, batch_size=1000):
+        """Yield entries with ``start <= timestamp < end`` in time order."""
+        where, params = self._range(start, end)
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT ts, source, message, number FROM reminders" + where + " ORDER BY ts, id",
+                params,
+            )
+            rows = cursor.fetchmany(batch_size)
+        while rows:
+            for row in rows:
+                yield self._entry(row)
+            with self._lock:
+                rows = cursor.fetchmany(batch_size)
+
+    def count(self, start=None, end=None):
+        where, params = self._range(start, end)
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM reminders" + where, params).fetchone()[0]
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM reminders")
+
+    def import_text(self, path, batch_size=5000):
+        """Stream a text log into the database once. Returns the number of entries imported."""
+        key = "imported:" + os.path.abspath(path)
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+                return 0
+        if not os.path.exists(path):
+            return 0
+
+        imported = 0
+        batch = []
+        with open(path, "r", encoding="utf-8", errors="replace") as log_file, self._lock, self._conn:
+            for entry in parse_lines(log_file):
+                batch.append(self._row(entry))
+                if len(batch) >= batch_size:
+                    self._conn.executemany(
+                        "INSERT INTO reminders (ts, source, message, number) VALUES (?, ?, ?, ?)", batch
+                    )
+                    imported += len(batch)
+                    batch = []
+            if batch:
+                self._conn.executemany(
+                    "INSERT INTO reminders (ts, source, message, number) VALUES (?, ?, ?, ?)", batch
+                )
+                imported += len(batch)
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?)", (key, datetime.now().isoformat())
+            )
+        return imported
+
+    def reader(self):
+        return _SQLiteReader(self)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _SQLiteReader:
+    """Incremental reader over the SQLite history. Keys are row ids."""
+
+    _COLUMNS = "SELECT id, ts, source, message, number FROM reminders"
+
+    def __init__(self, history):
+        self._history = history
+        self._last_id = 0
+        self.lines_read = 0  # rows read by the last read_new
+
+    def _query(self, sql, params):
+        history = self._history
+        with history._lock:
+            rows = history._conn.execute(self._COLUMNS + sql, params).fetchall()
+        return [(row[0], history._entry(row[1:])) for row in rows]
+
+    @staticmethod
+    def _result(keyed, with_keys):
+        return keyed if with_keys else [entry for _, entry in keyed]
+
+    def tail(self, n, with_keys=False):
+        keyed = self._query(" ORDER BY id DESC LIMIT ?", (n,))[::-1]
+        if keyed:
+            self._last_id = keyed[-1][0]
+        else:
+            history = self._history
+            with history._lock:
+                row = history._conn.execute("SELECT MAX(id) FROM reminders").fetchone()
+            self._last_id = row[0] or 0
+        return self._result(keyed, with_keys)
+
+    def read_new(self, with_keys=False, limit=None):
+        """Entries written since the last read; at most ``limit`` per call if given."""
+        keyed = self._query(" WHERE id > ? ORDER BY id LIMIT ?", (self._last_id, -1 if limit is None else limit))
+        self.lines_read = len(keyed)
+        if keyed:
+            self._last_id = keyed[-1][0]
+        return self._result(keyed, with_keys)
+
+    def read_new_timestamps(self, limit=None):
+        """Like read_new, but only the timestamps."""
+        history = self._history
+        with history._lock:
+            rows = history._conn.execute(
+                "SELECT id, ts FROM reminders WHERE id > ? ORDER BY id LIMIT ?",
+                (self._last_id, -1 if limit is None else limit),
+            ).fetchall()
+        if rows:
+            self._last_id = rows[-1][0]
+        return [datetime.fromtimestamp(ts) for _, ts in rows]
+
+    def before(self, key, n):
+        """Up to ``n`` (key, entry) pairs immediately before ``key``."""
+        return self._query(" WHERE id < ? ORDER BY id DESC LIMIT ?", (key, n))[::-1]
+
+    def after(self, key, n):
+        """Up to ``n`` (key, entry) pairs immediately after ``key``, up to what read_new has seen."""
+        return self._query(" WHERE id > ? AND id <= ? ORDER BY id LIMIT ?", (key, self._last_id, n))
+
+    def reset(self):
+        self._last_id = 0
+
+
+BACKENDS = {
+    TextHistory.name: TextHistory,
+    SQLiteHistory.name: SQLiteHistory,
+}
+
+
+def open_history(backend="text", path=None, rotation=None):
+    """Open a history backend by name.
+
+    Opening the SQLite backend imports the existing text log the first time,
+    so switching backends keeps the old history. ``rotation`` holds the
+    keyword arguments of log_rotation.RotatingTextHistory (``max_bytes``,
+    ``daily``, ...); a text log that was rotated before is always opened
+    with it, so its segments stay readable.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown history backend: {backend} (choose from {', '.join(BACKENDS)})")
+    if backend == SQLiteHistory.name:
+        store = SQLiteHistory(path or DEFAULT_SQLITE_PATH)
+        store.import_text(DEFAULT_TEXT_PATH)
+        return store
+    path = path or DEFAULT_TEXT_PATH
+    if rotation or os.path.exists(os.path.splitext(path)[0] + ".manifest.json"):
+        from log_rotation import RotatingTextHistory
+        return RotatingTextHistory(path, **(rotation or {}))
+    return TextHistory(path)
@@ -0,0 +1,338 @@
+"""
+HydroBuddy history index - Fast search over the reminder history.
+
+The history is parsed once into compact arrays, then kept up to date by
+reading only what was appended since the last update. Reminders repeat a
+small set of sources and messages, so each entry is filed under its
+(source, message) pair, with one sorted array of entry positions per pair.
+A search:
+
+- finds the position range of its date range by bisecting the timestamps;
+- picks the pairs whose source and message match the filter;
+- bisects each picked pair's positions to that range.
+
+Counting the matches and reading a page of them then costs a few bisections
+per pair, however long the history is.
+
+Search results are readers (``tail``, ``read_new``, ``before``,
+``after``), so the history view pages through them like the history
+itself. ``BackgroundIndex`` builds the index and runs searches on a worker
+thread.
+"""
+
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+
+from history import HistoryEntry
+
+# Stored in place of an entry without a reminder number
+NO_NUMBER = -1
+
+
+class HistoryIndex:
+    """In-memory index of a history backend, updated incrementally.
+
+    Entries are numbered by their position in the log, which is assumed to
+    be in time order, as the log writer appends it. About 20 bytes are kept
+    per entry.
+    """
+
+    def __init__(self, backend, chunk_size=50000):
+        self.backend = backend
+        self.chunk_size = chunk_size
+        self._lock = threading.RLock()
+        self._reader = backend.reader()
+        self._clear()
+
+    def _clear(self):
+        self._reader.reset()
+        self.timestamps = array("d")  # seconds since the epoch, by position
+        self.numbers = array("i")  # reminder number, or NO_NUMBER
+        self.pair_ids = array("I")  # pair id, by position
+        self.pairs = []  # (source, message) of each pair id
+        self.postings = []  # pair id -> array of positions
+        self._pair_ids = {}
+        self.parse_seconds = 0.0
+        self.caught_up = False  # whether the last update read to the end of the history
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def update(self, limit=None):
+        """Index entries appended since the last update. Returns how many were added.
+
+        With ``limit``, at most that many lines are read, so a caller can
+        do other work between chunks of a large backlog; ``caught_up`` then
+        tells whether the end of the history was reached. Unrecognised lines
+        count towards ``limit`` but are not indexed.
+        """
+        added = read = 0
+        self.caught_up = False
+        while limit is None or read < limit:
+            start = time.perf_counter()
+            chunk = self.chunk_size if limit is None else min(self.chunk_size, limit - read)
+            entries = self._reader.read_new(limit=chunk)
+            if not self._reader.lines_read:
+                self.caught_up = True
+                break
+            read += self._reader.lines_read
+            # Converted outside the lock, so searches only wait for the appends
+            stamps = array("d", [entry.timestamp.timestamp() for entry in entries])
+            numbers = array("i", [NO_NUMBER if entry.number is None else entry.number for entry in entries])
+            with self._lock:
+                position = len(self.timestamps)
+                for entry in entries:
+                    key = (entry.source, entry.message)
+                    pair = self._pair_ids.get(key)
+                    if pair is None:
+                        pair = self._pair_ids[key] = len(self.pairs)
+                        self.pairs.append(key)
+                        self.postings.append(array("I"))
+                    self.postings[pair].append(position)
+                    self.pair_ids.append(pair)
+                    position += 1
+                self.timestamps.extend(stamps)
+                self.numbers.extend(numbers)
+            added += len(entries)
+            self.parse_seconds += time.perf_counter() - start
+        return added
+
+    def reset(self):
+        """Forget everything, e.g. after the history was cleared."""
+        with self._lock:
+            self._clear()
+
+    def locked(self):
+        """Context manager that keeps the index unchanged while it is held, for reads that must agree."""
+        return self._lock
+
+    def entry(self, position):
+        """The entry at ``position``."""
+        with self._lock:
+            source, message = self.pairs[self.pair_ids[position]]
+            number = self.numbers[position]
+            timestamp = self.timestamps[position]
+        return HistoryEntry(datetime.fromtimestamp(timestamp), source, message,
+                            None if number == NO_NUMBER else number)
+
+    def sources(self):
+        """The sources seen so far, sorted."""
+        with self._lock:
+            return sorted({source for source, _ in self.pairs if source})
+
+    def search(self, start=None, end=None, source=None, text=None):
+        """Entries with ``start <= timestamp < end``, from ``source``, whose message contains ``text``.
+
+        Any filter may be None. ``text`` is matched case-insensitively.
+        Returns a ``SearchResult``.
+        """
+        return SearchResult(self, start, end, source, text)
+
+
+class SearchResult:
+    """The entries of a HistoryIndex that match a filter, read like a history reader.
+
+    Keys are entry positions. Entries indexed after the search are included
+    by ``read_new`` if they match. ``indexing`` is True if the search ran
+    before the whole history was indexed.
+    """
+
+    def __init__(self, index, start=None, end=None, source=None, text=None):
+        self.index = index
+        self.start = start
+        self.end = end
+        self.source = source
+        self.text = text.lower() if text else None
+        self.elapsed_ms = 0.0
+        self.indexing = False
+        began = time.perf_counter()
+        with index.locked():
+            self._seen = len(index)
+            self.total = self._count(len(index))
+        self.elapsed_ms = (time.perf_counter() - began) * 1000
+
+    def __len__(self):
+        return self.total
+
+    def _pair_matches(self, pair):
+        source, message = self.index.pairs[pair]
+        if self.source is not None and source != self.source:
+            return False
+        return self.text is None or self.text in (message or "").lower()
+
+    def _bounds(self, indexed):
+        """Position range [low, high) of the date range among the first ``indexed`` entries."""
+        timestamps = self.index.timestamps
+        indexed = min(indexed, len(timestamps))
+        low = 0 if self.start is None else bisect_left(timestamps, self.start.timestamp(), 0, indexed)
+        high = indexed if self.end is None else bisect_left(timestamps, self.end.timestamp(), low, indexed)
+        return low, high
+
+    def _ranges(self, low, high):
+        """(pair, first, stop) slices of the matching pairs' positions within [low, high)."""
+        ranges = []
+        for pair, positions in enumerate(self.index.postings):
+            if not self._pair_matches(pair):
+                continue
+            first = bisect_left(positions, low)
+            stop = bisect_left(positions, high, first)
+            if stop > first:
+                ranges.append((pair, first, stop))
+        return ranges
+
+    def _count(self, indexed):
+        return sum(stop - first for _, first, stop in self._ranges(*self._bounds(indexed)))
+
+    def _keyed(self, positions):
+        entry = self.index.entry
+        return [(position, entry(position)) for position in positions]
+
+    @staticmethod
+    def _result(keyed, with_keys):
+        return keyed if with_keys else [entry for _, entry in keyed]
+
+    def _last(self, low, high, n):
+        """The last ``n`` matches in [low, high), oldest first."""
+        postings = self.index.postings
+        found = []
+        for pair, first, stop in self._ranges(low, high):
+            found.extend(postings[pair][max(first, stop - n):stop])
+        found.sort()
+        return self._keyed(found[-n:] if n else [])
+
+    def _first(self, low, high, n):
+        """The first ``n`` matches in [low, high)."""
+        postings = self.index.postings
+        found = []
+        for pair, first, stop in self._ranges(low, high):
+            found.extend(postings[pair][first:min(stop, first + n)])
+        found.sort()
+        return self._keyed(found[:n])
+
+    def tail(self, n, with_keys=False):
+        with self.index.locked():
+            self._seen = len(self.index)
+            self.total = self._count(self._seen)
+            low, high = self._bounds(self._seen)
+            return self._result(self._last(low, high, n), with_keys)
+
+    def read_new(self, with_keys=False, limit=None):
+        """Matches indexed since the last read; at most ``limit`` if given."""
+        with self.index.locked():
+            indexed = len(self.index)
+            low, high = self._bounds(indexed)
+            low = max(low, self._seen)
+            keyed = self._first(low, high, limit if limit is not None else max(0, high - low))
+            self._seen = keyed[-1][0] + 1 if limit is not None and len(keyed) == limit else indexed
+            self.total += len(keyed)
+            return self._result(keyed, with_keys)
+
+    def before(self, key, n):
+        """Up to ``n`` (key, entry) pairs immediately before ``key``."""
+        with self.index.locked():
+            low, high = self._bounds(self._seen)
+            return self._last(low, min(high, key), n)
+
+    def after(self, key, n):
+        """Up to ``n`` (key, entry) pairs immediately after ``key``, up to what read_new has seen."""
+        with self.index.locked():
+            low, high = self._bounds(self._seen)
+            return self._first(max(low, key + 1), high, n)
+
+    def reset(self):
+        self._seen = 0
+
+
+class BackgroundIndex:
+    """Keeps a HistoryIndex up to date and runs searches on a worker thread.
+
+    ``on_indexed(added, building)`` is called from the worker after new
+    entries were indexed; ``building`` is True until the first full pass
+    over the history is done. Only the latest search request is run, so a
+    burst of keystrokes leads to one search.
+    """
+
+    def __init__(self, backend, on_indexed=None, chunk_size=10000):
+        self.index = HistoryIndex(backend, chunk_size)
+        self.on_indexed = on_indexed
+        self.building = True
+        self._cond = threading.Condition()
+        self._update = True
+        self._reset = False
+        self._search = None  # (filters, callback)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="HydroBuddyIndex", daemon=True)
+        self._thread.start()
+
+    def request_update(self):
+        """Index what was appended to the history since the last update."""
+        with self._cond:
+            self._update = True
+            self._cond.notify()
+
+    def request_reset(self):
+        """Rebuild the index from scratch, e.g. after the history was cleared."""
+        with self._cond:
+            self._reset = self._update = True
+            self._cond.notify()
+
+    def search(self, callback, start=None, end=None, source=None, text=None):
+        """Run a search on the worker and call ``callback(result)`` from it.
+
+        ``result`` is a SearchResult, or the exception if the search failed.
+        """
+        with self._cond:
+            self._search = ((start, end, source, text), callback)
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def _run_search(self):
+        with self._cond:
+            request, self._search = self._search, None
+        if request is None:
+            return
+        filters, callback = request
+        try:
+            result = self.index.search(*filters)
+            result.indexing = self.building
+        except Exception as e:
+            result = e
+        callback(result)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not (self._closed or self._update or self._search):
+                    self._cond.wait()
+                if self._closed:
+                    return
+                update, self._update = self._update, False
+                reset, self._reset = self._reset, False
+            if reset:
+                self.index.reset()
+                self.building = True
+            self._run_search()
+            if not update:
+                continue
+            try:
+                # In chunks, so that searches are answered while a large history is indexed
+                while True:
+                    added = self.index.update(limit=self.index.chunk_size)
+                    done = self.index.caught_up
+                    finished = done and self.building
+                    if finished:
+                        self.building = False
+                    if (added or finished) and self.on_indexed is not None:
+                        self.on_indexed(added, self.building)
+                    self._run_search()
+                    if done:
+                        break
+            except Exception as e:
+                print(f"History index error: {e}")
@@ -0,0 +1,156 @@
+"""
+HydroBuddy history view - A scrollable reminder history that only keeps a window of rows.
+
+The view shows a window of at most ``max_rows`` entries from a history
+reader. New entries are appended as they arrive. Scrolling near the top
+loads the previous page on demand and drops rows from the bottom, so the
+whole history can be browsed while the widget stays small.
+"""
+
+import tkinter as tk
+from tkinter import ttk
+
+from history import format_entry
+
+
+class HistoryView(ttk.Frame):
+    """Virtualized, read-only list of history entries.
+
+    ``reader`` is a history reader (``backend.reader()``) providing
+    ``tail``, ``read_new``, ``before`` and ``after``, such as a search
+    result from history_index.
+    """
+
+    def __init__(self, parent, reader, page_size=100, max_rows=500, empty_text=None, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.reader = reader
+        self.page_size = page_size
+        self.max_rows = max(max_rows, 2 * page_size)
+        self.empty_text = empty_text or "No reminders logged yet."
+        self.keys = []  # history key of each row, top to bottom
+        self.at_live_end = True  # bottom row is the newest entry
+        self.at_start = False  # top row is the oldest entry
+        self._load_scheduled = False
+
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+        self.text = tk.Text(self, height=10, wrap=tk.NONE, state=tk.DISABLED)
+        self.text.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.text.yview)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.text.config(yscrollcommand=self._on_scroll)
+
+    # --- Loading ---
+
+    def set_reader(self, reader, empty_text=None):
+        """Show the entries of another reader, starting from its newest page."""
+        self.reader = reader
+        if empty_text is not None:
+            self.empty_text = empty_text
+        self.reload()
+
+    def reload(self):
+        """Show the newest page of entries, discarding the current window."""
+        self.keys = []
+        self.at_live_end = True
+        self.at_start = False
+        keyed = self.reader.tail(self.page_size, with_keys=True)
+        self.at_start = len(keyed) < self.page_size
+        self._edit(lambda: self.text.delete("1.0", tk.END))
+        if keyed:
+            self._insert_bottom(keyed)
+        else:
+            self._edit(lambda: self.text.insert(tk.END, self.empty_text + "\n"))
+        self.text.see(tk.END)
+
+    def refresh(self):
+        """Append entries written since the last refresh."""
+        keyed = self.reader.read_new(with_keys=True)
+        if not keyed:
+            return
+        if not self.keys:
+            # Replace the placeholder text.
+            self.reload()
+            return
+        if not self.at_live_end:
+            # The user is looking at older history; these are loaded by
+            # after() when they scroll back down.
+            return
+        follow = self.text.yview()[1] >= 1.0
+        self._insert_bottom(keyed)
+        self._trim_top()
+        if follow:
+            self.text.see(tk.END)
+
+    def load_older(self):
+        if self.at_start or not self.keys:
+            return
+        keyed = self.reader.before(self.keys[0], self.page_size)
+        if len(keyed) < self.page_size:
+            self.at_start = True
+        if not keyed:
+            return
+        first_visible = int(self.text.index("@0,0").split(".")[0])
+        self._edit(lambda: self.text.insert("1.0", "".join(format_entry(e) + "\n" for _, e in keyed)))
+        self.keys[:0] = [key for key, _ in keyed]
+        # Keep the rows the user was looking at in place.
+        self.text.yview(f"{first_visible + len(keyed)}.0")
+        self._trim_bottom()
+
+    def load_newer(self):
+        if self.at_live_end or not self.keys:
+            return
+        keyed = self.reader.after(self.keys[-1], self.page_size)
+        if len(keyed) < self.page_size:
+            self.at_live_end = True
+        if keyed:
+            self._insert_bottom(keyed)
+            self._trim_top()
+
+    # --- Helpers ---
+
+    def _edit(self, change):
+        self.text.config(state=tk.NORMAL)
+        try:
+            change()
+        finally:
+            self.text.config(state=tk.DISABLED)
+
+    def _insert_bottom(self, keyed):
+        self._edit(lambda: self.text.insert(tk.END, "".join(format_entry(e) + "\n" for _, e in keyed)))
+        self.keys.extend(key for key, _ in keyed)
+
+    def _trim_top(self):
+        excess = len(self.keys) - self.max_rows
+        if excess > 0:
+            first_visible = int(self.text.index("@0,0").split(".")[0])
+            self._edit(lambda: self.text.delete("1.0", f"{excess + 1}.0"))
+            del self.keys[:excess]
+            self.at_start = False
+            self.text.yview(f"{max(1, first_visible - excess)}.0")
+
+    def _trim_bottom(self):
+        excess = len(self.keys) - self.max_rows
+        if excess > 0:
+            self._edit(lambda: self.text.delete(f"{len(self.keys) - excess + 1}.0", "end-1c"))
+            del self.keys[-excess:]
+            self.at_live_end = False
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self._load_scheduled or not self.keys:
+            return
+        first, last = float(first), float(last)
+        # Fetch the next page before the user reaches the edge of the window.
+        if first <= 0.1 and not self.at_start:
+            self._schedule(self.load_older)
+        elif last >= 0.9 and not self.at_live_end:
+            self._schedule(self.load_newer)
+
+    def _schedule(self, load):
+        def run():
+            self._load_scheduled = False
+            load()
+
+        self._load_scheduled = True
+        self.after_idle(run)
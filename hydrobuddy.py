@@ -5,31 +5,399 @@ HydroBuddy Launcher - Choose between GUI and CLI modes
 
 import sys
 import os
+import time
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Modules each mode imports before it is ready, and the heavy ones that are
+# deferred until first use (first reminder, first tray minimize).
+STARTUP_IMPORTS = {
+    "help": [],
+    "cli": ["reminder"],
+    "gui": ["gui"],
+    "tray": ["tray", "pystray", "PIL.Image"],
+    "daemon": ["daemon"],
+    "stats": ["analytics", "history"],
+    "export": ["export", "history"],
+    "simulate": ["simulate"],
+}
+FIRST_USE_IMPORTS = {
+    "help": [],
+    "cli": ["plyer", "pygame"],
+    "gui": ["plyer", "pygame", "pystray", "PIL.Image"],
+    "tray": ["plyer", "pygame", "gui"],
+    "daemon": ["plyer", "pygame"],
+    "stats": [],
+    "export": [],
+    "simulate": [],
+}
+
+# What a second launch asks the running instance to do
+FORWARDED_COMMANDS = {"gui": "show", "tray": "show", "cli": "status", "daemon": "status"}
 
 def show_help():
     print("""
 HydroBuddy - Hydration Reminder Application
 
 Usage:
-    python hydrobuddy.py [mode]
+    python hydrobuddy.py [mode] [options]
 
 Modes:
     gui     - Launch the graphical user interface (default)
     cli     - Launch the command-line version
+    tray    - Run reminders from a system tray icon without loading the
+              window (it is built only when picked from the tray menu)
+    daemon  - Run headless, controlled through a local Unix socket
+    ctl     - Send a command to a running daemon:
+                start | stop | status | fire-now
+                set-interval MINUTES | tail-history [N] | shutdown
+    stats   - Print hydration statistics from the reminder history
+              (--days N for the daily chart, --json for raw output)
+    export  - Stream the reminder history to CSV, JSON Lines or SQLite:
+                --format csv|jsonl|sqlite (default: from the file
+                extension, else csv), --output PATH (default: stdout),
+                --since TIME, --until TIME (YYYY-MM-DD[THH:MM], today,
+                yesterday, 7d, 12h), --quiet (no progress on stderr)
+    simulate - Replay reminders on a virtual clock, with no notifications
+              or sound, and print timing figures and statistics:
+                --days N (default 30), --interval MINUTES,
+                --output PATH (default simulation_log.txt),
+                --events "2d:interval=30,50h:fire-now", --json
+    show    - Bring the running HydroBuddy's window to the front
+    fire-now - Ask the running HydroBuddy for a reminder now
+    stop    - Stop the running HydroBuddy's reminders (a CLI instance exits)
     help    - Show this help message
 
+Options:
+    --history text|sqlite   Where reminders are recorded (default: text,
+                            i.e. hydration_log.txt). The SQLite store
+                            imports the existing text log the first time.
+    --log-flush POLICY      When queued log entries are written: "entry"
+                            (default), "shutdown" or every N milliseconds.
+    --log-fsync POLICY      When written entries are synced to disk:
+                            "entry", "shutdown" (default) or every N ms.
+    --log-queue SIZE        Maximum number of queued log entries (default
+                            1024); further entries are dropped and counted.
+    --rotate-size SIZE      Rotate the text log into a gzip segment before
+                            it grows past SIZE (e.g. 512k, 1MB).
+    --rotate-daily          Rotate the text log when a new day starts.
+    --keep-segments N       Keep only the newest N rotated segments.
+    --metrics-file PATH     Record per-stage reminder timings and write them
+                            to PATH in the Prometheus text format.
+    --metrics-port PORT     Record timings and serve them at
+                            http://127.0.0.1:PORT/metrics.
+    --profile-startup       Print the startup time, per-module import cost
+                            and peak memory of the chosen mode instead of
+                            running it (tray mode is compared with gui).
+    --socket PATH           Control socket of the running instance (default:
+                            $XDG_RUNTIME_DIR/hydrobuddy.sock). Only one
+                            HydroBuddy runs per socket; launching another
+                            passes its command to the running one.
+    --interval MINUTES      Reminder interval for daemon and simulate modes
+                            (default 15).
+    --notify SINK           Where notifications go: plyer (desktop, default),
+                            console or none.
+    --audio BACKEND         How the sound is played: auto (default), pcm (a
+                            system player such as aplay on a pre-decoded
+                            WAV), pygame or none.
+
 Examples:
     python hydrobuddy.py          # Launch GUI mode
     python hydrobuddy.py gui      # Launch GUI mode
     python hydrobuddy.py cli      # Launch CLI mode
+    python hydrobuddy.py tray     # Tray icon only
+    python hydrobuddy.py cli --history sqlite
+    python hydrobuddy.py daemon &
+    python hydrobuddy.py ctl set-interval 20
+    python hydrobuddy.py fire-now
+    python hydrobuddy.py export --since 7d --format jsonl | jq .message
+    python hydrobuddy.py export --output history.db
+    python hydrobuddy.py simulate --days 90 --interval 20
     """)
 
+def pop_option(args, name, default=None):
+    """Remove ``--name value`` or ``--name=value`` from args and return the value."""
+    for i, arg in enumerate(args):
+        if arg == name and i + 1 < len(args):
+            value = args[i + 1]
+            del args[i:i + 2]
+            return value
+        if arg.startswith(name + "="):
+            del args[i]
+            return arg.split("=", 1)[1]
+    return default
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB, or 0 if it cannot be read."""
+    # VmHWM is reset by exec, unlike ru_maxrss, which on Linux keeps the
+    # parent's peak when run in a subprocess
+    try:
+        with open("/proc/self/status", "r") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def measure_imports(modules, top=15):
+    """Import modules in a fresh interpreter with -X importtime and print the cost.
+
+    Returns ``(seconds, peak_rss_mb)``, or None if an import failed.
+    """
+    import subprocess
+
+    code = "import time; t = time.perf_counter()\n"
+    for module in modules:
+        code += f"import {module}\n"
+    code += "elapsed = time.perf_counter() - t\n"
+    code += "from hydrobuddy import peak_rss_mb\n"
+    code += "print(elapsed, peak_rss_mb())"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=APP_DIR, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "unknown error"
+        print(f"    could not import {', '.join(modules)}: {error}")
+        return None
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    elapsed, rss = (float(value) for value in result.stdout.strip().splitlines()[-1].split())
+
+    print(f"    {'cumulative':>10}  {'self':>8}  module")
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"    {cumulative_us / 1000:>8.1f}ms  {self_us / 1000:>6.1f}ms  {name}")
+    print(f"    {len(rows)} modules, {elapsed * 1000:.1f} ms total"
+          + (f", peak RSS {rss:.1f} MB" if rss else ""))
+    return elapsed, rss
+
+def profile_startup(mode):
+    """Report how long the launcher and the chosen mode take to start."""
+    import subprocess
+
+    print(f"Startup profile for {mode.upper()} mode")
+
+    start = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(APP_DIR, "hydrobuddy.py"), "help"],
+                   cwd=APP_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    print(f"\nInterpreter + launcher ('hydrobuddy.py help'): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    measured = None
+    if STARTUP_IMPORTS[mode]:
+        print(f"\nImported at startup ({', '.join(STARTUP_IMPORTS[mode])}):")
+        measured = measure_imports(STARTUP_IMPORTS[mode])
+    for module in FIRST_USE_IMPORTS[mode]:
+        print(f"\nDeferred until first use ({module}):")
+        measure_imports([module], top=5)
+
+    if mode == "tray":
+        # The window needs Tk as well as the gui module
+        print("\nFor comparison, GUI mode at startup (tkinter, gui):")
+        gui_measured = measure_imports(["tkinter", "gui"], top=5)
+        if measured and gui_measured:
+            print(f"\nTray vs GUI: {measured[0] * 1000:.1f} ms vs {gui_measured[0] * 1000:.1f} ms, "
+                  f"peak RSS {measured[1]:.1f} MB vs {gui_measured[1]:.1f} MB "
+                  "(the window itself adds more; see benchmarks/hot_paths.py --only startup)")
+
+def positive_number(text, convert, name):
+    """``convert(text)`` if it is a positive number, else a ValueError naming ``name``."""
+    try:
+        value = convert(text)
+    except ValueError:
+        value = 0
+    if not 0 < value < float("inf"):
+        raise ValueError(f"invalid {name}: {text} (expected a positive {'whole ' if convert is int else ''}number)")
+    return value
+
+def run_ctl(args, socket_path):
+    """Send a control command to a running daemon and print the response."""
+    import json
+    from instance import send_command
+
+    if not args:
+        print("Usage: python hydrobuddy.py ctl <command> [argument]")
+        return 1
+    request = {"cmd": args[0].lower()}
+    try:
+        if request["cmd"] == "set-interval":
+            if len(args) < 2:
+                raise ValueError("set-interval needs a number of minutes")
+            request["minutes"] = positive_number(args[1], float, "minutes")
+        elif request["cmd"] == "tail-history" and len(args) > 1:
+            request["n"] = positive_number(args[1], int, "entry count")
+    except ValueError as e:
+        print(f"Error: {e}")
+        print("Usage: python hydrobuddy.py ctl set-interval MINUTES | tail-history [N]")
+        return 1
+
+    response = send_command(request, socket_path)
+    if response is None:
+        return 1
+    if request["cmd"] == "tail-history" and response.get("ok"):
+        from datetime import datetime
+        from history import HistoryEntry, format_entry
+        for entry in response["entries"]:
+            print(format_entry(HistoryEntry(
+                datetime.fromisoformat(entry["timestamp"]), entry["source"], entry["message"], entry["number"])))
+    else:
+        print(json.dumps(response, indent=2))
+    return 0 if response.get("ok") else 1
+
+def forward_command(command, socket_path):
+    """Send a command to the running instance and report the result."""
+    from instance import send_command
+
+    response = send_command({"cmd": command}, socket_path, timeout=2, quiet=True)
+    if response is None:
+        print("HydroBuddy is not running.")
+        return 1
+    if not response.get("ok"):
+        print(f"Error: {response.get('error')}")
+        return 1
+    print(f"Sent '{command}' to HydroBuddy ({response.get('mode')} mode, pid {response.get('pid')}).")
+    return 0
+
+def hand_off(mode, instance_lock, socket_path):
+    """Called when another instance holds the lock: pass it this launch's command."""
+    from instance import send_command
+
+    command = FORWARDED_COMMANDS[mode]
+    response = send_command({"cmd": command}, socket_path, timeout=2, quiet=True)
+    if response is None:
+        print(f"HydroBuddy is already running (pid {instance_lock.owner_pid()}) but does not answer "
+              "on its control socket.")
+        return 1
+    if not response.get("ok"):
+        print(f"HydroBuddy is already running, but could not {command}: {response.get('error')}")
+        return 1
+    if command == "show":
+        print(f"HydroBuddy is already running (pid {response.get('pid')}); bringing it to the front.")
+    else:
+        print(f"HydroBuddy is already running in {response.get('mode')} mode (pid {response.get('pid')}). "
+              "Use 'hydrobuddy.py fire-now', 'stop' or 'ctl' to control it.")
+    return 0
+
+def run_stats(args, history_backend):
+    """Print hydration statistics for the chosen history backend."""
+    import analytics
+    import history
+
+    as_json = "--json" in args
+    try:
+        days = positive_number(pop_option(args, "--days", "14"), int, "number of days")
+        backend = history.open_history(history_backend)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    stats = analytics.HydrationStats(backend)
+    stats.update()
+    summary = stats.summary(days)
+    backend.close()
+    if as_json:
+        import json
+        print(json.dumps(summary, default=str, indent=2))
+    else:
+        print(analytics.format_summary(summary))
+        print(f"\n(parsed in {stats.parse_seconds * 1000:.0f} ms, "
+              f"computed in {summary['compute_ms']:.1f} ms using {summary['backend']})")
+    return 0
+
+def run_export(args, history_backend):
+    """Stream the chosen history backend to a file or stdout."""
+    import export
+    import history
+
+    output = pop_option(args, "--output", "-")
+    since = pop_option(args, "--since")
+    until = pop_option(args, "--until")
+    quiet = "--quiet" in args
+    try:
+        fmt = (pop_option(args, "--format") or export.guess_format(output) or "csv").lower()
+        start = export.parse_time(since) if since else None
+        end = export.parse_time(until, end=True) if until else None
+        backend = history.open_history(history_backend)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    try:
+        export.export(backend, fmt, output, start, end, progress=not quiet)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    except BrokenPipeError:
+        # The reader went away (e.g. "| head"); stop quietly
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    finally:
+        backend.close()
+    return 0
+
+def run_simulate(args, interval):
+    """Replay reminders on a virtual clock and print the results."""
+    import analytics
+    import history
+    import simulate
+
+    as_json = "--json" in args
+    try:
+        days = positive_number(pop_option(args, "--days", "30"), float, "--days")
+        interval = positive_number(interval, float, "--interval")
+        events = simulate.parse_events(pop_option(args, "--events"))
+        results = simulate.simulate(days, interval, pop_option(args, "--output", simulate.DEFAULT_OUTPUT), events)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    backend = history.TextHistory(results["output"])
+    stats = analytics.HydrationStats(backend)
+    stats.update()
+    summary = stats.summary(min(14, max(1, int(days))))
+    backend.close()
+    if as_json:
+        import json
+        print(json.dumps({"simulation": results, "stats": summary}, default=str, indent=2))
+    else:
+        print(simulate.format_results(results))
+        print()
+        print(analytics.format_summary(summary))
+    return 0
+
 def main():
     # Determine mode
     mode = "gui"  # Default to GUI
+    args = sys.argv[1:]
+    history_backend = pop_option(args, "--history", "text").lower()
+    log_flush = pop_option(args, "--log-flush")
+    log_fsync = pop_option(args, "--log-fsync")
+    log_queue = pop_option(args, "--log-queue")
+    socket_path = pop_option(args, "--socket")
+    notify_sink = pop_option(args, "--notify")
+    audio_backend = pop_option(args, "--audio")
+    daemon_interval = pop_option(args, "--interval", "15")
+    rotate_size = pop_option(args, "--rotate-size")
+    keep_segments = pop_option(args, "--keep-segments")
+    rotate_daily = "--rotate-daily" in args
+    metrics_file = pop_option(args, "--metrics-file")
+    metrics_port = pop_option(args, "--metrics-port")
+    if rotate_daily:
+        args.remove("--rotate-daily")
+    profile = "--profile-startup" in args
+    if profile:
+        args.remove("--profile-startup")
     
-    if len(sys.argv) > 1:
-        arg = sys.argv[1].lower()
+    if args:
+        arg = args[0].lower()
         if arg in ["help", "-h", "--help"]:
             show_help()
             return
@@ -37,17 +405,97 @@ def main():
             mode = "cli"
         elif arg == "gui":
             mode = "gui"
+        elif arg == "tray":
+            mode = "tray"
+        elif arg == "daemon":
+            mode = "daemon"
+        elif arg == "ctl":
+            sys.exit(run_ctl(args[1:], socket_path))
+        elif arg in ("show", "fire-now", "stop"):
+            sys.exit(forward_command(arg, socket_path))
+        elif arg == "stats" and not profile:
+            sys.exit(run_stats(args[1:], history_backend))
+        elif arg == "stats":
+            mode = "stats"
+        elif arg == "export" and not profile:
+            sys.exit(run_export(args[1:], history_backend))
+        elif arg == "export":
+            mode = "export"
+        elif arg == "simulate" and not profile:
+            sys.exit(run_simulate(args[1:], daemon_interval))
+        elif arg == "simulate":
+            mode = "simulate"
         else:
             print(f"Unknown mode: {arg}")
             show_help()
             return
     
+    if profile:
+        profile_startup(mode)
+        return
+    
+    # Only one HydroBuddy runs per control socket; a later launch hands its
+    # command to the running one and exits
+    from instance import InstanceLock, default_socket_path
+    socket_path = socket_path or default_socket_path()
+    instance_lock = InstanceLock(socket_path)
+    if not instance_lock.acquire():
+        sys.exit(hand_off(mode, instance_lock, socket_path))
+    
     print(f"🚰 Starting HydroBuddy in {mode.upper()} mode...")
     
+    rotating = rotate_size or rotate_daily or keep_segments
+    if history_backend != "text" or log_flush or log_fsync or log_queue or notify_sink or audio_backend or rotating:
+        import reminder
+        from log_writer import parse_policy
+        try:
+            if notify_sink:
+                from dispatch import make_sink
+                make_sink(notify_sink)
+                reminder.set_notification_sink(notify_sink)
+            if audio_backend:
+                reminder.set_audio_backend(audio_backend)
+            reminder.configure_log_writer(
+                max_queue=int(log_queue or 1024),
+                flush=parse_policy(log_flush or "entry"),
+                fsync=parse_policy(log_fsync or "shutdown"),
+            )
+            if history_backend != "text":
+                reminder.set_history_backend(history_backend)
+                print(f"Recording reminders with the {history_backend} history backend.")
+            if rotating and history_backend == "text":
+                from log_rotation import parse_size
+                rotation = {
+                    "max_bytes": parse_size(rotate_size) if rotate_size else None,
+                    "daily": rotate_daily,
+                    "keep_segments": int(keep_segments) if keep_segments else None,
+                }
+                reminder.set_history_backend("text", rotation=rotation)
+            elif rotating:
+                print("Log rotation only applies to the text history; ignoring it.")
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+    
+    metrics_writer = None
+    if metrics_file or metrics_port:
+        import metrics
+        metrics.registry.enable()
+        try:
+            if metrics_file:
+                metrics_writer = metrics.MetricsFileWriter(metrics.registry, metrics_file).start()
+                print(f"Writing metrics to {metrics_file}")
+            if metrics_port:
+                metrics.start_http_server(metrics.registry, int(metrics_port))
+                print(f"Serving metrics at http://127.0.0.1:{metrics_port}/metrics")
+        except (OSError, ValueError) as e:
+            print(f"Error: could not export metrics: {e}")
+            return
+    
     if mode == "gui":
         try:
             import gui
-            gui.main()
+            gui.main(control_socket=socket_path)
         except ImportError as e:
             print(f"Error: Could not import GUI module: {e}")
             print("Make sure tkinter is installed: sudo apt install python3-tk")
@@ -58,14 +506,57 @@ def main():
             print("Falling back to CLI mode...")
             mode = "cli"
     
+    if mode == "tray":
+        import tray
+        if tray.TRAY_AVAILABLE:
+            try:
+                tray.main(control_socket=socket_path)
+            except Exception as e:
+                print(f"Error starting the tray icon: {e}")
+                print("Falling back to CLI mode...")
+                mode = "cli"
+        else:
+            print("Error: tray mode needs pystray and Pillow: pip install pystray pillow")
+            print("Falling back to CLI mode...")
+            mode = "cli"
+    
+    if mode == "daemon":
+        try:
+            interval = positive_number(daemon_interval, float, "--interval") * 60
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        import reminder
+        from daemon import HydroBuddyDaemon
+        try:
+            HydroBuddyDaemon(socket_path, interval=interval).run()
+        except KeyboardInterrupt:
+            pass
+        except (OSError, RuntimeError) as e:
+            print(f"Error: {e}")
+        finally:
+            reminder.shutdown()
+        print("HydroBuddy daemon stopped. Stay hydrated! 💧")
+    
     if mode == "cli":
         import reminder
         print("Starting command-line hydration reminders...")
         print("Press Ctrl+C to stop.")
         try:
-            reminder.remind_to_drink()
+            reminder.remind_to_drink(control_socket=socket_path)
         except KeyboardInterrupt:
             print("\nHydroBuddy stopped. Stay hydrated! 💧")
+        finally:
+            # Flush queued log entries before exiting
+            writer = reminder.log_writer
+            reminder.shutdown()
+            if writer is not None and writer.dropped:
+                stats = writer.stats()
+                print(f"Log writer dropped {stats['dropped']} entries "
+                      f"(peak queue depth {stats['max_queue_depth']}/{stats['queue_capacity']}).")
+    
+    if metrics_writer is not None:
+        metrics_writer.stop()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
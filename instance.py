@@ -0,0 +1,220 @@
+"""
+HydroBuddy instance - Keep a single HydroBuddy running and pass commands to it.
+
+The first launcher takes an advisory lock next to the control socket and
+serves commands on that socket while it runs. A second launch finds the lock
+taken, forwards its command (show the window, fire a reminder now, stop) to
+the running instance and exits. The lock is released by the kernel when the
+process ends, so a crash never leaves a stale lock behind.
+
+Every mode speaks the daemon's protocol: one JSON object per line in, one
+JSON object per line back::
+
+    {"cmd": "fire-now"}  ->  {"ok": true, "running": true, "count": 3, ...}
+
+and handles all of its commands (start, stop, status, set-interval,
+fire-now, tail-history, shutdown), plus "show" where there is a window.
+"""
+
+import json
+import os
+import socket
+import sys
+import threading
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+def default_socket_path():
+    """Per-user control socket path."""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return os.path.join(runtime_dir, "hydrobuddy.sock")
+    if hasattr(os, "getuid"):
+        return os.path.join("/tmp", f"hydrobuddy-{os.getuid()}.sock")
+    import tempfile
+    return os.path.join(tempfile.gettempdir(), "hydrobuddy.sock")
+
+
+class InstanceLock:
+    """Exclusive, non-blocking lock held for the life of the process.
+
+    The lock file (``<socket>.lock``) holds the owner's pid for messages.
+    """
+
+    def __init__(self, socket_path=None):
+        self.path = (socket_path or default_socket_path()) + ".lock"
+        self._file = None
+
+    def acquire(self):
+        """Take the lock. Returns False if another instance holds it."""
+        lock_file = open(self.path, "a+", encoding="utf-8")
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                import msvcrt
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            lock_file.close()
+            return False
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(str(os.getpid()))
+        lock_file.flush()
+        self._file = lock_file
+        return True
+
+    def owner_pid(self):
+        """The pid written by the instance holding the lock, if any."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as lock_file:
+                return int(lock_file.read().strip() or 0) or None
+        except (OSError, ValueError):
+            return None
+
+    def release(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def send_command(request, socket_path=None, timeout=5, quiet=False):
+    """Send one request to a running instance and return its decoded response."""
+    socket_path = socket_path or default_socket_path()
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(socket_path)
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            data = b""
+            while not data.endswith(b"\n"):
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                data += chunk
+    except (OSError, AttributeError) as e:
+        if not quiet:
+            print(f"Could not reach HydroBuddy at {socket_path}: {e}", file=sys.stderr)
+        return None
+    return json.loads(data) if data else None
+
+
+def requested_interval(request):
+    """The interval in seconds asked for by a "set-interval" request ("seconds" or "minutes")."""
+    if "seconds" in request:
+        interval = float(request["seconds"])
+    else:
+        interval = float(request["minutes"]) * 60
+    if not 0 < interval < float("inf"):
+        raise ValueError("interval must be a positive number")
+    return interval
+
+
+def entry_to_dict(entry):
+    return {
+        "timestamp": entry.timestamp.isoformat(),
+        "source": entry.source,
+        "message": entry.message,
+        "number": entry.number,
+    }
+
+
+def tail_history(request, reader):
+    """The "tail-history" response: the last ``n`` entries read through ``reader``."""
+    n = int(request.get("n", 20))
+    if n <= 0:
+        raise ValueError("n must be positive")
+    return {"entries": [entry_to_dict(entry) for entry in reader.tail(n)]}
+
+
+def scheduler_status(mode, scheduler, count):
+    """The "status" response of a mode driven by a ReminderScheduler."""
+    next_time = scheduler.next_fire_time()
+    return {
+        "mode": mode,
+        "running": scheduler.running,
+        "interval": scheduler.interval,
+        "count": count,
+        "next_reminder": datetime.fromtimestamp(next_time).isoformat() if next_time else None,
+        "pid": os.getpid(),
+    }
+
+
+class ControlServer:
+    """Serves control commands on a Unix socket from a background thread.
+
+    ``commands`` maps a command name to ``handler(request)``, which returns
+    a dict for the response. Handlers run on the server thread, so GUI
+    front ends should only queue work for their own thread and return.
+    The caller must hold the ``InstanceLock``; a leftover socket file is
+    then known to be stale and is replaced.
+    """
+
+    def __init__(self, commands, socket_path=None):
+        self.commands = commands
+        self.socket_path = socket_path or default_socket_path()
+        self._sock = None
+        self._thread = None
+
+    def start(self):
+        if not hasattr(socket, "AF_UNIX"):
+            print("Control socket not supported on this platform; other launches cannot reach this one.")
+            return self
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        self._sock.listen(8)
+        self._thread = threading.Thread(target=self._serve, name="HydroBuddyControl", daemon=True)
+        self._thread.start()
+        return self
+
+    def handle(self, request):
+        """Run one request and return the response dict."""
+        try:
+            handler = self.commands.get(request.get("cmd"))
+            if handler is None:
+                raise ValueError(f"unknown command: {request.get('cmd')}")
+            return {"ok": True, **handler(request)}
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+
+    def _serve(self):
+        sock = self._sock
+        while True:
+            try:
+                conn, _ = sock.accept()
+            except OSError:
+                return  # closed
+            with conn:
+                try:
+                    conn.settimeout(5)
+                    with conn.makefile("rb") as reader:
+                        for line in reader:
+                            try:
+                                response = self.handle(json.loads(line))
+                            except ValueError as e:
+                                response = {"ok": False, "error": f"bad request: {e}"}
+                            conn.sendall(json.dumps(response).encode() + b"\n")
+                except OSError:
+                    pass
+
+    def close(self):
+        sock, self._sock = self._sock, None
+        if sock is None:
+            return
+        # shutdown() wakes the thread blocked in accept()
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        sock.close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
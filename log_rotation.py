@@ -0,0 +1,516 @@
+"""
+HydroBuddy log rotation - Keep the text log small by rotating it into compressed segments.
+
+When the active ``hydration_log.txt`` would grow past a size limit, or the
+first reminder of a new day is written, the file is gzip-compressed into a
+numbered segment next to it (``hydration_log.00001.txt.gz``, ...) and a new
+active file is started. A JSON manifest records each segment's time range
+and entry count, so readers stream across all segments and skip the ones
+outside a requested range. The oldest segments beyond the retention limits
+are deleted, which keeps disk use bounded.
+"""
+
+import gzip
+import json
+import os
+import re
+from bisect import bisect_left
+from datetime import datetime
+
+from history import (
+    DEFAULT_TEXT_PATH, TextHistory, format_entry, lock_file, parse_line, parse_lines, parse_timestamp, unlock_file,
+)
+from log_tail import LogTail
+
+_SIZE_RE = re.compile(r"^(\d+(?:\.\d+)?)\s*([kmg]?)i?b?$", re.IGNORECASE)
+_SIZE_UNITS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+
+
+def parse_size(value):
+    """Parse a size such as "512k", "1MB" or "1048576" into bytes."""
+    match = _SIZE_RE.match(str(value).strip())
+    if not match:
+        raise ValueError(f"Invalid size: {value}")
+    number, unit = match.groups()
+    return int(float(number) * _SIZE_UNITS[unit.lower()])
+
+
+def manifest_path(log_path):
+    return os.path.splitext(log_path)[0] + ".manifest.json"
+
+
+class SegmentManifest:
+    """The list of compressed segments, stored as JSON next to the log.
+
+    ``next_seq`` is the number the active file gets when it is rotated.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.segments = []
+        self.next_seq = 1
+        self._mtime = None
+
+    def load(self):
+        """Re-read the manifest if it changed on disk. Returns self."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            self.segments = []
+            self.next_seq = 1
+            self._mtime = None
+            return self
+        if mtime != self._mtime:
+            with open(self.path, "r", encoding="utf-8") as manifest_file:
+                data = json.load(manifest_file)
+            self.segments = data["segments"]
+            self.next_seq = data["next_seq"]
+            self._mtime = mtime
+        return self
+
+    def save(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as manifest_file:
+            json.dump({"segments": self.segments, "next_seq": self.next_seq}, manifest_file, indent=1)
+        os.replace(temp_path, self.path)
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+    def find(self, seq):
+        for segment in self.segments:
+            if segment["seq"] == seq:
+                return segment
+        return None
+
+    @staticmethod
+    def overlaps(segment, start, end):
+        """Whether a segment may hold entries with ``start <= timestamp < end``."""
+        if not segment["count"]:
+            return False
+        if start is not None and datetime.fromisoformat(segment["end"]) < start:
+            return False
+        if end is not None and datetime.fromisoformat(segment["start"]) >= end:
+            return False
+        return True
+
+    @staticmethod
+    def contained(segment, start, end):
+        """Whether all of a segment's entries fall within ``start <= timestamp < end``."""
+        return (
+            (start is None or datetime.fromisoformat(segment["start"]) >= start)
+            and (end is None or datetime.fromisoformat(segment["end"]) < end)
+        )
+
+
+class RotatingTextHistory(TextHistory):
+    """Text log that rotates into gzip segments by size and/or by day.
+
+    ``max_bytes`` rotates before the active file would grow past that size;
+    ``daily`` rotates when the first entry of a new day is written. Only the
+    newest ``keep_segments`` segments are kept, and older ones are also
+    removed while all segments together use more than ``max_total_bytes``.
+    Without limits, existing segments are still read but nothing rotates.
+
+    Writes and rotations happen under an advisory lock on ``<base>.lock``
+    (the active file itself is replaced on rotation), and a writer that
+    finds the active file rotated away by another process reopens it.
+    """
+
+    name = "text"
+
+    def __init__(self, path=DEFAULT_TEXT_PATH, max_bytes=None, daily=False, keep_segments=None,
+                 max_total_bytes=None):
+        super().__init__(path)
+        self.max_bytes = max_bytes
+        self.daily = daily
+        self.keep_segments = keep_segments
+        self.max_total_bytes = max_total_bytes
+        self.manifest = SegmentManifest(manifest_path(path)).load()
+        self._active_size = None
+        self._active_day = None
+        self._writers_lock = None
+
+    def segment_path(self, segment):
+        return os.path.join(os.path.dirname(self.path), segment["file"])
+
+    # --- Writing and rotation ---
+
+    def _lock_writers(self):
+        """Take the lock shared by all processes writing this log."""
+        if self._writers_lock is None:
+            self._writers_lock = open(os.path.splitext(self.path)[0] + ".lock", "a")
+        lock_file(self._writers_lock)
+        self._follow_other_writers()
+
+    def _follow_other_writers(self):
+        """Pick up appends and rotations made by other processes since our last write."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            st = None
+        if self._file is not None and (st is None or os.fstat(self._file.fileno()).st_ino != st.st_ino):
+            # Rotated away; the new active file is measured again below
+            self._close_file()
+            self._active_size = None
+        elif self._active_size is not None:
+            self._active_size = st.st_size if st else 0
+
+    def append_many(self, entries):
+        """Append entries, rotating first whenever the next one would cross a limit."""
+        with self._lock:
+            self._lock_writers()
+            try:
+                self._append_locked(entries)
+            finally:
+                unlock_file(self._writers_lock)
+
+    def _append_locked(self, entries):
+        if self._active_size is None:
+            self._active_size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            last = LogTail(self.path).tail(1) if self.daily else []
+            stamp = parse_timestamp(last[0]) if last else None
+            self._active_day = stamp.date() if stamp else None
+
+        batch = []
+        size = self._active_size
+        for entry in entries:
+            line = format_entry(entry) + "\n"
+            length = len(line.encode("utf-8"))
+            new_day = self.daily and self._active_day not in (None, entry.timestamp.date())
+            too_big = self.max_bytes and size > 0 and size + length > self.max_bytes
+            if new_day or too_big:
+                self._write(batch)
+                self._rotate()
+                batch = []
+                size = 0
+            batch.append(line)
+            size += length
+            self._active_day = entry.timestamp.date()
+        self._write(batch)
+        self._active_size = size
+
+    def _write(self, lines):
+        if not lines:
+            return
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write("".join(lines))
+        self._file.flush()
+
+    def rotate(self):
+        """Rotate the active file now, if it holds anything."""
+        with self._lock:
+            self._lock_writers()
+            try:
+                self._rotate()
+                self._active_size = 0
+            finally:
+                unlock_file(self._writers_lock)
+
+    def _rotate(self):
+        self._close_file()
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+        manifest = self.manifest.load()
+        seq = manifest.next_seq
+        file_name = f"{os.path.splitext(os.path.basename(self.path))[0]}.{seq:05d}.txt.gz"
+        segment_path = os.path.join(os.path.dirname(self.path), file_name)
+        temp_path = segment_path + ".tmp"
+        # Streamed line by line, so rotating a large file needs little memory
+        first = last = None
+        count = raw_bytes = 0
+        with open(self.path, "rb") as active, open(temp_path, "wb") as raw, \
+                gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as compressed:
+            for line in active:
+                compressed.write(line)
+                raw_bytes += len(line)
+                stamp = parse_timestamp(line.decode("utf-8", errors="replace"))
+                if stamp is not None:
+                    first = first or stamp
+                    last = stamp
+                    count += 1
+        os.replace(temp_path, segment_path)
+
+        manifest.segments.append({
+            "seq": seq,
+            "file": file_name,
+            "start": first.isoformat() if first else None,
+            "end": last.isoformat() if last else None,
+            "count": count,
+            "bytes": os.path.getsize(segment_path),
+            "raw_bytes": raw_bytes,
+        })
+        manifest.next_seq = seq + 1
+        self._apply_retention(manifest)
+        # The manifest is saved before the active file disappears, so a
+        # reader that notices the rotation always finds the new segment.
+        manifest.save()
+        os.remove(self.path)
+
+    def _apply_retention(self, manifest):
+        segments = manifest.segments
+        while segments and (
+            (self.keep_segments is not None and len(segments) > self.keep_segments)
+            or (self.max_total_bytes is not None and sum(s["bytes"] for s in segments) > self.max_total_bytes)
+        ):
+            segment = segments.pop(0)
+            try:
+                os.remove(self.segment_path(segment))
+            except FileNotFoundError:
+                pass
+
+    # --- Reading ---
+
+    def segment_lines(self, segment):
+        """Stream the decompressed lines of a segment."""
+        try:
+            with gzip.open(self.segment_path(segment), "rt", encoding="utf-8", errors="replace") as seg_file:
+                yield from seg_file
+        except FileNotFoundError:
+            # Deleted by retention while it was being read.
+            return
+
+    def entries(self, start=None, end=None):
+        """Yield entries with ``start <= timestamp < end`` from the segments, then the active file."""
+        for segment in list(self.manifest.load().segments):
+            if not SegmentManifest.overlaps(segment, start, end):
+                continue
+            for entry in parse_lines(self.segment_lines(segment)):
+                if start is not None and entry.timestamp < start:
+                    continue
+                if end is not None and entry.timestamp >= end:
+                    return
+                yield entry
+        yield from super().entries(start, end)
+
+    def count(self, start=None, end=None):
+        """Count entries in a range, using the manifest for segments that lie fully inside it."""
+        total = 0
+        for segment in list(self.manifest.load().segments):
+            if not SegmentManifest.overlaps(segment, start, end):
+                continue
+            if SegmentManifest.contained(segment, start, end):
+                total += segment["count"]
+                continue
+            for line in self.segment_lines(segment):
+                stamp = parse_timestamp(line)
+                if stamp is not None and (start is None or stamp >= start) and (end is None or stamp < end):
+                    total += 1
+        return total + sum(1 for _ in super().entries(start, end))
+
+    def clear(self):
+        with self._lock:
+            manifest = self.manifest.load()
+            for segment in manifest.segments:
+                try:
+                    os.remove(self.segment_path(segment))
+                except FileNotFoundError:
+                    pass
+            manifest.segments = []
+            manifest.save()
+            self._active_size = 0
+            self._active_day = None
+        super().clear()
+
+    def reader(self):
+        return _RotatingTextReader(self)
+
+    def close(self):
+        super().close()
+        with self._lock:
+            if self._writers_lock is not None:
+                self._writers_lock.close()
+                self._writers_lock = None
+
+
+class _RotatingTextReader:
+    """Incremental reader across the segments and the active file.
+
+    Keys are ``(seq, byte offset)`` pairs. Lines of the active file carry the
+    number it will get when rotated, so keys stay valid after a rotation.
+    When the file being followed is rotated away, the lines written to it
+    since the last read are picked up from its segment.
+    """
+
+    def __init__(self, history):
+        self._history = history
+        self._tail = LogTail(history.path)
+        self._pending = []  # [seq, offset] of segments still to be read by read_new
+        self._seq = history.manifest.load().next_seq  # seq of the file self._tail follows
+        self._cache = (None, [])  # (seq, [(offset, line), ...]) of the last segment paged through
+        self.lines_read = 0  # lines consumed by the last read_new, recognised or not
+
+    @staticmethod
+    def _parse(pairs):
+        keyed = []
+        for key, line in pairs:
+            entry = parse_line(line)
+            if entry is not None:
+                keyed.append((key, entry))
+        return keyed
+
+    @staticmethod
+    def _result(keyed, with_keys):
+        return keyed if with_keys else [entry for _, entry in keyed]
+
+    def _manifest(self):
+        return self._history.manifest.load()
+
+    def _segment_pairs(self, seq):
+        """(offset, line) pairs of a whole segment; the last one used is cached."""
+        cached_seq, pairs = self._cache
+        if cached_seq == seq:
+            return pairs
+        segment = self._manifest().find(seq)
+        pairs = []
+        if segment is not None:
+            try:
+                with gzip.open(self._history.segment_path(segment), "rb") as seg_file:
+                    offset = 0
+                    for line in seg_file:
+                        if not line.endswith(b"\n"):
+                            break
+                        pairs.append((offset, line[:-1].decode("utf-8", errors="replace") + "\n"))
+                        offset += len(line)
+            except FileNotFoundError:
+                pass
+        self._cache = (seq, pairs)
+        return pairs
+
+    # --- Following new entries ---
+
+    def _catch_up(self):
+        """Queue the rest of the followed file if it was rotated. Call with the history lock held."""
+        next_seq = self._manifest().next_seq
+        if next_seq == self._seq:
+            return
+        # The file we were following became segment self._seq; any later
+        # ones were written and rotated since.
+        self._pending.append([self._seq, self._tail.offset if self._tail.identity else 0])
+        self._pending.extend([seq, 0] for seq in range(self._seq + 1, next_seq))
+        self._seq = next_seq
+        self._tail.reset()
+
+    def _new_pairs(self, limit):
+        pairs = []
+        while True:
+            while self._pending and (limit is None or len(pairs) < limit):
+                seq, start = self._pending[0]
+                seg_pairs = self._segment_pairs(seq)
+                index = bisect_left(seg_pairs, (start,))
+                stop = len(seg_pairs) if limit is None else min(len(seg_pairs), index + limit - len(pairs))
+                pairs.extend(((seq, offset), line) for offset, line in seg_pairs[index:stop])
+                if stop >= len(seg_pairs):
+                    self._pending.pop(0)
+                else:
+                    self._pending[0][1] = seg_pairs[stop][0]
+            if limit is not None and len(pairs) >= limit:
+                return pairs
+            # Hold the writer's lock so the file cannot be rotated between
+            # checking the manifest and reading the active file.
+            with self._history._lock:
+                self._catch_up()
+                if not self._pending:
+                    remaining = None if limit is None else limit - len(pairs)
+                    seq = self._seq
+                    pairs.extend(
+                        ((seq, offset), line)
+                        for offset, line in self._tail.read_new(with_offsets=True, max_lines=remaining)
+                    )
+                    return pairs
+
+    def read_new(self, with_keys=False, limit=None):
+        """Entries written since the last read; at most ``limit`` lines per call if given."""
+        pairs = self._new_pairs(limit)
+        self.lines_read = len(pairs)
+        return self._result(self._parse(pairs), with_keys)
+
+    def read_new_timestamps(self, limit=None):
+        """Like read_new, but only the timestamps."""
+        stamps = []
+        for _, line in self._new_pairs(limit):
+            stamp = parse_timestamp(line)
+            if stamp is not None:
+                stamps.append(stamp)
+        return stamps
+
+    def tail(self, n, with_keys=False):
+        with self._history._lock:
+            self._pending = []
+            seq = self._seq = self._manifest().next_seq
+            pairs = self._tail.tail(n, with_offsets=True)
+        keyed = self._parse(((seq, offset), line) for offset, line in pairs)
+        if len(keyed) < n:
+            # The active file is short; fill up from the newest segments.
+            first = keyed[0][0] if keyed else (seq, 0)
+            keyed = self.before(first, n - len(keyed)) + keyed
+        return self._result(keyed, with_keys)
+
+    # --- Paging ---
+
+    def _pairs_before(self, key, page):
+        """Yield (key, line) pairs before ``key``, newest first, crossing into older segments."""
+        seq, offset = key
+        if seq >= self._manifest().next_seq:
+            while offset > 0:
+                pairs = self._tail.lines_before(offset, page)
+                if not pairs:
+                    break
+                for pair_offset, line in reversed(pairs):
+                    yield (seq, pair_offset), line
+                offset = pairs[0][0]
+        for segment in reversed(self._manifest().segments):
+            if segment["seq"] > seq:
+                continue
+            pairs = self._segment_pairs(segment["seq"])
+            index = bisect_left(pairs, (offset,)) if segment["seq"] == seq else len(pairs)
+            for pair_offset, line in reversed(pairs[:index]):
+                yield (segment["seq"], pair_offset), line
+
+    def _pairs_after(self, key, page):
+        """Yield (key, line) pairs after ``key``, oldest first, up to what read_new has seen."""
+        seq, offset = key
+        for segment in list(self._manifest().segments):
+            if segment["seq"] < seq:
+                continue
+            pairs = self._segment_pairs(segment["seq"])
+            index = bisect_left(pairs, (offset + 1,)) if segment["seq"] == seq else 0
+            for pair_offset, line in pairs[index:]:
+                yield (segment["seq"], pair_offset), line
+        if self._seq != self._manifest().next_seq:
+            # Rotated since the last read_new; the rest comes with the next one.
+            return
+        if seq < self._seq:
+            offset = -1
+        while offset < self._tail.offset:
+            pairs = self._tail.lines_after(offset, page, limit=self._tail.offset)
+            if not pairs:
+                return
+            for pair_offset, line in pairs:
+                yield (self._seq, pair_offset), line
+            offset = pairs[-1][0]
+
+    def before(self, key, n):
+        """Up to ``n`` (key, entry) pairs immediately before ``key``."""
+        keyed = []
+        for pair in self._pairs_before(key, n):
+            keyed.extend(self._parse([pair]))
+            if len(keyed) >= n:
+                break
+        return keyed[::-1]
+
+    def after(self, key, n):
+        """Up to ``n`` (key, entry) pairs immediately after ``key``, up to what read_new has seen."""
+        keyed = []
+        for pair in self._pairs_after(key, n):
+            keyed.extend(self._parse([pair]))
+            if len(keyed) >= n:
+                break
+        return keyed
+
+    def reset(self):
+        """Start again from the oldest segment."""
+        with self._history._lock:
+            manifest = self._manifest()
+            self._pending = [[segment["seq"], 0] for segment in manifest.segments]
+            self._seq = manifest.next_seq
+            self._tail.reset()
@@ -0,0 +1,187 @@
+"""
+HydroBuddy log tail - Read the end of the reminder log without loading the whole file.
+"""
+
+import os
+
+
+class LogTail:
+    """Tail reader for an append-only text log.
+
+    ``tail(n)`` seeks backwards from the end of the file in fixed-size blocks
+    until it has seen ``n`` lines, so its cost does not depend on the file
+    size. The reader remembers the byte offset it stopped at, and
+    ``read_new()`` returns only the complete lines appended since then.
+
+    ``lines_before`` and ``lines_after`` page through the file from a line's
+    byte offset, for views that scroll back through the whole log.
+    """
+
+    def __init__(self, path, block_size=8192, encoding="utf-8"):
+        self.path = path
+        self.block_size = block_size
+        self.encoding = encoding
+        self.offset = 0
+        self._identity = None
+
+    def _stat(self):
+        try:
+            return os.stat(self.path)
+        except FileNotFoundError:
+            return None
+
+    def _decode(self, line):
+        return line.decode(self.encoding, errors="replace") + "\n"
+
+    @property
+    def identity(self):
+        """(device, inode) of the file ``offset`` refers to, or None if nothing was read since the last reset."""
+        return self._identity
+
+    def reset(self):
+        """Forget the remembered offset (e.g. after the log was cleared)."""
+        self.offset = 0
+        self._identity = None
+
+    def _read_backwards(self, log_file, end, n):
+        """Return up to ``n`` (offset, line) pairs for the complete lines ending at or before ``end``."""
+        # Ignore a trailing partial line; it is picked up by read_new()
+        # once its newline has been written.
+        position = end
+        chunks = []
+        newlines = 0
+        trimmed = False
+        while position > 0 and newlines <= n:
+            step = min(self.block_size, position)
+            position -= step
+            log_file.seek(position)
+            chunk = log_file.read(step)
+            if not trimmed:
+                cut = chunk.rfind(b"\n")
+                if cut == -1:
+                    end = position
+                    continue
+                end = position + cut + 1
+                chunk = chunk[:cut + 1]
+                trimmed = True
+            chunks.append(chunk)
+            newlines += chunk.count(b"\n")
+
+        if not chunks or n <= 0:
+            return [], end
+
+        data = b"".join(reversed(chunks))
+        lines = data[:-1].split(b"\n")
+        offsets = []
+        offset = position
+        for line in lines:
+            offsets.append(offset)
+            offset += len(line) + 1
+        pairs = list(zip(offsets, lines))
+        if position > 0:
+            # The first line is probably incomplete; it was only needed to
+            # find the start of the next one.
+            pairs = pairs[1:]
+        return [(offset, self._decode(line)) for offset, line in pairs[-n:]], end
+
+    def tail(self, n=50, with_offsets=False):
+        """Return the last ``n`` complete lines and remember the end offset.
+
+        With ``with_offsets``, return (byte offset, line) pairs instead.
+        """
+        st = self._stat()
+        if st is None:
+            self.reset()
+            return []
+
+        with open(self.path, "rb") as log_file:
+            pairs, end = self._read_backwards(log_file, st.st_size, n)
+
+        self.offset = end
+        self._identity = (st.st_dev, st.st_ino)
+        return pairs if with_offsets else [line for _, line in pairs]
+
+    def lines_before(self, offset, n):
+        """Return up to ``n`` (offset, line) pairs for the lines before the one at ``offset``."""
+        if offset <= 0 or self._stat() is None:
+            return []
+        with open(self.path, "rb") as log_file:
+            return self._read_backwards(log_file, offset, n)[0]
+
+    def lines_after(self, offset, n, limit=None):
+        """Return up to ``n`` (offset, line) pairs for the lines after the one at ``offset``.
+
+        Only complete lines before ``limit`` (default: the end of the file)
+        are returned. An ``offset`` of -1 starts with the first line.
+        """
+        st = self._stat()
+        if st is None:
+            return []
+        limit = st.st_size if limit is None else min(limit, st.st_size)
+        pairs = []
+        with open(self.path, "rb") as log_file:
+            if offset < 0:
+                position = 0
+            else:
+                log_file.seek(offset)
+                # Skip the line that starts at ``offset``.
+                position = offset + len(log_file.readline())
+            while len(pairs) < n and position < limit:
+                line = log_file.readline()
+                if not line.endswith(b"\n") or position + len(line) > limit:
+                    break
+                pairs.append((position, self._decode(line[:-1])))
+                position += len(line)
+        return pairs
+
+    def read_new(self, with_offsets=False, max_lines=None):
+        """Return complete lines appended since the last ``tail``/``read_new`` call.
+
+        ``max_lines`` caps how many lines are read at once, so a large
+        backlog can be consumed in chunks. If the file was truncated or
+        replaced, reading restarts from the beginning of the new file.
+        """
+        st = self._stat()
+        if st is None:
+            self.reset()
+            return []
+
+        identity = (st.st_dev, st.st_ino)
+        if identity != self._identity or st.st_size < self.offset:
+            self.offset = 0
+            self._identity = identity
+        if st.st_size == self.offset:
+            return []
+
+        with open(self.path, "rb") as log_file:
+            log_file.seek(self.offset)
+            remaining = st.st_size - self.offset
+            if max_lines is None:
+                data = log_file.read(remaining)
+            else:
+                # Read roughly enough for max_lines lines, and more if a line is longer.
+                size = min(remaining, max(self.block_size, max_lines * 128))
+                data = log_file.read(size)
+                while b"\n" not in data and size < remaining:
+                    more = min(remaining - size, size)
+                    data += log_file.read(more)
+                    size += more
+
+        cut = data.rfind(b"\n")
+        if cut == -1:
+            return []
+        if max_lines is not None and data.count(b"\n", 0, cut) >= max_lines:
+            cut = len(b"\n".join(data.split(b"\n", max_lines)[:max_lines]))
+
+        if not with_offsets:
+            # Decoded in one go; "\n" never occurs inside a multi-byte character
+            self.offset += cut + 1
+            return [line + "\n" for line in data[:cut].decode(self.encoding, errors="replace").split("\n")]
+
+        pairs = []
+        start = self.offset
+        for line in data[:cut].split(b"\n"):
+            pairs.append((start, self._decode(line)))
+            start += len(line) + 1
+        self.offset = start
+        return pairs
@@ -0,0 +1,209 @@
+"""
+HydroBuddy log writer - Write reminder history entries from a background thread.
+
+Entries are put on a bounded queue and written by a single worker thread,
+which drains everything that is pending and hands it to the history backend
+as one batch (group commit). Writing and fsync can each happen for every
+batch, every N milliseconds, or only on shutdown.
+"""
+
+import queue
+import threading
+import time
+
+from metrics import registry as metrics
+
+# Flush / fsync policies. An int is also accepted and means "every N ms".
+EVERY_ENTRY = "entry"
+ON_SHUTDOWN = "shutdown"
+
+# Queue marker asking the worker to write pending entries right away.
+_FLUSH = object()
+
+
+def parse_policy(value):
+    """Parse a policy given as "entry", "shutdown" or a number of milliseconds."""
+    if isinstance(value, int):
+        return value
+    value = str(value).strip().lower()
+    if value in (EVERY_ENTRY, ON_SHUTDOWN):
+        return value
+    try:
+        interval = int(value.removesuffix("ms"))
+    except ValueError:
+        raise ValueError(f"Invalid log policy: {value} (use 'entry', 'shutdown' or milliseconds)") from None
+    if interval <= 0:
+        return EVERY_ENTRY
+    return interval
+
+
+class BackgroundLogWriter:
+    """Buffered writer that batches history entries on a worker thread.
+
+    ``flush`` controls when queued entries are written to the backend and
+    ``fsync`` when the backend is asked to sync them to disk. Both accept
+    ``"entry"``, ``"shutdown"`` or an interval in milliseconds. If the queue
+    is full, new entries are dropped and counted rather than blocking the
+    caller. Entries held back by the flush policy are written anyway once
+    ``max_queue`` of them (1024 for an unbounded queue) have built up, so
+    memory stays bounded.
+    """
+
+    def __init__(self, backend, max_queue=1024, flush=EVERY_ENTRY, fsync=ON_SHUTDOWN):
+        self.backend = backend
+        self.flush_policy = parse_policy(flush)
+        self.fsync_policy = parse_policy(fsync)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self.max_batch = max_queue if max_queue > 0 else 1024
+        self._listeners = []
+        self._closed = False
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0
+
+        # Counters reported by stats()
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.errors = 0
+        self.max_depth = 0
+
+        self._thread = threading.Thread(target=self._run, name="HydroBuddyLogWriter", daemon=True)
+        self._thread.start()
+
+    def add_listener(self, callback):
+        """Call ``callback()`` from the worker thread after each written batch."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def write(self, entry):
+        """Queue an entry. Returns False if it was dropped."""
+        # Checked and queued under the lock, so no entry lands after close()'s end marker
+        with self._lock:
+            if self._closed:
+                self.dropped += 1
+                return False
+            try:
+                self._queue.put_nowait(entry)
+            except queue.Full:
+                self.dropped += 1
+                return False
+            self._pending += 1
+            depth = self._queue.qsize()
+            if depth > self.max_depth:
+                self.max_depth = depth
+        return True
+
+    def flush(self, timeout=None):
+        """Write everything queued so far, whatever the flush policy, and wait for it."""
+        if not self._closed:
+            self._queue.put(_FLUSH)
+        with self._lock:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def close(self, timeout=5):
+        """Write and sync everything still queued, then stop the worker."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self.max_depth,
+            "queue_capacity": self._queue.maxsize,
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "errors": self.errors,
+        }
+
+    @staticmethod
+    def _due(policy, last, now):
+        return policy == EVERY_ENTRY or (isinstance(policy, int) and (now - last) * 1000 >= policy)
+
+    def _timeout(self, last_flush, last_sync, has_unflushed, has_unsynced):
+        """How long the worker may sleep before a timed flush or fsync is due."""
+        deadlines = []
+        if has_unflushed and isinstance(self.flush_policy, int):
+            deadlines.append(last_flush + self.flush_policy / 1000)
+        if has_unsynced and isinstance(self.fsync_policy, int):
+            deadlines.append(last_sync + self.fsync_policy / 1000)
+        if not deadlines:
+            return None
+        return max(0, min(deadlines) - time.monotonic())
+
+    def _run(self):
+        batch = []
+        unsynced = False
+        stopping = False
+        last_flush = last_sync = time.monotonic()
+
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=self._timeout(last_flush, last_sync, bool(batch), unsynced))
+                items = [item]
+                # Group commit: take everything else that is already waiting.
+                while True:
+                    try:
+                        items.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+            except queue.Empty:
+                items = []
+
+            forced = False
+            for item in items:
+                if item is None:
+                    stopping = True
+                elif item is _FLUSH:
+                    forced = True
+                else:
+                    batch.append(item)
+
+            now = time.monotonic()
+            if batch and (stopping or forced or len(batch) >= self.max_batch
+                          or self._due(self.flush_policy, last_flush, now)):
+                self._write(batch)
+                batch = []
+                unsynced = True
+                last_flush = now
+            if unsynced and (stopping or self._due(self.fsync_policy, last_sync, now)):
+                self._sync()
+                unsynced = False
+                last_sync = now
+
+    def _write(self, batch):
+        start = time.perf_counter()
+        try:
+            self.backend.append_many(batch)
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            self.errors += 1
+            if metrics.enabled:
+                metrics.record_error("log_write")
+            print(f"Log write error: {e}")
+        if metrics.enabled:
+            metrics.observe_stage("log_write", time.perf_counter() - start)
+        with self._lock:
+            self._pending -= len(batch)
+            self._idle.notify_all()
+        for callback in list(self._listeners):
+            try:
+                callback()
+            except Exception as e:
+                print(f"Log listener error: {e}")
+
+    def _sync(self):
+        try:
+            self.backend.sync()
+        except Exception as e:
+            self.errors += 1
+            print(f"Log sync error: {e}")
@@ -0,0 +1,41 @@
+"""
+HydroBuddy messages - The reminder messages shown in notifications.
+"""
+
+import random
+import threading
+
+DEFAULT_MESSAGES = (
+    "Stay hydrated! Drink some water! 💧",
+    "Your body needs water! Drink up! 🌊",
+    "Don't forget to hydrate, it's important! 💦",
+    "Drink water, it's great for your skin and energy! ✨",
+    "Time to hydrate! Your body will thank you! 😄",
+)
+
+
+class MessagePool:
+    """Hands out messages in shuffled order without repeats.
+
+    Every message is used once before any is repeated, and a new round never
+    starts with the message that ended the previous one.
+    """
+
+    def __init__(self, messages=DEFAULT_MESSAGES, rng=None):
+        self.messages = tuple(messages) or DEFAULT_MESSAGES
+        self._rng = rng or random.Random()
+        self._deck = []
+        self._last = None
+        self._lock = threading.Lock()
+
+    def next(self):
+        with self._lock:
+            if not self._deck:
+                deck = list(self.messages)
+                self._rng.shuffle(deck)
+                # Messages are dealt from the end of the deck.
+                if len(deck) > 1 and deck[-1] == self._last:
+                    deck[0], deck[-1] = deck[-1], deck[0]
+                self._deck = deck
+            self._last = self._deck.pop()
+            return self._last
@@ -0,0 +1,320 @@
+"""
+HydroBuddy metrics - Per-stage timing of reminders and a Prometheus export.
+
+Every reminder goes through four stages: picking a message, queueing the
+notification, queueing the log entry and starting the sound. When metrics
+are enabled, each stage's latency goes into a histogram, failures are
+counted per stage, and the scheduler's lag (how late the reminder fired) is
+recorded. The background notification and log workers also report how long
+the actual delivery and disk write took.
+
+Collection is off by default; instrumented code checks ``registry.enabled``
+and does nothing else when it is False. The numbers can be exported in the
+Prometheus text format to a file (for node_exporter's textfile collector)
+or over a local HTTP endpoint.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Histogram bucket upper bounds, in seconds
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Stages timed on the reminder path, in order, and by the background workers
+STAGES = ("message", "notify", "log", "sound")
+WORKER_STAGES = ("notify_delivery", "log_write")
+
+
+class Histogram:
+    """Fixed-bucket histogram of durations in seconds."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, fraction):
+        """Upper bound of the bucket holding the given quantile (an estimate)."""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "max": self.max,
+        }
+
+
+class Metrics:
+    """Registry of reminder timings. Disabled until ``enable()`` is called."""
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._collectors = []
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+            self.errors = {}
+            self.reminders = {}
+            self.lag = Histogram()
+            self.last_lag = None
+            self.started = time.time()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def add_collector(self, collector):
+        """Register ``collector()``, which returns extra samples for the export.
+
+        Each sample is ``(name, type, help, value)`` where type is "gauge" or
+        "counter".
+        """
+        self._collectors.append(collector)
+
+    # --- Recording ---
+
+    def observe_stage(self, stage, seconds):
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def record_error(self, stage):
+        with self._lock:
+            self.errors[stage] = self.errors.get(stage, 0) + 1
+
+    def observe_lag(self, seconds):
+        with self._lock:
+            self.lag.observe(seconds)
+            self.last_lag = seconds
+
+    def count_reminder(self, source):
+        with self._lock:
+            self.reminders[source] = self.reminders.get(source, 0) + 1
+
+    def time_stage(self, stage, function, *args, **kwargs):
+        """Call ``function`` and record its duration under ``stage``; failures are counted and re-raised."""
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        except Exception:
+            self.record_error(stage)
+            raise
+        finally:
+            self.observe_stage(stage, time.perf_counter() - start)
+
+    # --- Reporting ---
+
+    def _extra_samples(self):
+        samples = []
+        for collector in list(self._collectors):
+            try:
+                samples.extend(collector())
+            except Exception as e:
+                print(f"Metrics collector error: {e}")
+        return samples
+
+    def snapshot(self):
+        """Current numbers as plain dicts (durations in seconds)."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "since": self.started,
+                "reminders": dict(self.reminders),
+                "stages": {stage: histogram.as_dict() for stage, histogram in self.stages.items()},
+                "errors": dict(self.errors),
+                "scheduler_lag": self.lag.as_dict(),
+                "last_lag": self.last_lag,
+                "extra": {name: value for name, _, _, value in self._extra_samples()},
+            }
+
+    def render_prometheus(self):
+        """The metrics in the Prometheus text exposition format."""
+        lines = []
+
+        def header(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def histogram_lines(name, histogram, labels=""):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels}le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels}le="+Inf"}} {histogram.count}')
+            label_set = "{" + labels.rstrip(",") + "}" if labels else ""
+            lines.append(f"{name}_sum{label_set} {histogram.sum:.9f}")
+            lines.append(f"{name}_count{label_set} {histogram.count}")
+
+        with self._lock:
+            header("hydrobuddy_reminders_total", "counter", "Reminders sent, by source.")
+            for source, count in sorted(self.reminders.items()):
+                lines.append(f'hydrobuddy_reminders_total{{source="{source}"}} {count}')
+
+            header("hydrobuddy_stage_duration_seconds", "histogram", "Time spent in each reminder stage.")
+            for stage, histogram in sorted(self.stages.items()):
+                histogram_lines("hydrobuddy_stage_duration_seconds", histogram, f'stage="{stage}",')
+
+            header("hydrobuddy_stage_errors_total", "counter", "Failures in each reminder stage.")
+            for stage, count in sorted(self.errors.items()):
+                lines.append(f'hydrobuddy_stage_errors_total{{stage="{stage}"}} {count}')
+
+            header("hydrobuddy_scheduler_lag_seconds", "histogram", "How late reminders fired.")
+            histogram_lines("hydrobuddy_scheduler_lag_seconds", self.lag)
+
+        for name, kind, help_text, value in self._extra_samples():
+            header(name, kind, help_text)
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def latency_summary(samples):
+    """Exact count, mean, percentiles and max of a list of durations in seconds, in milliseconds.
+
+    For one-off measurements (the benchmarks, ``hydrobuddy.py simulate``)
+    that keep every sample; returns an empty dict if there are none.
+    """
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def at(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+        "p50_ms": at(0.50),
+        "p90_ms": at(0.90),
+        "p95_ms": at(0.95),
+        "p99_ms": at(0.99),
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def format_report(snapshot):
+    """Render a snapshot as a plain-text table for the terminal or the GUI."""
+    def ms(seconds):
+        return f"{seconds * 1000:9.2f}"
+
+    lines = [
+        f"Collecting since {time.strftime('%H:%M:%S', time.localtime(snapshot['since']))}"
+        + ("" if snapshot["enabled"] else " (disabled)"),
+        "Reminders: " + (", ".join(f"{k} {v}" for k, v in sorted(snapshot["reminders"].items())) or "none"),
+        "",
+        f"{'stage':<16}{'count':>7}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'errors':>8}",
+    ]
+    for stage in STAGES + WORKER_STAGES:
+        stats = snapshot["stages"].get(stage)
+        if stats is None:
+            continue
+        lines.append(
+            f"{stage:<16}{stats['count']:>7}{ms(stats['mean'])} {ms(stats['p50'])} {ms(stats['p95'])} "
+            f"{ms(stats['max'])}{snapshot['errors'].get(stage, 0):>8}"
+        )
+    lag = snapshot["scheduler_lag"]
+    if lag["count"]:
+        lines.append(
+            f"{'scheduler lag':<16}{lag['count']:>7}{ms(lag['mean'])} {ms(lag['p50'])} {ms(lag['p95'])} "
+            f"{ms(lag['max'])}{'':>8}"
+        )
+    if snapshot["extra"]:
+        lines.append("")
+        for name, value in sorted(snapshot["extra"].items()):
+            lines.append(f"{name:<48} {value:g}")
+    return "\n".join(lines)
+
+
+class MetricsFileWriter:
+    """Writes the Prometheus text to ``path`` every ``interval`` seconds, atomically."""
+
+    def __init__(self, metrics, path, interval=15.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="HydroBuddyMetricsFile", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def write(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as metrics_file:
+            metrics_file.write(self.metrics.render_prometheus())
+        os.replace(temp_path, self.path)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.write()
+            except OSError as e:
+                print(f"Metrics file error: {e}")
+            self._stop.wait(self.interval)
+
+    def stop(self):
+        """Stop the writer after writing the final numbers."""
+        self._stop.set()
+        self._thread.join()
+        try:
+            self.write()
+        except OSError as e:
+            print(f"Metrics file error: {e}")
+
+
+def start_http_server(metrics, port, host="127.0.0.1"):
+    """Serve the Prometheus text at http://host:port/metrics from a daemon thread."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = metrics.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="HydroBuddyMetricsHTTP", daemon=True).start()
+    return server
+
+
+# The process-wide registry used by the reminder code
+registry = Metrics()
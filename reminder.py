@@ -1,52 +1,325 @@
-import time
-from plyer import notification
-import pygame
-from datetime import datetime
-import random
 import os # TEST
+import atexit
+import threading
+import history
+from log_writer import BackgroundLogWriter
+from audio import AudioEngine
+from scheduler import ReminderScheduler
+from messages import DEFAULT_MESSAGES, MessagePool
+from dispatch import NotificationDispatcher, make_sink
+from metrics import registry as metrics
+from state import ReminderState
+from clock import system_clock
 
-reminder_count = 0
+# Time source for log timestamps and the CLI scheduler; simulations swap in
+# a virtual clock with set_clock().
+clock = system_clock
+
+# Reminder counters, shared by every thread that sends reminders
+state = ReminderState()
+
+# Sound played with each reminder; set_sound_file() swaps it at runtime.
+# The audio backend is picked on the first play unless set_audio_backend()
+# chooses one.
+sound_file_path = os.path.join(os.path.dirname(__file__), "MGS_Alert.mp3")
+audio_engine = AudioEngine()
+
+# Where reminders are recorded; the launcher can switch this to SQLite or
+# turn on log rotation.
+history_backend = history.open_history()
+
+# Log entries are written by a background thread, created on first use.
+log_writer = None
+log_writer_options = {}
+_log_writer_lock = threading.Lock()
+
+def set_history_backend(name, path=None, rotation=None):
+    """Select the history backend used by log_reminder ("text" or "sqlite").
+
+    ``rotation`` enables rotation of the text log (see history.open_history).
+    """
+    global history_backend
+    close_log_writer()
+    new_backend = history.open_history(name, path, rotation)
+    old_backend, history_backend = history_backend, new_backend
+    old_backend.close()
+    return new_backend
+
+def configure_log_writer(max_queue=1024, flush="entry", fsync="shutdown"):
+    """Set the queue size and flush/fsync policies for the background log writer.
+
+    Policies are "entry", "shutdown" or a number of milliseconds. Takes effect
+    the next time the writer is started.
+    """
+    log_writer_options.update(max_queue=max_queue, flush=flush, fsync=fsync)
+    close_log_writer()
+
+def get_log_writer():
+    """Return the background log writer, starting it if needed."""
+    global log_writer
+    with _log_writer_lock:
+        if log_writer is None:
+            log_writer = BackgroundLogWriter(history_backend, **log_writer_options)
+        return log_writer
+
+def close_log_writer():
+    """Flush and stop the background log writer, if it is running."""
+    global log_writer
+    with _log_writer_lock:
+        writer, log_writer = log_writer, None
+    if writer is not None:
+        writer.close()
+
+def shutdown():
+    """Flush pending log entries and release the history backend and audio."""
+    if settings_store is not None:
+        settings_store.close()
+    close_dispatcher()
+    close_log_writer()
+    history_backend.close()
+    audio_engine.close()
+
+atexit.register(shutdown)
+
+# Notifications are delivered by a worker pool, created on first use.
+notification_sink = "plyer"
+dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+# Messages are dealt from a shuffled pool, so none repeats until all were shown.
+message_pool = MessagePool(DEFAULT_MESSAGES)
+
+# The settings file, loaded by get_settings() on first use.
+settings_store = None
+_settings_lock = threading.Lock()
 
 def get_random_message():
-    messages = [
-        "Stay hydrated! Drink some water! 💧",
-        "Your body needs water! Drink up! 🌊",
-        "Don't forget to hydrate, it's important! 💦",
-        "Drink water, it's great for your skin and energy! ✨",
-        "Time to hydrate! Your body will thank you! 😄"
-    ]
-    return random.choice(messages)
-
-def log_reminder():
-    # Use os.path to create a cross-platform log file path
-    log_file_path = os.path.join(os.path.dirname(__file__), "hydration_log.txt")
-    with open(log_file_path, "a") as log_file:
-        log_file.write(f"Reminder sent at {datetime.now()}\n")
-
-def play_sound():
-    # Use os.path to locate the sound file in a cross-platform way
-    sound_file_path = os.path.join(os.path.dirname(__file__), "MGS_Alert.mp3")
-    pygame.mixer.init()
-    pygame.mixer.music.load(sound_file_path)
-    pygame.mixer.music.play()
-    while pygame.mixer.music.get_busy():
-        time.sleep(1)
-
-def remind_to_drink():
-    global reminder_count
-    while True:
-        reminder_count += 1
-        message = get_random_message()
-        notification.notify(
-            title=f"Hydration Reminder {reminder_count}",
-            message=message,
-            app_name="Drink Reminder",
-            timeout=10
-        )
-        log_reminder()
+    return message_pool.next()
+
+def set_messages(messages):
+    """Use ``messages`` for future reminders."""
+    global message_pool
+    message_pool = MessagePool(messages)
+
+def get_settings():
+    """Return the settings store, loading the settings file and applying it on first use.
+
+    Later edits to the file (or ``save()`` calls) update the messages and
+    the sound automatically; callers that own a scheduler listen for
+    interval changes themselves.
+    """
+    global settings_store
+    with _settings_lock:
+        if settings_store is None:
+            from settings import SettingsStore
+            store = SettingsStore()
+            _apply_settings(None, store.values)
+            store.add_listener(_apply_settings)
+            settings_store = store
+        return settings_store
+
+def _apply_settings(old, new):
+    global sound_file_path
+    if old is None or new["messages"] != old["messages"]:
+        set_messages(new["messages"])
+    if old is None:
+        # Decoded on first play, so loading the settings does not import pygame.
+        sound_file_path = new["sound"]
+    elif new["sound"] != old["sound"]:
+        try:
+            set_sound_file(new["sound"])
+        except Exception as e:
+            print(f"Sound error: could not load {new['sound']}: {e}")
+
+def set_notification_sink(name):
+    """Choose where notifications go: "plyer" (desktop), "console" or "none"."""
+    global notification_sink
+    notification_sink = name
+    close_dispatcher()
+
+def get_dispatcher():
+    """Return the notification dispatcher, starting it if needed."""
+    global dispatcher
+    with _dispatcher_lock:
+        if dispatcher is None:
+            dispatcher = NotificationDispatcher(make_sink(notification_sink))
+        return dispatcher
+
+def close_dispatcher(timeout=2):
+    """Deliver queued notifications and stop the dispatcher, if it is running."""
+    global dispatcher
+    with _dispatcher_lock:
+        old_dispatcher, dispatcher = dispatcher, None
+    if old_dispatcher is not None:
+        old_dispatcher.close(timeout)
+
+def notify(title, message, app_name="HydroBuddy", timeout=10, key="reminder"):
+    """Queue a notification and return immediately.
+
+    Reminders that are still waiting to be shown are merged into one.
+    """
+    return get_dispatcher().submit(title, message, app_name=app_name, timeout=timeout, key=key)
+
+def set_clock(new_clock):
+    """Use ``new_clock`` for log timestamps, the reminder counters and the CLI scheduler."""
+    global clock
+    clock = new_clock
+    state.clock = new_clock
+
+def log_reminder(source="CLI", message=None, number=None):
+    return get_log_writer().write(history.HistoryEntry(clock.now(), source, message, number))
+
+def set_sound_file(path):
+    """Use ``path`` for future reminders, decoding it in the background so it plays without delay."""
+    global sound_file_path
+    audio_engine.preload(path)
+    sound_file_path = path
+
+def set_audio_backend(name):
+    """Choose how sounds are played: "auto" (default), "pcm", "pygame" or "none"."""
+    global audio_engine
+    new_engine = AudioEngine(backend=name)
+    old_engine, audio_engine = audio_engine, new_engine
+    old_engine.close()
+
+def play_sound(on_complete=None):
+    """Start the reminder sound and return without waiting for it to finish."""
+    return audio_engine.play(sound_file_path, on_complete)
+
+def deliver_reminder(source, title, number=None, lag=None, app_name="HydroBuddy"):
+    """Send one reminder: pick a message, notify, log it and start the sound.
+
+    Notification and sound errors are reported without stopping the other
+    stages. ``lag`` is how late the scheduler fired, for the metrics.
+    Returns the message.
+    """
+    if metrics.enabled:
+        return _deliver_timed(source, title, number, lag, app_name)
+    message = get_random_message()
+    try:
+        notify(title=title, message=message, app_name=app_name, timeout=10)
+    except Exception as e:
+        print(f"Notification error: {e}")
+    log_reminder(source, message, number)
+    try:
         play_sound()
-        time.sleep(15 * 60)  # Sleep for 15 minutes
+    except Exception as e:
+        print(f"Sound error: {e}")
+    return message
+
+def _deliver_timed(source, title, number, lag, app_name):
+    """deliver_reminder with every stage timed."""
+    metrics.count_reminder(source)
+    if lag is not None:
+        metrics.observe_lag(lag)
+    message = metrics.time_stage("message", get_random_message)
+    try:
+        metrics.time_stage("notify", notify, title=title, message=message, app_name=app_name, timeout=10)
+    except Exception as e:
+        print(f"Notification error: {e}")
+    metrics.time_stage("log", log_reminder, source, message, number)
+    try:
+        metrics.time_stage("sound", play_sound)
+    except Exception as e:
+        print(f"Sound error: {e}")
+    return message
+
+def _worker_metrics():
+    """Queue and delivery counters of the background workers, for the metrics export."""
+    samples = []
+    writer = log_writer
+    if writer is not None:
+        stats = writer.stats()
+        samples += [
+            ("hydrobuddy_log_queue_depth", "gauge", "Log entries waiting to be written.", stats["queue_depth"]),
+            ("hydrobuddy_log_dropped_total", "counter", "Log entries dropped because the queue was full.",
+             stats["dropped"]),
+            ("hydrobuddy_log_errors_total", "counter", "Failed log writes and syncs.", stats["errors"]),
+        ]
+    current = dispatcher
+    if current is not None:
+        stats = current.stats()
+        delivery = stats["backends"].get(current.sink_name, {})
+        samples += [
+            ("hydrobuddy_notify_pending", "gauge", "Notifications waiting to be delivered.", stats["pending"]),
+            ("hydrobuddy_notify_coalesced_total", "counter", "Reminders merged into a pending notification.",
+             stats["coalesced"]),
+            ("hydrobuddy_notify_timeouts_total", "counter", "Notification attempts that timed out.",
+             delivery.get("timeouts", 0)),
+            ("hydrobuddy_notify_retries_total", "counter", "Notification attempts that were retried.",
+             delivery.get("retries", 0)),
+        ]
+    return samples
+
+metrics.add_collector(_worker_metrics)
+
+def send_cli_reminder(lag=None):
+    number = state.next_number("CLI")
+    deliver_reminder("CLI", f"Hydration Reminder {number}", number, lag, app_name="Drink Reminder")
+
+def remind_to_drink(interval=None, control_socket=None):
+    """Send reminders until interrupted, every ``interval`` seconds or as set in the settings file.
+
+    With ``control_socket``, other launches can ask for a reminder now
+    ("fire-now"), the status, or to stop ("stop" or "shutdown").
+    """
+    store = get_settings().watch()
+    # Reminders fire on fixed deadlines, so the time spent notifying does not add up
+    scheduler = ReminderScheduler(
+        interval or store.get("interval_minutes") * 60,
+        lambda: send_cli_reminder(scheduler.last_lag),
+        clock=clock,
+    )
+    if interval is None:
+        def on_settings_changed(old, new):
+            if new["interval_minutes"] != old["interval_minutes"]:
+                scheduler.set_interval(new["interval_minutes"] * 60)
+                print(f"Reminder interval changed to {new['interval_minutes']} minutes.")
+        store.add_listener(on_settings_changed)
+
+    server = None
+    if control_socket is not None:
+        from instance import ControlServer, requested_interval, scheduler_status, tail_history
+
+        def status(request):
+            return scheduler_status("cli", scheduler, state.count)
+
+        def fire_now(request):
+            scheduler.fire_now()
+            return status(request)
+
+        def stop(request):
+            print("Stopped by another HydroBuddy launch.")
+            scheduler.stop(timeout=0)
+            return status(request)
+
+        def start(request):
+            if not scheduler.running:
+                raise ValueError("it was stopped; start a new HydroBuddy instead")
+            return status(request)
+
+        def set_interval(request):
+            scheduler.set_interval(requested_interval(request))
+            return status(request)
+
+        def show(request):
+            raise ValueError("it is running in CLI mode, which has no window")
+
+        server = ControlServer({"status": status, "start": start, "fire-now": fire_now, "stop": stop,
+                                "shutdown": stop, "set-interval": set_interval,
+                                "tail-history": lambda request: tail_history(request, history_backend.reader()),
+                                "show": show}, control_socket).start()
+    try:
+        scheduler.run()
+    finally:
+        if server is not None:
+            server.close()
 
 if __name__ == "__main__":
-    remind_to_drink()
+    try:
+        remind_to_drink()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shutdown()
 
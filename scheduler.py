@@ -0,0 +1,150 @@
+"""
+HydroBuddy scheduler - Drift-free reminder scheduling on absolute deadlines.
+
+Deadlines are kept on the monotonic clock and advance by exactly one
+interval from the previous *planned* time, so the time spent notifying,
+logging and playing sound does not push later reminders back. The worker
+sleeps on a condition variable until the next deadline, and wakes early
+when the interval changes, a reminder is requested, or it is stopped.
+Time is read and waited on through a clock (see clock.py), so the same
+scheduling runs on a virtual clock in simulations.
+"""
+
+import threading
+
+from clock import system_clock
+
+
+def advance_deadline(planned, interval, now):
+    """Return the deadline after ``planned``, skipping whole periods already missed by ``now``."""
+    next_deadline = planned + interval
+    if next_deadline <= now:
+        missed = int((now - planned) // interval)
+        next_deadline = planned + (missed + 1) * interval
+    return next_deadline
+
+
+class ReminderScheduler:
+    """Calls ``callback()`` every ``interval`` seconds.
+
+    The first reminder fires as soon as the scheduler starts. If a reminder
+    runs so late that whole periods were missed, they are skipped rather
+    than fired back-to-back. ``clock`` defaults to the system clock.
+    """
+
+    def __init__(self, interval, callback, clock=None):
+        self.interval = interval
+        self.callback = callback
+        self.clock = clock or system_clock
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+        self._deadline = None
+        self._fire_now = False
+        # Bumped on every start so a worker left over from before a stop exits
+        self._generation = 0
+
+        # Timing of the most recent reminder
+        self.last_planned = None  # monotonic deadline it was due at
+        self.last_fired = None  # monotonic time it actually fired
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.fired = 0
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self):
+        """Start the scheduler on a background thread."""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._generation += 1
+            self._deadline = self.clock.monotonic()
+            self.last_planned = None
+            generation = self._generation
+        self._thread = threading.Thread(target=self._loop, args=(generation,), name="HydroBuddyScheduler", daemon=True)
+        self._thread.start()
+
+    def run(self):
+        """Run the scheduler in the calling thread until ``stop()`` is called."""
+        with self._cond:
+            self._running = True
+            self._generation += 1
+            self._deadline = self.clock.monotonic()
+            self.last_planned = None
+            generation = self._generation
+        self._loop(generation)
+
+    def stop(self, timeout=None):
+        """Stop the scheduler and wait up to ``timeout`` seconds for the worker to exit."""
+        with self._cond:
+            self._running = False
+            self._deadline = None
+            self._cond.notify_all()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        self._thread = None
+
+    def set_interval(self, interval):
+        """Change the interval; the next deadline is recomputed immediately."""
+        with self._cond:
+            self.interval = interval
+            if self._running and self.last_planned is not None:
+                self._deadline = self.last_planned + interval
+            self._cond.notify_all()
+
+    def fire_now(self):
+        """Fire a reminder now and restart the period from this moment."""
+        with self._cond:
+            self._fire_now = True
+            self._cond.notify_all()
+
+    def next_deadline(self):
+        """Monotonic time of the next reminder, or None when stopped."""
+        with self._cond:
+            return self._deadline if self._running else None
+
+    def next_fire_time(self):
+        """Wall-clock timestamp (as from ``time.time()``) of the next reminder."""
+        deadline = self.next_deadline()
+        if deadline is None:
+            return None
+        return self.clock.time() + max(0.0, deadline - self.clock.monotonic())
+
+    def _active(self, generation):
+        return self._running and self._generation == generation
+
+    def _loop(self, generation):
+        while True:
+            with self._cond:
+                while self._active(generation) and not self._fire_now:
+                    remaining = self._deadline - self.clock.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.clock.wait(self._cond, remaining)
+                if not self._active(generation):
+                    return
+                now = self.clock.monotonic()
+                if self._fire_now:
+                    self._fire_now = False
+                    planned = now
+                else:
+                    planned = self._deadline
+
+                self.last_planned = planned
+                self.last_fired = now
+                self.last_lag = now - planned
+                self.max_lag = max(self.max_lag, self.last_lag)
+                self.fired += 1
+
+                # Advance from the planned time, skipping periods that were missed.
+                self._deadline = advance_deadline(planned, self.interval, now)
+
+            try:
+                self.callback()
+            except Exception as e:
+                print(f"Reminder error: {e}")
@@ -0,0 +1,192 @@
+"""
+HydroBuddy settings - The settings file (interval, messages, sound), reloaded when it changes.
+
+Settings live in ``hydrobuddy_settings.json`` next to the application:
+
+    {
+      "interval_minutes": 15,
+      "messages": ["Stay hydrated! Drink some water! 💧", "..."],
+      "sound": "/path/to/alert.mp3"
+    }
+
+The file is parsed once and cached. A watcher thread compares its
+modification time and size every couple of seconds and reparses it only
+when they change, then tells the listeners, so edits apply to a running
+scheduler without a restart.
+"""
+
+import json
+import os
+import queue
+import threading
+
+from messages import DEFAULT_MESSAGES
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SETTINGS_PATH = os.path.join(APP_DIR, "hydrobuddy_settings.json")
+DEFAULT_SOUND = os.path.join(APP_DIR, "MGS_Alert.mp3")
+
+MIN_INTERVAL = 1
+MAX_INTERVAL = 120
+
+DEFAULTS = {
+    "interval_minutes": 15,
+    "messages": list(DEFAULT_MESSAGES),
+    "sound": DEFAULT_SOUND,
+}
+
+
+def normalize(data):
+    """Return valid settings from parsed data, using defaults for anything missing or invalid."""
+    settings = dict(DEFAULTS)
+    if not isinstance(data, dict):
+        return settings
+
+    interval = data.get("interval_minutes")
+    if isinstance(interval, (int, float)) and not isinstance(interval, bool):
+        settings["interval_minutes"] = max(MIN_INTERVAL, min(MAX_INTERVAL, int(interval)))
+
+    messages = data.get("messages")
+    if isinstance(messages, list):
+        messages = [m.strip() for m in messages if isinstance(m, str) and m.strip()]
+        if messages:
+            settings["messages"] = messages
+
+    sound = data.get("sound")
+    if isinstance(sound, str) and sound:
+        settings["sound"] = os.path.join(APP_DIR, os.path.expanduser(sound))
+    return settings
+
+
+class SettingsStore:
+    """Cached view of the settings file.
+
+    ``add_listener(callback)`` registers ``callback(old, new)``, called
+    whenever the settings change (``old`` is None the first time they are
+    applied). Callbacks run one change at a time, in order, on a thread of
+    the store's own, so neither the thread that saved nor the watcher waits
+    for them.
+    """
+
+    def __init__(self, path=DEFAULT_SETTINGS_PATH, poll_interval=2.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._lock = threading.RLock()
+        self._listeners = []
+        self._stamp = None
+        self._values = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._changes = queue.Queue()  # (old, new) for the listeners; None stops them
+        self._notifier = None
+        self.reload()
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def get(self, key):
+        return self._values[key]
+
+    @property
+    def values(self):
+        """The current settings (a copy)."""
+        with self._lock:
+            return dict(self._values)
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def reload(self):
+        """Re-read the file if it changed since the last read. Returns True if the settings changed."""
+        with self._lock:
+            stamp = self._file_stamp()
+            if stamp == self._stamp and self._values is not None:
+                return False
+            data = {}
+            if stamp is not None:
+                try:
+                    with open(self.path, "r", encoding="utf-8") as settings_file:
+                        data = json.load(settings_file)
+                except (OSError, ValueError) as e:
+                    # Keep the current settings until the file is saved again.
+                    print(f"Settings error: could not read {self.path}: {e}")
+                    if self._values is not None:
+                        self._stamp = stamp
+                        return False
+            self._stamp = stamp
+            return self._update(normalize(data))
+
+    def save(self, **changes):
+        """Update some settings, write the file atomically and notify the listeners."""
+        with self._lock:
+            data = dict(self._values)
+            data.update(changes)
+            new_values = normalize(data)
+            if new_values == self._values and self._stamp is not None:
+                return False
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as settings_file:
+                json.dump(new_values, settings_file, indent=2, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+            self._stamp = self._file_stamp()
+            return self._update(new_values)
+
+    def _update(self, new_values):
+        old_values = self._values
+        if new_values == old_values:
+            return False
+        self._values = new_values
+        if self._listeners and not self._stop.is_set():
+            # Called with the lock held; the listeners run after it is released
+            self._changes.put((old_values, new_values))
+            if self._notifier is None:
+                self._notifier = threading.Thread(target=self._notify, name="HydroBuddySettingsListeners",
+                                                  daemon=True)
+                self._notifier.start()
+        return True
+
+    def _notify(self):
+        while True:
+            change = self._changes.get()
+            if change is None:
+                return
+            for callback in list(self._listeners):
+                try:
+                    callback(*change)
+                except Exception as e:
+                    print(f"Settings listener error: {e}")
+
+    # --- Watching for edits ---
+
+    def watch(self):
+        """Start checking the file for changes in the background."""
+        with self._lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="HydroBuddySettings", daemon=True)
+                self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            self.reload()
+
+    def close(self):
+        """Stop the watcher and the listener thread, after the changes already made were delivered."""
+        self._stop.set()
+        with self._lock:
+            thread, self._thread = self._thread, None
+            notifier, self._notifier = self._notifier, None
+            if notifier is not None:
+                self._changes.put(None)
+        for worker in (thread, notifier):
+            if worker is not None and worker is not threading.current_thread():
+                worker.join()
@@ -0,0 +1,156 @@
+"""
+HydroBuddy simulate - Replay days or months of reminders on a virtual clock.
+
+The real scheduler and reminder pipeline (message pool, notification
+dispatcher, log writer, audio engine) run against a VirtualClock, with the
+"none" notification sink and audio backend standing in for the desktop. A
+month of 15-minute reminders takes a few seconds. Interval changes and
+manual reminders can be scripted at virtual times, e.g.::
+
+    python hydrobuddy.py simulate --days 30 --events "2d:interval=30,50h:fire-now"
+
+The result is an ordinary reminder log plus timing figures for capacity
+planning and for checking changes to the scheduling logic.
+"""
+
+import math
+import os
+import time
+
+import history
+import reminder
+from clock import VirtualClock
+from metrics import latency_summary
+from scheduler import ReminderScheduler
+
+DEFAULT_OUTPUT = "simulation_log.txt"
+SOURCE = "Simulation"
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_offset(text):
+    """Seconds in an offset such as "90m", "36h" or "2d" (a bare number means minutes)."""
+    text = text.strip().lower()
+    unit = _UNITS.get(text[-1:])
+    try:
+        seconds = float(text[:-1] if unit else text) * (unit or 60)
+    except ValueError:
+        seconds = -1
+    if not 0 <= seconds < float("inf"):
+        raise ValueError(f"Invalid time offset: {text} (use e.g. 90m, 36h or 2d)")
+    return seconds
+
+
+def parse_events(text):
+    """Parse "2d:interval=30,50h:fire-now" into sorted ``(seconds, action, value)`` tuples."""
+    events = []
+    for item in filter(None, (part.strip() for part in (text or "").split(","))):
+        offset, _, action = item.partition(":")
+        action, _, value = action.strip().lower().partition("=")
+        if action == "interval":
+            try:
+                value = float(value)
+            except ValueError:
+                value = 0
+            if not 0 < value < float("inf"):
+                raise ValueError(f"Invalid event: {item} (interval=MINUTES needs a positive number)")
+        elif action == "fire-now":
+            value = None
+        else:
+            raise ValueError(f"Invalid event: {item} (use OFFSET:interval=MINUTES or OFFSET:fire-now)")
+        events.append((parse_offset(offset), action, value))
+    return sorted(events, key=lambda event: event[0])
+
+
+def simulate(days, interval_minutes=15, output=DEFAULT_OUTPUT, events=(), start=None):
+    """Run the scheduler for ``days`` virtual days and log every reminder to ``output``.
+
+    The simulated time ends now unless ``start`` (a ``time.time()`` value)
+    is given. ``output`` is replaced. The reminder module is reconfigured
+    for the simulation, so this is meant to run in a process of its own.
+    Returns a dict of results.
+    """
+    if not (days > 0 and interval_minutes > 0 and math.isfinite(days) and math.isfinite(interval_minutes)):
+        raise ValueError("--days and --interval must be positive numbers")
+    if os.path.abspath(output) == os.path.abspath(history.DEFAULT_TEXT_PATH):
+        raise ValueError(f"{output} is the real reminder log; choose another --output")
+    duration = days * 86400
+    clock = VirtualClock(time.time() - duration if start is None else start)
+
+    if os.path.exists(output):
+        os.remove(output)
+    reminder.set_notification_sink("none")
+    reminder.set_audio_backend("none")
+    # Unbounded queue: the simulation outpaces the writer, and no entry may be dropped
+    reminder.configure_log_writer(max_queue=0)
+    reminder.set_history_backend("text", path=output)
+    reminder.set_clock(clock)
+    reminder.state.reset()
+
+    durations = []
+    scheduler = None
+
+    def send():
+        started = time.perf_counter()
+        number = reminder.state.next_number(SOURCE)
+        reminder.deliver_reminder(SOURCE, f"Hydration Reminder {number}", number, scheduler.last_lag)
+        durations.append(time.perf_counter() - started)
+
+    scheduler = ReminderScheduler(interval_minutes * 60, send, clock=clock)
+    for offset, action, value in events:
+        if offset >= duration:
+            continue
+        if action == "interval":
+            clock.call_at(offset, lambda minutes=value: scheduler.set_interval(minutes * 60))
+        else:
+            clock.call_at(offset, scheduler.fire_now)
+    clock.call_at(duration, scheduler.stop)
+
+    started = time.perf_counter()
+    scheduler.run()
+    writer = reminder.get_log_writer()
+    writer.flush()
+    writer_stats = writer.stats()
+    reminder.close_log_writer()
+    wall_seconds = time.perf_counter() - started
+
+    fired = scheduler.fired
+    log_bytes = os.path.getsize(output) if os.path.exists(output) else 0
+    return {
+        "output": output,
+        "days": days,
+        "start": clock.start,
+        "interval_minutes": interval_minutes,
+        "events": len([event for event in events if event[0] < duration]),
+        "reminders": fired,
+        "reminders_per_day": fired / days,
+        "wall_seconds": wall_seconds,
+        "speedup": duration / wall_seconds if wall_seconds else None,
+        "reminders_per_second": fired / wall_seconds if wall_seconds else None,
+        "clock_waits": clock.waits,
+        "deliver": latency_summary(durations),
+        "logged": writer_stats["written"],
+        "log_dropped": writer_stats["dropped"],
+        "log_batches": writer_stats["batches"],
+        "log_bytes": log_bytes,
+        "log_bytes_per_year": log_bytes / days * 365,
+    }
+
+
+def format_results(results):
+    """Render simulation results as plain text."""
+    lines = [
+        f"Simulated {results['days']:g} days at {results['interval_minutes']:g}-minute intervals "
+        f"({results['events']} scripted events) in {results['wall_seconds']:.2f}s "
+        f"({results['speedup']:,.0f}x real time)",
+        f"Reminders:            {results['reminders']} ({results['reminders_per_day']:.1f} per day, "
+        f"{results['reminders_per_second']:,.0f} per second of simulation)",
+    ]
+    deliver = results["deliver"]
+    if deliver:
+        lines.append(f"Delivery (real time): mean {deliver['mean_ms']:.3f} ms, p50 {deliver['p50_ms']:.3f} ms, "
+                     f"p95 {deliver['p95_ms']:.3f} ms, max {deliver['max_ms']:.2f} ms")
+    lines.append(f"Log:                  {results['logged']} entries in {results['log_batches']} batches, "
+                 f"{results['log_dropped']} dropped, {results['log_bytes'] / 1024:,.1f} KiB "
+                 f"(~{results['log_bytes_per_year'] / 1024 / 1024:,.1f} MiB per year) -> {results['output']}")
+    return "\n".join(lines)
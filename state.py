@@ -0,0 +1,52 @@
+"""
+HydroBuddy state - Reminder counters shared by the scheduler, worker and GUI threads.
+"""
+
+import threading
+
+from clock import system_clock
+
+
+class ReminderState:
+    """Reminder counters behind a lock.
+
+    ``next_number()`` counts a reminder and returns its number in one step,
+    so two threads sending reminders at once never get the same number.
+    """
+
+    def __init__(self, clock=None):
+        self.clock = clock or system_clock
+        self._lock = threading.Lock()
+        self._count = 0
+        self._by_source = {}
+        self._last_sent = None
+
+    @property
+    def count(self):
+        with self._lock:
+            return self._count
+
+    @property
+    def last_sent(self):
+        """``clock.time()`` of the last counted reminder, or None."""
+        with self._lock:
+            return self._last_sent
+
+    def next_number(self, source=None):
+        """Count one reminder and return its number."""
+        with self._lock:
+            self._count += 1
+            self._by_source[source] = self._by_source.get(source, 0) + 1
+            self._last_sent = self.clock.time()
+            return self._count
+
+    def reset(self):
+        with self._lock:
+            self._count = 0
+            self._by_source = {}
+            self._last_sent = None
+
+    def snapshot(self):
+        """The counters as a plain dict."""
+        with self._lock:
+            return {"count": self._count, "by_source": dict(self._by_source), "last_sent": self._last_sent}
@@ -0,0 +1,208 @@
+"""
+HydroBuddy tray - Run reminders from a system tray icon without loading Tk.
+
+The tray mode is meant for always-on background use: it runs the scheduler
+and a pystray menu (turn reminders on/off, send one now, show today's
+stats) and never imports tkinter. The full window is only built if the user
+picks "Open Window"; the tray then hands its running scheduler over to it.
+"""
+
+import importlib.util
+import threading
+from datetime import datetime
+
+import reminder
+from scheduler import ReminderScheduler
+
+TRAY_AVAILABLE = all(importlib.util.find_spec(name) is not None for name in ("pystray", "PIL"))
+
+
+def create_icon_image():
+    """The tray icon: a water drop on a light blue square."""
+    from PIL import Image, ImageDraw
+
+    width = 64
+    height = 64
+    image = Image.new('RGB', (width, height), color='lightblue')
+    dc = ImageDraw.Draw(image)
+    dc.text((10, 20), "💧", fill='blue')
+    return image
+
+
+class TrayApp:
+    """Scheduler plus tray menu, without any window."""
+
+    def __init__(self):
+        self.settings = reminder.get_settings()
+        self.settings.add_listener(self.on_settings_changed)
+        self.settings.watch()
+        self.scheduler = ReminderScheduler(self.settings.get("interval_minutes") * 60, self.send_scheduled_reminder)
+        self.icon = None
+        self.open_window = False
+        self.hydration_stats = None
+        self._stats_lock = threading.Lock()
+
+    # --- Reminders ---
+
+    def send_scheduled_reminder(self):
+        number = reminder.state.next_number("tray")
+        reminder.deliver_reminder("tray", f"Hydration Reminder {number}", number, lag=self.scheduler.last_lag)
+        self.update_title()
+
+    def toggle_reminders(self, icon=None, item=None):
+        if self.scheduler.running:
+            self.scheduler.stop(timeout=0)
+        else:
+            self.scheduler.start()
+        self.update_title()
+
+    def send_now(self, icon=None, item=None):
+        if self.scheduler.running:
+            # Counted, and the period restarts from now
+            self.scheduler.fire_now()
+        else:
+            reminder.deliver_reminder("manual", "Manual Hydration Reminder")
+
+    def on_settings_changed(self, old, new):
+        if new["interval_minutes"] != old["interval_minutes"]:
+            self.scheduler.set_interval(new["interval_minutes"] * 60)
+            self.update_title()
+
+    def update_title(self):
+        """Show the state and the next reminder time in the icon's tooltip."""
+        if self.icon is None:
+            return
+        next_time = self.scheduler.next_fire_time()
+        if next_time is None:
+            self.icon.title = "HydroBuddy - reminders off"
+        else:
+            self.icon.title = f"HydroBuddy - next reminder at {datetime.fromtimestamp(next_time):%H:%M}"
+
+    # --- Stats ---
+
+    def show_stats(self, icon=None, item=None):
+        threading.Thread(target=self._show_stats, name="HydroBuddyTrayStats", daemon=True).start()
+
+    def _show_stats(self):
+        # analytics (and NumPy) is only imported when stats are asked for.
+        try:
+            import analytics
+            with self._stats_lock:
+                if self.hydration_stats is None:
+                    self.hydration_stats = analytics.HydrationStats(reminder.history_backend)
+                self.hydration_stats.update()
+                summary = self.hydration_stats.summary(days=1)
+        except Exception as e:
+            reminder.notify("HydroBuddy Stats", f"Could not compute statistics: {e}", key="stats")
+            return
+        lines = [f"Today: {summary['daily'][-1][1]} reminders"]
+        lines.append(f"Streak: {summary['streaks']['current']} days (longest {summary['streaks']['longest']})")
+        if summary["intervals"]:
+            lines.append(f"Median interval: {summary['intervals']['median_minutes']:.0f} min")
+        lines.append(f"Total: {summary['total']}")
+        reminder.notify("HydroBuddy Stats", "\n".join(lines), key="stats")
+
+    # --- Commands from other launches ---
+
+    def control_commands(self):
+        """Handlers for commands sent by other launches (see instance.py)."""
+        from instance import requested_interval, scheduler_status, tail_history
+
+        def status(request):
+            return scheduler_status("tray", self.scheduler, reminder.state.count)
+
+        def run(action):
+            def handler(request):
+                action()
+                return status(request)
+            return handler
+
+        def set_interval(request):
+            self.scheduler.set_interval(requested_interval(request))
+            self.update_title()
+            return status(request)
+
+        return {
+            "status": status,
+            "show": run(self.request_window),
+            "fire-now": run(self.send_now),
+            "start": run(lambda: self.scheduler.running or self.toggle_reminders()),
+            "stop": run(lambda: self.scheduler.running and self.toggle_reminders()),
+            "shutdown": run(self.quit),
+            "set-interval": set_interval,
+            "tail-history": lambda request: tail_history(request, reminder.history_backend.reader()),
+        }
+
+    # --- Tray icon ---
+
+    def build_icon(self):
+        import pystray
+
+        menu = pystray.Menu(
+            pystray.MenuItem("Reminders On", self.toggle_reminders, checked=lambda item: self.scheduler.running),
+            pystray.MenuItem("Send Reminder Now", self.send_now),
+            pystray.MenuItem("Show Stats", self.show_stats),
+            pystray.Menu.SEPARATOR,
+            pystray.MenuItem("Open Window", self.request_window, default=True),
+            pystray.MenuItem("Quit", self.quit),
+        )
+        self.icon = pystray.Icon("HydroBuddy", create_icon_image(), "HydroBuddy - Hydration Reminder", menu)
+        return self.icon
+
+    def request_window(self, icon=None, item=None):
+        self.open_window = True
+        if self.icon is not None:
+            self.icon.stop()
+
+    def quit(self, icon=None, item=None):
+        self.scheduler.stop(timeout=0)
+        if self.icon is not None:
+            self.icon.stop()
+
+    def run(self, autostart=True):
+        """Show the icon until Quit or Open Window. Returns True if the window was asked for."""
+        self.build_icon()
+        if autostart:
+            self.scheduler.start()
+
+        def setup(icon):
+            icon.visible = True
+            self.update_title()
+
+        self.icon.run(setup)
+        return self.open_window
+
+
+def main(control_socket=None):
+    """Run the tray icon; build the full window only if the user opens it.
+
+    With ``control_socket``, other launches can open the window, fire a
+    reminder or stop the reminders through it.
+    """
+    app = TrayApp()
+    control_server = None
+    if control_socket is not None:
+        from instance import ControlServer
+        control_server = ControlServer(app.control_commands(), control_socket).start()
+    try:
+        open_window = app.run()
+    except KeyboardInterrupt:
+        open_window = False
+    if not open_window:
+        if control_server is not None:
+            control_server.close()
+        app.scheduler.stop(timeout=1)
+        reminder.shutdown()
+        return
+
+    # The user asked for the window: now load Tk and hand over the scheduler.
+    import tkinter as tk
+    import gui
+
+    reminder.get_settings().remove_listener(app.on_settings_changed)
+    root = tk.Tk()
+    window = gui.HydroBuddyGUI(root, scheduler=app.scheduler)
+    if control_server is not None:
+        control_server.commands = window.control_commands()
+        window.control_server = control_server
+    root.mainloop()
@@ -0,0 +1,55 @@
+"""
+HydroBuddy UI queue - Batch GUI updates posted by worker threads.
+
+Worker threads (scheduler, log writer, settings watcher, tray, control
+socket) must not touch Tk widgets. They post updates here instead. The Tk
+main loop drains the queue on a single timer, once per frame. Updates are
+merged by key: posting a key that is already pending replaces the earlier
+callback, so a burst of reminders leads to one redraw of each widget.
+"""
+
+import threading
+
+# How often the Tk main loop applies pending updates (about 20 frames a second)
+FRAME_MS = 50
+
+
+class UpdateQueue:
+    """Thread-safe set of pending updates, keyed and applied in posting order."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}  # key -> callback, in insertion order
+        self.posted = 0
+        self.applied = 0
+
+    def post(self, key, callback):
+        """Ask for ``callback()`` on the next frame, replacing any pending update with the same key."""
+        with self._lock:
+            # Re-inserting moves the key to the end, after the updates it may depend on
+            self._pending.pop(key, None)
+            self._pending[key] = callback
+            self.posted += 1
+
+    def drain(self):
+        """Take the pending callbacks."""
+        with self._lock:
+            if not self._pending:
+                return []
+            pending, self._pending = self._pending, {}
+            self.applied += len(pending)
+            return list(pending.values())
+
+    def apply(self):
+        """Run the pending callbacks; call this from the Tk thread."""
+        for callback in self.drain():
+            try:
+                callback()
+            except Exception as e:
+                print(f"GUI update error: {e}")
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+            return {"posted": self.posted, "applied": self.applied,
+                    "merged": self.posted - self.applied - pending, "pending": pending}